@@ -1,15 +1,81 @@
-from langchain_core.tools import tool
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from typing import Any, Awaitable, Callable, Dict, List
+from pydantic import BaseModel, Field
+from langchain_core.tools import StructuredTool, tool
 from langgraph.prebuilt import create_react_agent
-from utils.state import StateSuporteSimples
-from memory.workflow_memory import checkpointer as default_checkpointer, in_memory_store
+from utils.state import StateSuporteSimples, CategoryType, SentimentType
+from utils.llm_pool import obter_chain, obter_llm
+from memory.historico import GerenciadorHistorico
+from memory.workflow_memory import obter_checkpointer, obter_store
+from memory.cache_classificacao import cache_classificacao
+from utils.motor_regras import obter_motor_regras
+
+MODELO_TRIAGEM = "gpt-4o-mini"
+
+# --- Prompts das Ferramentas ---
+
+PROMPT_CATEGORIZAR = """
+        Analise a seguinte consulta de cliente e categorize em uma dessas opções:
+        - Technical: Problemas técnicos, bugs, funcionalidades.
+        - Billing: Questões financeiras, cobranças, pagamentos.
+        - General: Informações gerais, horários, políticas.
+        
+        Consulta: {query}
+        
+        Responda apenas com uma palavra: Technical, Billing ou General
+        """
+
+PROMPT_SENTIMENTO = """
+        Analise o sentimento da seguinte consulta de cliente:
+        
+        Consulta: {query}
+        
+        Classifique como:
+        - Positive: Cliente satisfeito, elogiando.
+        - Neutral: Consulta neutra, apenas pergunta.
+        - Negative: Cliente insatisfeito, reclamando, frustrado.
+        
+        Responda apenas: Positive, Neutral ou Negative
+        """
+
+PROMPT_TRIAGEM = """
+        Analise a seguinte consulta de cliente e classifique:
+        - categoria: Technical, Billing ou General
+        - sentimento: Positive, Neutral ou Negative
+
+        Consulta: {query}
+        """
+
+
+def _classificar_com_cache(
+    tarefa: str, prompt: str, query: str, classificar: Callable[[], Any]
+) -> Any:
+    """Consulta o cache de classificação e só chama o LLM em caso de miss"""
+    em_cache = cache_classificacao.obter(tarefa, query, MODELO_TRIAGEM, prompt)
+    if em_cache is not None:
+        return em_cache
+    resultado = classificar()
+    cache_classificacao.salvar(tarefa, query, MODELO_TRIAGEM, prompt, resultado)
+    return resultado
+
+
+async def _aclassificar_com_cache(
+    tarefa: str, prompt: str, query: str, classificar: Callable[[], Awaitable[Any]]
+) -> Any:
+    """Versão assíncrona de _classificar_com_cache (SQLite fora do event loop)"""
+    em_cache = await cache_classificacao.aobter(tarefa, query, MODELO_TRIAGEM, prompt)
+    if em_cache is not None:
+        return em_cache
+    resultado = await classificar()
+    await cache_classificacao.asalvar(tarefa, query, MODELO_TRIAGEM, prompt, resultado)
+    return resultado
+
 
 # --- Definição das Ferramentas (Tools) ---
+# As tools que chamam o LLM têm implementação síncrona e assíncrona
+# (StructuredTool com func + coroutine), usadas por invoke/ainvoke.
 
 
-@tool
-def categorizar_consulta(query: str) -> str:
+def _categorizar_consulta(query: str) -> str:
     """
     Categoriza a consulta do cliente em: Technical, Billing ou General.
 
@@ -19,25 +85,34 @@ def categorizar_consulta(query: str) -> str:
     Returns:
         str: Uma das categorias: Technical, Billing ou General.
     """
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    prompt = ChatPromptTemplate.from_template(
-        """
-        Analise a seguinte consulta de cliente e categorize em uma dessas opções:
-        - Technical: Problemas técnicos, bugs, funcionalidades.
-        - Billing: Questões financeiras, cobranças, pagamentos.
-        - General: Informações gerais, horários, políticas.
-        
-        Consulta: {query}
-        
-        Responda apenas com uma palavra: Technical, Billing ou General
-        """
+    chain = obter_chain("categorizar", PROMPT_CATEGORIZAR, MODELO_TRIAGEM)
+    return _classificar_com_cache(
+        "categorizar",
+        PROMPT_CATEGORIZAR,
+        query,
+        lambda: chain.invoke({"query": query}).content.strip(),
     )
-    chain = prompt | llm
-    return chain.invoke({"query": query}).content.strip()
 
 
-@tool
-def analisar_sentimento(query: str) -> str:
+async def _acategorizar_consulta(query: str) -> str:
+    chain = obter_chain("categorizar", PROMPT_CATEGORIZAR, MODELO_TRIAGEM)
+
+    async def _classificar() -> str:
+        return (await chain.ainvoke({"query": query})).content.strip()
+
+    return await _aclassificar_com_cache(
+        "categorizar", PROMPT_CATEGORIZAR, query, _classificar
+    )
+
+
+categorizar_consulta = StructuredTool.from_function(
+    func=_categorizar_consulta,
+    coroutine=_acategorizar_consulta,
+    name="categorizar_consulta",
+)
+
+
+def _analisar_sentimento(query: str) -> str:
     """
     Analisa o sentimento da consulta do cliente: Positive, Neutral ou Negative.
 
@@ -47,65 +122,203 @@ def analisar_sentimento(query: str) -> str:
     Returns:
         str: Positive, Neutral ou Negative.
     """
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    prompt = ChatPromptTemplate.from_template(
-        """
-        Analise o sentimento da seguinte consulta de cliente:
-        
-        Consulta: {query}
-        
-        Classifique como:
-        - Positive: Cliente satisfeito, elogiando.
-        - Neutral: Consulta neutra, apenas pergunta.
-        - Negative: Cliente insatisfeito, reclamando, frustrado.
-        
-        Responda apenas: Positive, Neutral ou Negative
-        """
+    chain = obter_chain("analisar_sentimento", PROMPT_SENTIMENTO, MODELO_TRIAGEM)
+    return _classificar_com_cache(
+        "analisar_sentimento",
+        PROMPT_SENTIMENTO,
+        query,
+        lambda: chain.invoke({"query": query}).content.strip(),
     )
-    chain = prompt | llm
-    return chain.invoke({"query": query}).content.strip()
+
+
+async def _aanalisar_sentimento(query: str) -> str:
+    chain = obter_chain("analisar_sentimento", PROMPT_SENTIMENTO, MODELO_TRIAGEM)
+
+    async def _classificar() -> str:
+        return (await chain.ainvoke({"query": query})).content.strip()
+
+    return await _aclassificar_com_cache(
+        "analisar_sentimento", PROMPT_SENTIMENTO, query, _classificar
+    )
+
+
+analisar_sentimento = StructuredTool.from_function(
+    func=_analisar_sentimento,
+    coroutine=_aanalisar_sentimento,
+    name="analisar_sentimento",
+)
 
 
 @tool
-def determinar_prioridade(categoria: str, sentimento: str) -> str:
+def determinar_prioridade(categoria: str, sentimento: str, query: str = "") -> str:
     """
     Determina a prioridade (High, Medium, Low) com base na categoria e sentimento.
 
     Args:
         categoria: A categoria da consulta (Technical, Billing, General).
         sentimento: O sentimento da consulta (Positive, Neutral, Negative).
+        query: A consulta do cliente (opcional; usada por regras com padrões de texto).
 
     Returns:
         str: A prioridade: High, Medium ou Low.
     """
-    if sentimento == "Negative":
-        return "High"
-    if categoria == "Billing":
-        return "Medium"
-    if categoria == "Technical" and sentimento == "Neutral":
-        return "Medium"
-    return "Low"
+    return obter_motor_regras().avaliar(categoria, sentimento, query).prioridade
 
 
 @tool
-def determinar_rota(categoria: str, sentimento: str) -> str:
+def determinar_rota(categoria: str, sentimento: str, query: str = "") -> str:
     """
     Determina para qual agente a consulta deve ser encaminhada.
 
     Args:
         categoria: A categoria da consulta (Technical, Billing, General).
         sentimento: O sentimento da consulta (Positive, Neutral, Negative).
+        query: A consulta do cliente (opcional; usada por regras com padrões de texto).
 
     Returns:
         str: A rota: escalate, agent_tecnico, agent_financeiro ou agent_geral.
     """
-    if sentimento == "Negative":
-        return "escalate"
-    if categoria == "Technical":
-        return "agent_tecnico"
-    if categoria == "Billing":
-        return "agent_financeiro"
-    return "agent_geral"
+    return obter_motor_regras().avaliar(categoria, sentimento, query).rota
+
+
+# --- Triagem Conjunta (uma única chamada ao LLM) ---
+
+
+class TriagemConsulta(BaseModel):
+    """Saída estruturada da triagem: categoria e sentimento da consulta"""
+
+    categoria: CategoryType = Field(
+        description="Technical (problemas técnicos, bugs, funcionalidades), "
+        "Billing (cobranças, pagamentos) ou General (informações gerais, horários, políticas)"
+    )
+    sentimento: SentimentType = Field(
+        description="Positive (satisfeito, elogiando), Neutral (apenas pergunta) "
+        "ou Negative (insatisfeito, reclamando, frustrado)"
+    )
+
+
+def _resultado_triagem(triagem: "TriagemConsulta") -> Dict[str, str]:
+    return {
+        "categoria": triagem.categoria.value,
+        "sentimento": triagem.sentimento.value,
+    }
+
+
+def _com_prioridade(triagem: Dict[str, str], query: str) -> Dict[str, str]:
+    prioridade = determinar_prioridade.invoke(
+        {
+            "categoria": triagem["categoria"],
+            "sentimento": triagem["sentimento"],
+            "query": query,
+        }
+    )
+    return {**triagem, "prioridade": prioridade}
+
+
+def _triar_consulta(query: str) -> Dict[str, str]:
+    """
+    Faz a triagem completa da consulta em uma única chamada ao LLM:
+    categoria, sentimento e a prioridade derivada deles.
+
+    Args:
+        query: A consulta do cliente.
+
+    Returns:
+        dict: Chaves 'categoria', 'sentimento' e 'prioridade'.
+    """
+    chain = obter_chain(
+        "triar", PROMPT_TRIAGEM, MODELO_TRIAGEM, saida_estruturada=TriagemConsulta
+    )
+    triagem = _classificar_com_cache(
+        "triar",
+        PROMPT_TRIAGEM,
+        query,
+        lambda: _resultado_triagem(chain.invoke({"query": query})),
+    )
+    return _com_prioridade(triagem, query)
+
+
+async def _atriar_consulta(query: str) -> Dict[str, str]:
+    chain = obter_chain(
+        "triar", PROMPT_TRIAGEM, MODELO_TRIAGEM, saida_estruturada=TriagemConsulta
+    )
+
+    async def _classificar() -> Dict[str, str]:
+        return _resultado_triagem(await chain.ainvoke({"query": query}))
+
+    triagem = await _aclassificar_com_cache("triar", PROMPT_TRIAGEM, query, _classificar)
+    return _com_prioridade(triagem, query)
+
+
+triar_consulta = StructuredTool.from_function(
+    func=_triar_consulta,
+    coroutine=_atriar_consulta,
+    name="triar_consulta",
+)
+
+
+# --- Classificação em Lote (ingestão/reprocessamento) ---
+
+MAX_CONCORRENCIA_LOTE = 16
+
+
+def _classificar_lote_com_cache(
+    tarefa: str,
+    prompt: str,
+    queries: List[str],
+    chain,
+    converter: Callable[[Any], Any],
+) -> List[Any]:
+    """
+    Classifica várias consultas: as que estão em cache não vão ao LLM e as
+    demais seguem em uma única chamada chain.batch (requisições concorrentes).
+    """
+    resultados: List[Any] = [
+        cache_classificacao.obter(tarefa, q, MODELO_TRIAGEM, prompt) for q in queries
+    ]
+    pendentes = [i for i, r in enumerate(resultados) if r is None]
+    if pendentes:
+        respostas = chain.batch(
+            [{"query": queries[i]} for i in pendentes],
+            config={"max_concurrency": MAX_CONCORRENCIA_LOTE},
+        )
+        for i, resposta in zip(pendentes, respostas):
+            resultados[i] = converter(resposta)
+            cache_classificacao.salvar(
+                tarefa, queries[i], MODELO_TRIAGEM, prompt, resultados[i]
+            )
+    return resultados
+
+
+def triar_consultas_lote(queries: List[str]) -> List[Dict[str, str]]:
+    """Triagem conjunta (categoria, sentimento e prioridade) de várias consultas"""
+    chain = obter_chain(
+        "triar", PROMPT_TRIAGEM, MODELO_TRIAGEM, saida_estruturada=TriagemConsulta
+    )
+    triagens = _classificar_lote_com_cache(
+        "triar", PROMPT_TRIAGEM, queries, chain, _resultado_triagem
+    )
+    return [_com_prioridade(t, q) for t, q in zip(triagens, queries)]
+
+
+def categorizar_consultas_lote(queries: List[str]) -> List[str]:
+    """Categoriza várias consultas (Technical, Billing ou General)"""
+    chain = obter_chain("categorizar", PROMPT_CATEGORIZAR, MODELO_TRIAGEM)
+    return _classificar_lote_com_cache(
+        "categorizar", PROMPT_CATEGORIZAR, queries, chain, lambda r: r.content.strip()
+    )
+
+
+def analisar_sentimentos_lote(queries: List[str]) -> List[str]:
+    """Analisa o sentimento de várias consultas (Positive, Neutral ou Negative)"""
+    chain = obter_chain("analisar_sentimento", PROMPT_SENTIMENTO, MODELO_TRIAGEM)
+    return _classificar_lote_com_cache(
+        "analisar_sentimento",
+        PROMPT_SENTIMENTO,
+        queries,
+        chain,
+        lambda r: r.content.strip(),
+    )
 
 
 # --- Lista de Tools do Coordenador ---
@@ -150,10 +363,12 @@ class AgenteCoordenador:
 
     def __init__(self):
         self.agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-4o-mini"),
+            model=obter_llm("gpt-4o-mini"),
             tools=coordenador_tools,
             prompt=coordenador_prompt,
             state_schema=StateSuporteSimples,
-            checkpointer=default_checkpointer,
-            store=in_memory_store,
+            # Mantém as mensagens da thread no orçamento de tokens
+            pre_model_hook=GerenciadorHistorico().como_no(),
+            checkpointer=obter_checkpointer(),
+            store=obter_store(),
         )
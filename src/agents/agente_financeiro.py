@@ -1,15 +1,14 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 from utils.state import StateSuporteSimples
+from utils.llm_pool import obter_llm
+from memory.historico import GerenciadorHistorico
+from utils.base_conhecimento import obter_base_conhecimento
 
 # --- Base de Conhecimento Financeiro ---
+# Artigos em agents/conhecimento/financeiro.json (ver utils/base_conhecimento.py)
 
-SISTEMA_FINANCEIRO = {
-    "politica_reembolso": "Oferecemos reembolso total em até 30 dias após a compra para produtos digitais. Após 30 dias e até 60 dias, o reembolso é de 50%. Após 60 dias, não há reembolso.",
-    "formas_pagamento": "Aceitamos Cartão de Crédito (Visa, Master, Amex), PIX, Boleto Bancário e PayPal.",
-    "prazo_processamento_estorno": "Estornos no cartão de crédito são processados em até 5 dias úteis e podem levar até duas faturas para aparecer.",
-}
+DOMINIO_FINANCEIRO = "financeiro"
 
 # --- Ferramentas do Agente Financeiro ---
 
@@ -25,13 +24,9 @@ def consultar_politica_financeira(tipo_consulta: str) -> str:
     Returns:
         str: A informação da política correspondente.
     """
-    consulta_lower = tipo_consulta.lower()
-    if "reembolso" in consulta_lower or "estorno" in consulta_lower:
-        return SISTEMA_FINANCEIRO["politica_reembolso"]
-    if "pagamento" in consulta_lower:
-        return SISTEMA_FINANCEIRO["formas_pagamento"]
-    if "prazo" in consulta_lower:
-        return SISTEMA_FINANCEIRO["prazo_processamento_estorno"]
+    artigo = obter_base_conhecimento().melhor(tipo_consulta, DOMINIO_FINANCEIRO)
+    if artigo:
+        return artigo.texto
     return (
         "Não encontrei uma política específica para sua consulta. Poderia reformular?"
     )
@@ -101,8 +96,10 @@ class AgenteFinanceiro:
 
     def __init__(self):
         self.agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-4o-mini", temperature=0.2),
+            model=obter_llm("gpt-4o-mini", 0.2),
             tools=financeiro_tools,
             prompt=financeiro_prompt,
             state_schema=StateSuporteSimples,
+            # Mantém as mensagens da thread no orçamento de tokens
+            pre_model_hook=GerenciadorHistorico().como_no(),
         )
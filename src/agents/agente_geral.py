@@ -1,17 +1,14 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 from utils.state import StateSuporteSimples
+from utils.llm_pool import obter_llm
+from memory.historico import GerenciadorHistorico
+from utils.base_conhecimento import obter_base_conhecimento
 
 # --- Base de Conhecimento da Empresa ---
+# Artigos em agents/conhecimento/empresa.md (ver utils/base_conhecimento.py)
 
-INFO_EMPRESA = {
-    "horario_funcionamento": "Nosso horário de funcionamento é de Segunda a Sexta, das 8h às 18h, e aos Sábados, das 9h às 14h.",
-    "contato": "Você pode nos contatar pelo telefone (11) 1234-5678 ou pelo e-mail suporte@empresa.com.",
-    "endereco": "Nosso escritório fica na Rua Exemplo, 123 - São Paulo, SP.",
-    "garantia": "Oferecemos garantia de 12 meses para produtos físicos e 30 dias para serviços digitais.",
-    "entrega": "O prazo de entrega padrão para todo o Brasil é de 5 a 10 dias úteis.",
-}
+DOMINIO_EMPRESA = "empresa"
 
 # --- Ferramentas do Agente Geral ---
 
@@ -27,13 +24,9 @@ def buscar_informacao_empresa(tipo_info: str) -> str:
     Returns:
         str: A informação solicitada ou uma mensagem de que a informação não foi encontrada.
     """
-    info_lower = tipo_info.lower()
-    for key in INFO_EMPRESA:
-        if info_lower in key:
-            return INFO_EMPRESA[key]
-
-    if "funcionamento" in info_lower:
-        return INFO_EMPRESA["horario_funcionamento"]
+    artigo = obter_base_conhecimento().melhor(tipo_info, DOMINIO_EMPRESA)
+    if artigo:
+        return artigo.texto
 
     return "Desculpe, não encontrei essa informação específica. Posso ajudar com horários, contato, endereço, garantia ou entrega."
 
@@ -71,8 +64,10 @@ class AgenteGeral:
 
     def __init__(self):
         self.agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-4o-mini", temperature=0.4),
+            model=obter_llm("gpt-4o-mini", 0.4),
             tools=geral_tools,
             prompt=geral_prompt,
             state_schema=StateSuporteSimples,
+            # Mantém as mensagens da thread no orçamento de tokens
+            pre_model_hook=GerenciadorHistorico().como_no(),
         )
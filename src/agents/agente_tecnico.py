@@ -1,16 +1,17 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from utils.state import StateSuporteSimples
+from utils.state import CategoryType, StateSuporteSimples
+from utils.llm_pool import obter_llm
+from memory.historico import GerenciadorHistorico
+from utils.base_conhecimento import obter_base_conhecimento
+from utils.indice_semantico import obter_indice_semantico
+from utils.motor_regras import obter_motor_regras
 
 # --- Base de Conhecimento Técnico ---
+# Artigos em agents/conhecimento/tecnico.json (ver utils/base_conhecimento.py),
+# também indexados por embeddings em utils/indice_semantico.py
 
-KNOWLEDGE_BASE_TECNICO = {
-    "login": "Verifique se o email e a senha estão corretos e tente redefinir a senha através do link 'Esqueci minha senha'.",
-    "conexao": "Reinicie seu modem e roteador. Verifique também se outros dispositivos na mesma rede estão funcionando.",
-    "erro": "Tente limpar o cache e os cookies do seu navegador e recarregar a página. Se o erro persistir, nos informe o código do erro.",
-    "lentidao": "Feche outros programas ou abas do navegador que não esteja usando e verifique o uso de CPU no gerenciador de tarefas.",
-}
+DOMINIO_TECNICO = "tecnico"
 
 # --- Ferramentas do Agente Técnico ---
 
@@ -26,10 +27,16 @@ def buscar_solucao_tecnica(problema: str) -> str:
     Returns:
         str: A solução encontrada na base de conhecimento ou uma mensagem indicando que nada foi encontrado.
     """
-    problema_lower = problema.lower()
-    for keyword, solucao in KNOWLEDGE_BASE_TECNICO.items():
-        if keyword in problema_lower:
-            return f"Solução encontrada: {solucao}"
+    # Busca semântica (pega paráfrases); sem embedder, só palavras-chave
+    indice = obter_indice_semantico(DOMINIO_TECNICO)
+    if indice is not None:
+        encontrados = indice.buscar(problema, k=1)
+        if encontrados:
+            return f"Solução encontrada: {encontrados[0][0].texto}"
+
+    artigo = obter_base_conhecimento().melhor(problema, DOMINIO_TECNICO)
+    if artigo:
+        return f"Solução encontrada: {artigo.texto}"
     return "Nenhuma solução específica encontrada na base de conhecimento. Por favor, descreva o problema com mais detalhes."
 
 
@@ -44,17 +51,8 @@ def avaliar_complexidade_tecnica(query: str) -> str:
     Returns:
         str: Retorna 'escalate' se for complexo, ou 'continue' caso contrário.
     """
-    palavras_complexas = [
-        "sistema travou",
-        "erro crítico",
-        "dados perdidos",
-        "servidor",
-        "banco de dados",
-    ]
-    query_lower = query.lower()
-    if any(palavra in query_lower for palavra in palavras_complexas):
-        return "escalate"
-    return "continue"
+    decisao = obter_motor_regras().avaliar(CategoryType.TECHNICAL, "", query)
+    return "escalate" if decisao.escalar else "continue"
 
 
 # --- Lista de Tools do Agente Técnico ---
@@ -93,8 +91,10 @@ class AgenteTecnico:
 
     def __init__(self):
         self.agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-4o-mini", temperature=0.3),
+            model=obter_llm("gpt-4o-mini", 0.3),
             tools=tecnico_tools,
             prompt=tecnico_prompt,
             state_schema=StateSuporteSimples,
+            # Mantém as mensagens da thread no orçamento de tokens
+            pre_model_hook=GerenciadorHistorico().como_no(),
         )
@@ -0,0 +1,356 @@
+"""
+Classificador Local (fast-path sem LLM)
+N-gramas com hashing + TF-IDF e regressão logística em NumPy para prever
+categoria e sentimento em microssegundos. Treinado com os tickets já
+resolvidos que estão nos checkpoints do workflow (src/memory/conversas.db).
+
+Uso:
+    python -m agents.classificador_local treinar [--db CAMINHO] [--jsonl ARQUIVO]
+    python -m agents.classificador_local prever "Não consigo fazer login"
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.state import CategoryType, SentimentType
+from utils.texto import normalizar_texto
+
+# === CONFIGURAÇÃO ===
+
+MODELO_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "modelos", "classificador_local.npz"
+)
+DIMENSAO_HASH = 2**15
+LIMIAR_CATEGORIA = float(os.getenv("CLASSIFICADOR_LOCAL_LIMIAR_CATEGORIA", 0.9))
+LIMIAR_SENTIMENTO = float(os.getenv("CLASSIFICADOR_LOCAL_LIMIAR_SENTIMENTO", 0.9))
+
+CATEGORIAS = [c.value for c in CategoryType]
+SENTIMENTOS = [s.value for s in SentimentType]
+
+
+# === FEATURES ===
+
+
+def _ngramas(texto: str) -> List[str]:
+    """Palavras, bigramas de palavras e trigramas de caracteres"""
+    palavras = texto.split()
+    features = [f"w:{p}" for p in palavras]
+    features += [f"b:{a}_{b}" for a, b in zip(palavras, palavras[1:])]
+    for palavra in palavras:
+        marcada = f"<{palavra}>"
+        features += [f"c:{marcada[i:i + 3]}" for i in range(len(marcada) - 2)]
+    return features
+
+
+def _hash_features(texto: str, dimensao: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Converte o texto em (índices, contagens) no espaço de hashing"""
+    indices = [
+        zlib.crc32(f.encode("utf-8")) % dimensao
+        for f in _ngramas(normalizar_texto(texto))
+    ]
+    if not indices:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    unicos, contagens = np.unique(np.asarray(indices, dtype=np.int64), return_counts=True)
+    return unicos, contagens.astype(np.float32)
+
+
+def _tfidf(indices: np.ndarray, contagens: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """Pondera as contagens por IDF (tf sublinear) e normaliza em L2"""
+    valores = (1.0 + np.log(contagens)) * idf[indices]
+    norma = np.linalg.norm(valores)
+    return valores / norma if norma > 0 else valores
+
+
+# === REGRESSÃO LOGÍSTICA ESPARSA ===
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=0, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=0, keepdims=True)
+
+
+def _treinar_logistica(
+    linhas: np.ndarray,
+    indices: np.ndarray,
+    valores: np.ndarray,
+    n_amostras: int,
+    rotulos: np.ndarray,
+    n_classes: int,
+    dimensao: int,
+    epocas: int = 300,
+    taxa: float = 1.0,
+    l2: float = 1e-4,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Gradiente descendente em lote sobre a matriz esparsa (formato COO)"""
+    pesos = np.zeros((n_classes, dimensao), dtype=np.float32)
+    vies = np.zeros(n_classes, dtype=np.float32)
+    alvo = np.zeros((n_classes, n_amostras), dtype=np.float32)
+    alvo[rotulos, np.arange(n_amostras)] = 1.0
+
+    for _ in range(epocas):
+        scores = np.zeros((n_classes, n_amostras), dtype=np.float32)
+        for c in range(n_classes):
+            scores[c] = np.bincount(
+                linhas, weights=pesos[c, indices] * valores, minlength=n_amostras
+            )
+        scores += vies[:, None]
+        residuo = (_softmax(scores) - alvo) / n_amostras
+
+        for c in range(n_classes):
+            gradiente = np.bincount(
+                indices, weights=residuo[c, linhas] * valores, minlength=dimensao
+            )
+            pesos[c] -= taxa * (gradiente + l2 * pesos[c])
+        vies -= taxa * residuo.sum(axis=1)
+
+    return pesos, vies
+
+
+# === CLASSIFICADOR ===
+
+
+class ClassificadorLocal:
+    """Prevê categoria e sentimento localmente, com a confiança de cada um"""
+
+    def __init__(
+        self,
+        idf: np.ndarray,
+        pesos_categoria: np.ndarray,
+        vies_categoria: np.ndarray,
+        pesos_sentimento: np.ndarray,
+        vies_sentimento: np.ndarray,
+        limiar_categoria: float = LIMIAR_CATEGORIA,
+        limiar_sentimento: float = LIMIAR_SENTIMENTO,
+    ):
+        self.idf = idf
+        self.dimensao = idf.shape[0]
+        self.pesos_categoria = pesos_categoria
+        self.vies_categoria = vies_categoria
+        self.pesos_sentimento = pesos_sentimento
+        self.vies_sentimento = vies_sentimento
+        self.limiar_categoria = limiar_categoria
+        self.limiar_sentimento = limiar_sentimento
+
+    @staticmethod
+    def _prever(
+        pesos: np.ndarray,
+        vies: np.ndarray,
+        indices: np.ndarray,
+        valores: np.ndarray,
+        classes: List[str],
+    ) -> Tuple[str, float]:
+        probabilidades = _softmax((pesos[:, indices] @ valores + vies)[:, None])[:, 0]
+        melhor = int(np.argmax(probabilidades))
+        return classes[melhor], float(probabilidades[melhor])
+
+    def classificar(self, query: str) -> Dict[str, Any]:
+        """
+        Classifica a consulta sem chamar o LLM.
+
+        Returns:
+            dict: 'categoria', 'confianca_categoria', 'categoria_confiavel',
+                'sentimento', 'confianca_sentimento' e 'sentimento_confiavel'.
+        """
+        indices, contagens = _hash_features(query, self.dimensao)
+        valores = _tfidf(indices, contagens, self.idf)
+
+        categoria, conf_categoria = self._prever(
+            self.pesos_categoria, self.vies_categoria, indices, valores, CATEGORIAS
+        )
+        sentimento, conf_sentimento = self._prever(
+            self.pesos_sentimento, self.vies_sentimento, indices, valores, SENTIMENTOS
+        )
+        return {
+            "categoria": categoria,
+            "confianca_categoria": conf_categoria,
+            "categoria_confiavel": conf_categoria >= self.limiar_categoria,
+            "sentimento": sentimento,
+            "confianca_sentimento": conf_sentimento,
+            "sentimento_confiavel": conf_sentimento >= self.limiar_sentimento,
+        }
+
+    # === PERSISTÊNCIA ===
+
+    def salvar(self, caminho: str = MODELO_PATH):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        np.savez_compressed(
+            caminho,
+            idf=self.idf,
+            pesos_categoria=self.pesos_categoria,
+            vies_categoria=self.vies_categoria,
+            pesos_sentimento=self.pesos_sentimento,
+            vies_sentimento=self.vies_sentimento,
+        )
+
+    @classmethod
+    def carregar(cls, caminho: str = MODELO_PATH, **limiares) -> "ClassificadorLocal":
+        with np.load(caminho) as dados:
+            return cls(
+                idf=dados["idf"],
+                pesos_categoria=dados["pesos_categoria"],
+                vies_categoria=dados["vies_categoria"],
+                pesos_sentimento=dados["pesos_sentimento"],
+                vies_sentimento=dados["vies_sentimento"],
+                **limiares,
+            )
+
+    # === TREINO ===
+
+    @classmethod
+    def treinar(
+        cls,
+        exemplos: Iterable[Tuple[str, str, str]],
+        dimensao: int = DIMENSAO_HASH,
+        **limiares,
+    ) -> "ClassificadorLocal":
+        """
+        Treina a partir de tuplas (query, categoria, sentimento).
+        """
+        exemplos = [
+            (q, c, s) for q, c, s in exemplos if c in CATEGORIAS and s in SENTIMENTOS
+        ]
+        if not exemplos:
+            raise ValueError("Nenhum exemplo rotulado para treinar o classificador")
+
+        features = [_hash_features(q, dimensao) for q, _, _ in exemplos]
+        n_amostras = len(exemplos)
+
+        # IDF suavizado no espaço de hashing
+        frequencia_doc = np.zeros(dimensao, dtype=np.float32)
+        for indices, _ in features:
+            frequencia_doc[indices] += 1
+        idf = (np.log((1 + n_amostras) / (1 + frequencia_doc)) + 1).astype(np.float32)
+
+        linhas, indices, valores = [], [], []
+        for linha, (idx, contagens) in enumerate(features):
+            linhas.append(np.full(idx.shape[0], linha, dtype=np.int64))
+            indices.append(idx)
+            valores.append(_tfidf(idx, contagens, idf))
+        linhas = np.concatenate(linhas)
+        indices = np.concatenate(indices)
+        valores = np.concatenate(valores).astype(np.float32)
+
+        rotulos_cat = np.array([CATEGORIAS.index(c) for _, c, _ in exemplos])
+        rotulos_sent = np.array([SENTIMENTOS.index(s) for _, _, s in exemplos])
+
+        pesos_cat, vies_cat = _treinar_logistica(
+            linhas, indices, valores, n_amostras, rotulos_cat, len(CATEGORIAS), dimensao
+        )
+        pesos_sent, vies_sent = _treinar_logistica(
+            linhas, indices, valores, n_amostras, rotulos_sent, len(SENTIMENTOS), dimensao
+        )
+        return cls(idf, pesos_cat, vies_cat, pesos_sent, vies_sent, **limiares)
+
+
+# === DADOS DE TREINO ===
+
+
+def _valor(item: Any) -> Any:
+    return getattr(item, "value", item)
+
+
+def carregar_exemplos_checkpoints(db_path: str) -> List[Tuple[str, str, str]]:
+    """
+    Extrai (query, categoria, sentimento) dos tickets resolvidos gravados
+    pelo checkpointer do workflow. Um exemplo por (thread, consulta).
+
+    Só entram tickets com os dois rótulos definidos pelo LLM: os do próprio
+    classificador (fast-path) e os copiados de execuções coalescidas
+    reforçariam os erros do modelo. Checkpoints sem a origem registrada
+    (anteriores a ela) ficam de fora pelo mesmo motivo.
+    """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from memory.serializador import SerializadorCompacto
+
+    conn = sqlite3.connect(db_path)
+    try:
+        vistos = set()
+        exemplos = []
+        # O serializador compacto também lê checkpoints no formato padrão
+        for checkpoint in SqliteSaver(conn, serde=SerializadorCompacto()).list(None):
+            valores = checkpoint.checkpoint.get("channel_values", {})
+            query = valores.get("query")
+            if not query or not valores.get("response"):
+                continue
+            origens = (
+                _valor(valores.get("origem_categoria")),
+                _valor(valores.get("origem_sentimento")),
+            )
+            if origens != ("llm", "llm"):
+                continue
+            chave = (checkpoint.config["configurable"]["thread_id"], query)
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            exemplos.append(
+                (query, _valor(valores.get("category")), _valor(valores.get("sentiment")))
+            )
+        return exemplos
+    finally:
+        conn.close()
+
+
+def carregar_exemplos_jsonl(caminho: str) -> List[Tuple[str, str, str]]:
+    """Lê exemplos rotulados de um JSONL com 'query', 'categoria' e 'sentimento'"""
+    exemplos = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                item = json.loads(linha)
+                exemplos.append((item["query"], item["categoria"], item["sentimento"]))
+    return exemplos
+
+
+def carregar_classificador(
+    caminho: str = MODELO_PATH, **limiares
+) -> Optional[ClassificadorLocal]:
+    """Carrega o modelo treinado, ou None se ainda não houver um"""
+    if not os.path.exists(caminho):
+        return None
+    return ClassificadorLocal.carregar(caminho, **limiares)
+
+
+# === CLI ===
+
+
+def main():
+    from memory.workflow_memory import db_path
+
+    parser = argparse.ArgumentParser(description="Classificador local de triagem")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    treinar = sub.add_parser("treinar", help="Treina com os tickets resolvidos")
+    treinar.add_argument("--db", default=db_path, help="Banco de checkpoints")
+    treinar.add_argument("--jsonl", help="Dataset rotulado adicional (JSONL)")
+    treinar.add_argument("--saida", default=MODELO_PATH, help="Arquivo do modelo")
+
+    prever = sub.add_parser("prever", help="Classifica uma consulta")
+    prever.add_argument("query")
+    prever.add_argument("--modelo", default=MODELO_PATH)
+
+    args = parser.parse_args()
+
+    if args.comando == "treinar":
+        exemplos = []
+        if os.path.exists(args.db):
+            exemplos += carregar_exemplos_checkpoints(args.db)
+        if args.jsonl:
+            exemplos += carregar_exemplos_jsonl(args.jsonl)
+        print(f"📚 {len(exemplos)} exemplos rotulados encontrados")
+        classificador = ClassificadorLocal.treinar(exemplos)
+        classificador.salvar(args.saida)
+        print(f"✅ Modelo salvo em: {args.saida}")
+    else:
+        classificador = ClassificadorLocal.carregar(args.modelo)
+        print(json.dumps(classificador.classificar(args.query), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
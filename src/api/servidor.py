@@ -0,0 +1,299 @@
+"""
+Serviço HTTP (FastAPI) para o Sistema de Suporte Multi-Agente
+O workflow é compilado uma única vez por worker, no startup
+
+Uso (a partir da pasta src):
+    python -m api.servidor --port 8000 --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from graph.escalonador import EscalonadorTickets, FilaCheia
+from graph.workflow_suporte import WorkflowSuporteMultiAgente
+from memory.cache_classificacao import cache_classificacao
+from memory.retencao import GerenciadorRetencao
+from memory.workflow_memory import obter_checkpointer, obter_store
+from utils.base_conhecimento import obter_base_conhecimento
+from utils.indice_semantico import obter_indice_semantico
+from utils.llm_pool import afechar_pool, estatisticas_pool
+from utils.motor_regras import obter_motor_regras
+from utils.observabilidade import RegistroMetricas, configurar_logging, metricas
+
+MAX_CONCORRENCIA_LOTE = int(os.getenv("API_MAX_CONCORRENCIA_LOTE", 20))
+MAX_CONSULTAS_LOTE = int(os.getenv("API_MAX_CONSULTAS_LOTE", 500))
+RETENCAO_AUTOMATICA = os.getenv("RETENCAO_AUTOMATICA", "1") == "1"
+# Fila por prioridade na frente de POST /consultas (graph/escalonador.py)
+ESCALONADOR_ATIVO = os.getenv("ESCALONADOR_ATIVO", "1") == "1"
+# Sugestão de nova tentativa (Retry-After) quando a fila está cheia
+ESCALONADOR_RETRY_AFTER = os.getenv("ESCALONADOR_RETRY_AFTER", "5")
+
+logger = logging.getLogger(__name__)
+
+
+# === MODELOS DE REQUISIÇÃO ===
+
+
+class ConsultaRequest(BaseModel):
+    query: str = Field(min_length=1, description="Consulta do cliente")
+    thread_id: Optional[str] = Field(
+        default=None, description="Conversa (gerada se omitida)"
+    )
+
+
+class LoteRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, description="Consultas do lote")
+    thread_ids: Optional[List[str]] = None
+    max_concorrencia: int = Field(default=MAX_CONCORRENCIA_LOTE, ge=1, le=200)
+
+
+# === MÉTRICAS DO SERVIÇO ===
+
+
+def _estatisticas_de(obter):
+    """Coletor que lê .estatisticas() do objeto (vazio se ele não tiver)"""
+
+    def coletar() -> Dict[str, Any]:
+        objeto = obter()
+        return objeto.estatisticas() if hasattr(objeto, "estatisticas") else {}
+
+    return coletar
+
+
+class MetricasServico:
+    """
+    Contadores e histograma de duração por endpoint, no registro de
+    utils.observabilidade junto com as métricas dos nós e do LLM
+    """
+
+    def __init__(self, registro: RegistroMetricas = metricas):
+        self.registro = registro
+        self.em_andamento = 0
+        self.inicio = time.time()
+        registro.declarar(
+            "suporte_requisicoes_total", "counter", "Requisições por endpoint"
+        )
+        registro.declarar(
+            "suporte_erros_total", "counter", "Requisições com erro por endpoint"
+        )
+        registro.declarar(
+            "suporte_requisicao_segundos", "histogram", "Duração por endpoint"
+        )
+        registro.registrar_coletor("suporte", self._estado)
+        registro.registrar_coletor("suporte_llm_pool", estatisticas_pool)
+        registro.registrar_coletor(
+            "suporte_cache_classificacao", cache_classificacao.estatisticas
+        )
+        registro.registrar_coletor(
+            "suporte_motor_regras", lambda: obter_motor_regras().estatisticas()
+        )
+        registro.registrar_coletor(
+            "suporte_checkpointer", _estatisticas_de(obter_checkpointer)
+        )
+        registro.registrar_coletor("suporte_store", _estatisticas_de(obter_store))
+
+    def _estado(self) -> Dict[str, Any]:
+        return {
+            "requisicoes_em_andamento": self.em_andamento,
+            "uptime_segundos": round(time.time() - self.inicio, 1),
+        }
+
+    def registrar(self, endpoint: str, duracao: float, erro: bool):
+        self.registro.incrementar("suporte_requisicoes_total", endpoint=endpoint)
+        self.registro.observar(
+            "suporte_requisicao_segundos", duracao, endpoint=endpoint
+        )
+        if erro:
+            self.registro.incrementar("suporte_erros_total", endpoint=endpoint)
+
+    def prometheus(self) -> str:
+        return self.registro.prometheus()
+
+    def json_linhas(self) -> str:
+        return self.registro.json_linhas()
+
+
+# === CICLO DE VIDA ===
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Compila o workflow uma vez por worker e libera recursos no shutdown"""
+    configurar_logging()
+    logger.info("Worker %d: criando workflow", os.getpid())
+    app.state.workflow = WorkflowSuporteMultiAgente()
+    obter_base_conhecimento()  # compila o índice antes da primeira requisição
+    # Abre os embeddings (mmap) da base técnica e carrega o modelo de
+    # embeddings, para a primeira consulta técnica não pagar o carregamento
+    indice_tecnico = obter_indice_semantico("tecnico")
+    if indice_tecnico is not None:
+        indice_tecnico.buscar("aquecimento")
+    app.state.metricas = MetricasServico()
+    app.state.escalonador = None
+    if ESCALONADOR_ATIVO:
+        app.state.escalonador = EscalonadorTickets(app.state.workflow)
+        app.state.escalonador.iniciar()
+        metricas.registrar_coletor("suporte_fila", app.state.escalonador.estatisticas)
+    retencao = GerenciadorRetencao()
+    if RETENCAO_AUTOMATICA:
+        retencao.iniciar()
+    logger.info("Worker %d: pronto", os.getpid())
+    yield
+    logger.info("Worker %d: encerrando", os.getpid())
+    if app.state.escalonador is not None:
+        await app.state.escalonador.parar()
+    retencao.parar()
+    await afechar_pool()
+    cache_classificacao.fechar()
+    checkpointer = obter_checkpointer()
+    if hasattr(checkpointer, "fechar"):
+        checkpointer.fechar()
+    store = obter_store()
+    if hasattr(store, "fechar"):
+        store.fechar()
+
+
+app = FastAPI(title="Sistema de Suporte Multi-Agente", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def medir_requisicoes(request: Request, call_next):
+    """Registra contagem, erros e duração de cada requisição"""
+    metricas: MetricasServico = request.app.state.metricas
+    metricas.em_andamento += 1
+    inicio = time.perf_counter()
+    erro = True
+    try:
+        response = await call_next(request)
+        erro = response.status_code >= 500
+        return response
+    finally:
+        metricas.em_andamento -= 1
+        metricas.registrar(request.url.path, time.perf_counter() - inicio, erro)
+
+
+# === ENDPOINTS ===
+
+
+@app.get("/health")
+async def health() -> Dict[str, str]:
+    return {"status": "ok"}
+
+
+@app.post("/consultas")
+async def processar_consulta(request: Request, body: ConsultaRequest) -> Dict[str, Any]:
+    """
+    Processa uma consulta e devolve o resultado completo. Com o escalonador
+    ativo, o ticket espera a vez na fila por prioridade (503 se ela estiver cheia).
+    """
+    workflow: WorkflowSuporteMultiAgente = request.app.state.workflow
+    escalonador: Optional[EscalonadorTickets] = request.app.state.escalonador
+    thread_id = body.thread_id or f"api_{uuid.uuid4().hex}"
+    if escalonador is None:
+        return await workflow.aprocessar_consulta(body.query, thread_id)
+    try:
+        return await escalonador.processar(body.query, thread_id)
+    except FilaCheia as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": ESCALONADOR_RETRY_AFTER},
+        )
+
+
+@app.post("/consultas/lote")
+async def processar_lote(request: Request, body: LoteRequest) -> List[Dict[str, Any]]:
+    """Processa várias consultas concorrentemente, uma thread_id por consulta"""
+    if len(body.queries) > MAX_CONSULTAS_LOTE:
+        raise HTTPException(
+            status_code=413, detail=f"Máximo de {MAX_CONSULTAS_LOTE} consultas por lote"
+        )
+    if body.thread_ids is not None and len(body.thread_ids) != len(body.queries):
+        raise HTTPException(
+            status_code=422, detail="thread_ids deve ter o mesmo tamanho de queries"
+        )
+    workflow: WorkflowSuporteMultiAgente = request.app.state.workflow
+    return await workflow.aprocessar_consultas(
+        body.queries, body.thread_ids, max_concorrencia=body.max_concorrencia
+    )
+
+
+@app.post("/consultas/stream")
+async def stream_consulta(request: Request, body: ConsultaRequest) -> StreamingResponse:
+    """Processa a consulta enviando os eventos do workflow via SSE"""
+    workflow: WorkflowSuporteMultiAgente = request.app.state.workflow
+    thread_id = body.thread_id or f"api_{uuid.uuid4().hex}"
+
+    async def eventos_sse() -> AsyncIterator[str]:
+        try:
+            async for evento in workflow.astream_consulta(body.query, thread_id):
+                dados = json.dumps(evento, ensure_ascii=False, default=str)
+                yield f"event: {evento['evento']}\ndata: {dados}\n\n"
+        except Exception as e:
+            dados = json.dumps({"evento": "erro", "erro": str(e)}, ensure_ascii=False)
+            yield f"event: erro\ndata: {dados}\n\n"
+
+    return StreamingResponse(
+        eventos_sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request, formato: str = "prometheus") -> str:
+    """
+    Métricas do worker em texto do Prometheus (ou formato=json: JSON lines).
+
+    Com --workers N, cada processo tem as suas: a resposta vem do worker que
+    atendeu a requisição, então o Prometheus deve raspar cada um (ou somar
+    as séries) para ter o total do serviço.
+    """
+    if formato == "json":
+        return PlainTextResponse(
+            request.app.state.metricas.json_linhas(), media_type="application/x-ndjson"
+        )
+    return request.app.state.metricas.prometheus()
+
+
+# === EXECUÇÃO ===
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor HTTP do suporte multi-agente")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("API_WORKERS", 1))
+    )
+    parser.add_argument(
+        "--timeout-shutdown",
+        type=int,
+        default=30,
+        help="Segundos para concluir requisições em andamento ao encerrar",
+    )
+    args = parser.parse_args()
+
+    uvicorn.run(
+        "api.servidor:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.timeout_shutdown,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Avaliação do roteamento com tickets rotulados
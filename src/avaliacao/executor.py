@@ -0,0 +1,469 @@
+"""
+Avaliação do Workflow com Tickets Rotulados
+Executa um dataset JSONL de tickets rotulados pelo WorkflowSuporteMultiAgente
+em um pool de processos e mede a acurácia de categoria e de escalação, a
+matriz de confusão, tickets/s e a latência por ticket
+
+Cada linha do dataset é um ticket:
+    {"id": "t001", "query": "...", "categoria": "Technical", "escalado": false}
+("sentimento" e "prioridade" são opcionais e, se presentes, também são
+avaliados). Cada processo tem seu próprio workflow, banco de checkpoints
+temporário e loop asyncio; cada ticket roda na sua própria thread_id e é
+interrompido após --timeout segundos.
+
+Uso (a partir da pasta src):
+    python -m avaliacao.executor [--dataset avaliacao/tickets_rotulados.jsonl]
+        [--processos 4] [--concorrencia 8] [--timeout 60]
+        [--llm-falso] [--saida resultados.jsonl] [--json]
+        [--min-acuracia-categoria 0.9] [--min-acuracia-escalacao 0.95]
+
+Com os mínimos definidos, o processo termina com código 1 se a acurácia
+ficar abaixo deles (útil para validar mudanças nas regras de roteamento).
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from benchmarks.llm_falso import EmbedderFalso, fabrica_falsa
+from graph.workflow_suporte import WorkflowSuporteMultiAgente
+from memory.cache_classificacao import cache_classificacao
+from memory.serializador import criar_serializador
+from memory.workflow_memory import SqliteSaverPool
+from utils.indice_semantico import definir_embedder, obter_indice_semantico
+from utils.llm_pool import definir_fabrica_llm
+from utils.observabilidade import percentis
+
+DATASET_PADRAO = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "tickets_rotulados.jsonl"
+)
+# Rótulos avaliados: (campo do dataset, campo do resultado do workflow)
+ROTULOS = {
+    "categoria": "category",
+    "sentimento": "sentiment",
+    "prioridade": "priority",
+    "escalado": "escalated",
+}
+OBRIGATORIOS = ("query", "categoria", "escalado")
+
+
+@dataclasses.dataclass
+class ConfiguracaoAvaliacao:
+    processos: int = os.cpu_count() or 2
+    concorrencia: int = 8  # tickets simultâneos por processo
+    timeout: float = 60.0  # segundos por ticket
+    tamanho_bloco: int = 25  # tickets enviados a um processo de cada vez
+    llm_falso: bool = False
+    latencia_llm: float = 0.005
+    usar_cache: bool = False
+    usar_classificador_local: bool = True
+    execucao: str = ""  # prefixo das thread_ids (gerado se vazio)
+    pasta: str = ""  # checkpoints e cache de cada processo (temporária)
+
+
+# === DATASET ===
+
+
+def carregar_dataset(caminho: str) -> List[Dict[str, Any]]:
+    """Lê e valida os tickets (um JSON por linha; linhas vazias são ignoradas)"""
+    tickets, ids = [], set()
+    with open(caminho, encoding="utf-8") as arquivo:
+        for numero, linha in enumerate(arquivo, 1):
+            if not linha.strip():
+                continue
+            try:
+                ticket = json.loads(linha)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{caminho}:{numero}: JSON inválido ({e})") from e
+            faltando = [campo for campo in OBRIGATORIOS if campo not in ticket]
+            if faltando:
+                raise ValueError(f"{caminho}:{numero}: faltam campos {faltando}")
+            ticket["id"] = str(ticket.get("id", numero))
+            if ticket["id"] in ids:
+                raise ValueError(f"{caminho}:{numero}: id repetido {ticket['id']!r}")
+            ids.add(ticket["id"])
+            tickets.append(ticket)
+    return tickets
+
+
+# === WORKER (um por processo) ===
+
+_config: Optional[ConfiguracaoAvaliacao] = None
+_workflow: Optional[WorkflowSuporteMultiAgente] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _inicializar_worker(config: ConfiguracaoAvaliacao):
+    """Cria o workflow do processo, com checkpoints e cache próprios"""
+    global _config, _workflow, _loop
+    _config = config
+    if config.llm_falso:
+        definir_fabrica_llm(fabrica_falsa(config.latencia_llm))
+        # Sem modelo de embeddings real; o índice fica na pasta da execução
+        definir_embedder(EmbedderFalso(), pasta=config.pasta)
+    # Abre o índice e carrega o embedder antes do primeiro ticket (fora da
+    # latência medida), como no startup do servidor
+    indice = obter_indice_semantico("tecnico")
+    if indice is not None:
+        indice.buscar("aquecimento")
+    pid = os.getpid()
+    if not config.usar_cache:
+        cache_classificacao.fechar()
+        cache_classificacao.db_path = os.path.join(config.pasta, f"cache_{pid}.db")
+    # Mesmo serializador da produção (CHECKPOINTER_SERIALIZADOR)
+    checkpointer = SqliteSaverPool(
+        os.path.join(config.pasta, f"checkpoints_{pid}.db"),
+        serde=criar_serializador(),
+    )
+    _workflow = WorkflowSuporteMultiAgente(
+        usar_classificador_local=config.usar_classificador_local,
+        checkpointer=checkpointer,
+    )
+    # Um loop por processo: o llm_pool tem um pool de conexões por loop, então
+    # reutilizar o mesmo loop mantém as conexões keep-alive entre tickets
+    _loop = asyncio.new_event_loop()
+
+
+def _valor(valor: Any) -> Any:
+    return getattr(valor, "value", valor)
+
+
+async def _avaliar_ticket(
+    ticket: Dict[str, Any], semaforo: asyncio.Semaphore
+) -> Dict[str, Any]:
+    thread_id = f"aval_{_config.execucao}_{ticket['id']}"
+    obtido, erro = None, None
+    async with semaforo:
+        inicio = time.perf_counter()
+        try:
+            resultado = await asyncio.wait_for(
+                _workflow.aprocessar_consulta(ticket["query"], thread_id),
+                _config.timeout,
+            )
+            obtido = {
+                rotulo: _valor(resultado[campo]) for rotulo, campo in ROTULOS.items()
+            }
+            obtido["agente"] = _valor(resultado["agent_used"])
+        except asyncio.TimeoutError:
+            erro = "timeout"
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+        latencia = time.perf_counter() - inicio
+    return {
+        "id": ticket["id"],
+        "query": ticket["query"],
+        "thread_id": thread_id,
+        "esperado": {rotulo: ticket[rotulo] for rotulo in ROTULOS if rotulo in ticket},
+        "obtido": obtido,
+        "erro": erro,
+        "latencia_s": round(latencia, 4),
+    }
+
+
+def _avaliar_bloco(tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Processa um bloco de tickets no processo atual (até `concorrencia` juntos)"""
+
+    async def _executar():
+        semaforo = asyncio.Semaphore(_config.concorrencia)
+        return await asyncio.gather(*(_avaliar_ticket(t, semaforo) for t in tickets))
+
+    return _loop.run_until_complete(_executar())
+
+
+def _falha(ticket: Dict[str, Any], erro: BaseException) -> Dict[str, Any]:
+    """Resultado de um ticket cujo processo falhou antes de responder"""
+    return {
+        "id": ticket["id"],
+        "query": ticket["query"],
+        "thread_id": None,
+        "esperado": {rotulo: ticket[rotulo] for rotulo in ROTULOS if rotulo in ticket},
+        "obtido": None,
+        "erro": f"{type(erro).__name__}: {erro}",
+        "latencia_s": 0.0,
+    }
+
+
+# === EXECUÇÃO ===
+
+
+def avaliar(
+    tickets: List[Dict[str, Any]],
+    config: Optional[ConfiguracaoAvaliacao] = None,
+    progresso: bool = False,
+) -> Dict[str, Any]:
+    """
+    Avalia os tickets em um pool de processos e calcula as métricas.
+
+    Returns:
+        dict: "configuracao", "metricas" (ver calcular_metricas) e
+            "resultados" (um por ticket, na ordem do dataset).
+    """
+    config = config or ConfiguracaoAvaliacao()
+    execucao = config.execucao or uuid.uuid4().hex[:8]
+    blocos = [
+        tickets[i : i + config.tamanho_bloco]
+        for i in range(0, len(tickets), config.tamanho_bloco)
+    ]
+    resultados: List[Dict[str, Any]] = []
+
+    inicio = time.perf_counter()
+    with tempfile.TemporaryDirectory() as pasta:
+        config = dataclasses.replace(config, execucao=execucao, pasta=pasta)
+        with ProcessPoolExecutor(
+            max_workers=min(config.processos, len(blocos)) or 1,
+            initializer=_inicializar_worker,
+            initargs=(config,),
+        ) as pool:
+            futuros = {pool.submit(_avaliar_bloco, bloco): bloco for bloco in blocos}
+            for futuro in as_completed(futuros):
+                try:
+                    resultados.extend(futuro.result())
+                except Exception as e:  # processo encerrado, erro na inicialização
+                    resultados.extend(_falha(t, e) for t in futuros[futuro])
+                if progresso:
+                    print(
+                        f"⏳ {len(resultados)}/{len(tickets)} tickets",
+                        file=sys.stderr,
+                    )
+    segundos = time.perf_counter() - inicio
+
+    ordem = {ticket["id"]: i for i, ticket in enumerate(tickets)}
+    resultados.sort(key=lambda r: ordem[r["id"]])
+    return {
+        "configuracao": {
+            **{
+                campo: valor
+                for campo, valor in dataclasses.asdict(config).items()
+                if campo != "pasta"
+            },
+            "tickets": len(tickets),
+        },
+        "metricas": calcular_metricas(resultados, segundos),
+        "resultados": resultados,
+    }
+
+
+# === MÉTRICAS ===
+
+
+def _acuracia(resultados: List[Dict[str, Any]], rotulo: str) -> Dict[str, Any]:
+    """Acertos sobre os tickets rotulados (tickets com erro contam como erro)"""
+    rotulados = [r for r in resultados if rotulo in r["esperado"]]
+    acertos = sum(
+        1
+        for r in rotulados
+        if r["obtido"] is not None and r["obtido"][rotulo] == r["esperado"][rotulo]
+    )
+    total = len(rotulados)
+    return {
+        "acertos": acertos,
+        "total": total,
+        "acuracia": round(acertos / total, 4) if total else None,
+    }
+
+
+def matriz_confusao(
+    resultados: List[Dict[str, Any]], rotulo: str = "categoria"
+) -> Dict[str, Dict[str, int]]:
+    """{esperado: {obtido: n}}; tickets sem resposta entram na coluna "erro\" """
+    matriz: Dict[str, Counter] = defaultdict(Counter)
+    for r in resultados:
+        if rotulo not in r["esperado"]:
+            continue
+        obtido = "erro" if r["obtido"] is None else str(r["obtido"][rotulo])
+        matriz[str(r["esperado"][rotulo])][obtido] += 1
+    return {esperado: dict(linha) for esperado, linha in sorted(matriz.items())}
+
+
+def precisao_revocacao(matriz: Dict[str, Dict[str, int]]) -> Dict[str, Dict]:
+    """Precisão e revocação de cada classe a partir da matriz de confusão"""
+    previstos: Counter = Counter()
+    for linha in matriz.values():
+        previstos.update(linha)
+    metricas = {}
+    for classe, linha in matriz.items():
+        acertos = linha.get(classe, 0)
+        metricas[classe] = {
+            "precisao": (
+                round(acertos / previstos[classe], 4) if previstos[classe] else None
+            ),
+            "revocacao": round(acertos / sum(linha.values()), 4),
+            "suporte": sum(linha.values()),
+        }
+    return metricas
+
+
+def calcular_metricas(
+    resultados: List[Dict[str, Any]], segundos: float
+) -> Dict[str, Any]:
+    """Acurácias, matriz de confusão, vazão, latência e divergências"""
+    matriz = matriz_confusao(resultados, "categoria")
+    divergencias = []
+    for r in resultados:
+        if r["obtido"] is None:
+            divergencias.append({"id": r["id"], "erro": r["erro"]})
+            continue
+        campos = {
+            rotulo: [esperado, r["obtido"][rotulo]]
+            for rotulo, esperado in r["esperado"].items()
+            if r["obtido"][rotulo] != esperado
+        }
+        if campos:
+            divergencias.append({"id": r["id"], **campos})
+    n = len(resultados)
+    return {
+        "acuracia": {
+            rotulo: _acuracia(resultados, rotulo)
+            for rotulo in ROTULOS
+            if any(rotulo in r["esperado"] for r in resultados)
+        },
+        "matriz_confusao_categoria": matriz,
+        "por_categoria": precisao_revocacao(matriz),
+        "erros": sum(1 for r in resultados if r["erro"] and r["erro"] != "timeout"),
+        "timeouts": sum(1 for r in resultados if r["erro"] == "timeout"),
+        "segundos": round(segundos, 2),
+        "tickets_por_segundo": round(n / segundos, 2) if segundos else 0.0,
+        "latencia_ticket_ms": percentis([r["latencia_s"] for r in resultados]),
+        "divergencias": divergencias,
+    }
+
+
+# === CLI ===
+
+NOMES_ROTULOS = {
+    "categoria": "🎯 Categoria",
+    "escalado": "🚨 Escalação",
+    "sentimento": "💭 Sentimento",
+    "prioridade": "🚦 Prioridade",
+}
+
+
+def _mostrar(relatorio: Dict[str, Any], max_divergencias: int = 20):
+    config, metricas = relatorio["configuracao"], relatorio["metricas"]
+    print(
+        f"📊 AVALIAÇÃO ({config['tickets']} tickets, {config['processos']} processos "
+        f"x {config['concorrencia']}, timeout {config['timeout']:g}s"
+        f"{', LLM falso' if config['llm_falso'] else ''})"
+    )
+    print("=" * 78)
+    for rotulo, nome in NOMES_ROTULOS.items():
+        acuracia = metricas["acuracia"].get(rotulo)
+        if acuracia is None:
+            continue
+        print(
+            f"{nome:<14} {acuracia['acuracia']:>7.1%} "
+            f"({acuracia['acertos']}/{acuracia['total']})"
+        )
+    latencia = metricas["latencia_ticket_ms"]
+    print(
+        f"⚡ {metricas['tickets_por_segundo']} tickets/s em {metricas['segundos']} s | "
+        f"ticket p50 {latencia['p50']} ms, p95 {latencia['p95']} ms | "
+        f"erros {metricas['erros']}, timeouts {metricas['timeouts']}"
+    )
+
+    matriz = metricas["matriz_confusao_categoria"]
+    colunas = sorted({obtido for linha in matriz.values() for obtido in linha})
+    print("🧮 Matriz de confusão da categoria (linhas: esperado, colunas: obtido)")
+    print("   " + " " * 12 + "".join(f"{c:>12}" for c in colunas) + "   revocação")
+    for esperado, linha in matriz.items():
+        revocacao = metricas["por_categoria"][esperado]["revocacao"]
+        print(
+            f"   {esperado:<12}"
+            + "".join(f"{linha.get(c, 0):>12}" for c in colunas)
+            + f"   {revocacao:>9.1%}"
+        )
+
+    divergencias = metricas["divergencias"]
+    if divergencias:
+        print(f"❌ Divergências: {len(divergencias)} (esperado -> obtido)")
+        for divergencia in divergencias[:max_divergencias]:
+            campos = ", ".join(
+                (
+                    f"{campo} {valor[0]} -> {valor[1]}"
+                    if isinstance(valor, list)
+                    else f"{campo}: {valor}"
+                )
+                for campo, valor in divergencia.items()
+                if campo != "id"
+            )
+            print(f"   {divergencia['id']:<10} {campos}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação com tickets rotulados")
+    parser.add_argument("--dataset", default=DATASET_PADRAO, help="Arquivo JSONL")
+    parser.add_argument("--limite", type=int, help="Avalia só os primeiros N tickets")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 2)
+    parser.add_argument(
+        "--concorrencia", type=int, default=8, help="Tickets simultâneos por processo"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="Segundos por ticket"
+    )
+    parser.add_argument("--tamanho-bloco", type=int, default=25)
+    parser.add_argument(
+        "--llm-falso", action="store_true", help="Usa o chat falso (sem rede)"
+    )
+    parser.add_argument("--latencia-llm", type=float, default=0.005)
+    parser.add_argument(
+        "--usar-cache",
+        action="store_true",
+        help="Reaproveita o cache de classificação global (padrão: cache vazio)",
+    )
+    parser.add_argument("--sem-classificador-local", action="store_true")
+    parser.add_argument("--saida", help="Grava o resultado de cada ticket (JSONL)")
+    parser.add_argument("--json", action="store_true", help="Métricas em JSON")
+    parser.add_argument("--min-acuracia-categoria", type=float)
+    parser.add_argument("--min-acuracia-escalacao", type=float)
+    args = parser.parse_args()
+
+    tickets = carregar_dataset(args.dataset)[: args.limite]
+    config = ConfiguracaoAvaliacao(
+        processos=args.processos,
+        concorrencia=args.concorrencia,
+        timeout=args.timeout,
+        tamanho_bloco=args.tamanho_bloco,
+        llm_falso=args.llm_falso,
+        latencia_llm=args.latencia_llm,
+        usar_cache=args.usar_cache,
+        usar_classificador_local=not args.sem_classificador_local,
+    )
+    relatorio = avaliar(tickets, config, progresso=not args.json)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            for resultado in relatorio["resultados"]:
+                arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+    if args.json:
+        saida = {k: v for k, v in relatorio.items() if k != "resultados"}
+        print(json.dumps(saida, indent=2, ensure_ascii=False))
+    else:
+        _mostrar(relatorio)
+
+    acuracia = relatorio["metricas"]["acuracia"]
+    falhas = [
+        f"{rotulo} {acuracia[rotulo]['acuracia']:.1%} < {minimo:.1%}"
+        for rotulo, minimo in (
+            ("categoria", args.min_acuracia_categoria),
+            ("escalado", args.min_acuracia_escalacao),
+        )
+        if minimo is not None and (acuracia[rotulo]["acuracia"] or 0) < minimo
+    ]
+    if falhas:
+        if not args.json:
+            print(f"❌ Abaixo do mínimo: {'; '.join(falhas)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
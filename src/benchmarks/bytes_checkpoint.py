@@ -0,0 +1,146 @@
+"""
+Benchmark de Bytes Gravados por Ticket
+Compara os modos de durabilidade do workflow (sync, async, exit) medindo
+quanto cada ticket grava no banco de checkpoints
+
+Uso (a partir da pasta src):
+    python -m benchmarks.bytes_checkpoint [--tickets 50] [--serializador compacto] [--json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.llm_falso import EmbedderFalso, fabrica_falsa
+from graph.workflow_suporte import MODOS_DURABILIDADE, WorkflowSuporteMultiAgente
+from memory.cache_classificacao import cache_classificacao
+from memory.serializador import SERIALIZADOR_PADRAO, criar_serializador
+from memory.workflow_memory import SqliteSaverPool
+from utils.indice_semantico import definir_embedder, restaurar_embedder
+from utils.llm_pool import definir_fabrica_llm
+
+CONSULTAS_EXEMPLO = [
+    "Não consigo fazer login no sistema",
+    "Fui cobrado em duplicata no meu cartão",
+    "Qual o horário de funcionamento da empresa?",
+    "O sistema travou e perdi todos os meus dados! Estou muito irritado!",
+    "Como solicito o reembolso de uma compra?",
+    "Obrigado pelo atendimento, foi excelente",
+]
+
+
+def bytes_no_banco(checkpointer: SqliteSaverPool) -> Dict[str, int]:
+    with checkpointer.cursor(transaction=False) as cur:
+        checkpoints, bytes_checkpoints = cur.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) "
+            "FROM checkpoints"
+        ).fetchone()
+        writes, bytes_writes = cur.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM writes"
+        ).fetchone()
+    return {
+        "checkpoints": checkpoints,
+        "writes": writes,
+        "bytes": bytes_checkpoints + bytes_writes,
+    }
+
+
+def medir_modo(
+    durabilidade: str, consultas: List[str], pasta: str, serializador: str
+) -> Dict[str, Any]:
+    """Processa as consultas com um banco novo e mede o que foi gravado"""
+    checkpointer = SqliteSaverPool(
+        os.path.join(pasta, f"{durabilidade}.db"),
+        serde=criar_serializador(serializador),
+    )
+    workflow = WorkflowSuporteMultiAgente(
+        usar_classificador_local=False,
+        durabilidade=durabilidade,
+        checkpointer=checkpointer,
+    )
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, query in enumerate(consultas):
+            workflow.processar_consulta(query, thread_id=f"bench_{i}")
+    segundos = time.perf_counter() - inicio
+
+    gravado = bytes_no_banco(checkpointer)
+    estatisticas = checkpointer.estatisticas()
+    checkpointer.fechar()
+    n = len(consultas)
+    return {
+        "durabilidade": durabilidade,
+        "tickets": n,
+        "bytes_por_ticket": round(gravado["bytes"] / n, 1),
+        "checkpoints_por_ticket": round(gravado["checkpoints"] / n, 2),
+        "writes_por_ticket": round(gravado["writes"] / n, 2),
+        "commits_por_ticket": round(estatisticas["commits"] / n, 2),
+        "escrita_ms_p95": estatisticas["escrita_ms_p95"],
+        "ms_por_ticket": round(segundos * 1000 / n, 2),
+    }
+
+
+def executar(
+    tickets: int = 50, serializador: str = SERIALIZADOR_PADRAO
+) -> List[Dict[str, Any]]:
+    """Roda o benchmark em todos os modos de durabilidade"""
+    consultas = [CONSULTAS_EXEMPLO[i % len(CONSULTAS_EXEMPLO)] for i in range(tickets)]
+    definir_fabrica_llm(fabrica_falsa())
+    with tempfile.TemporaryDirectory() as pasta:
+        # Isola o cache de classificação: respostas falsas não vão para o cache real
+        cache_classificacao.fechar()
+        cache_classificacao.db_path = os.path.join(pasta, "cache.db")
+        definir_embedder(EmbedderFalso(), pasta=pasta)
+        try:
+            return [
+                medir_modo(modo, consultas, pasta, serializador)
+                for modo in MODOS_DURABILIDADE
+            ]
+        finally:
+            cache_classificacao.fechar()
+            definir_fabrica_llm(None)
+            restaurar_embedder()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes de checkpoint por ticket")
+    parser.add_argument("--tickets", type=int, default=50)
+    parser.add_argument(
+        "--serializador",
+        default=SERIALIZADOR_PADRAO,
+        choices=["padrao", "compacto", "compacto_zlib"],
+    )
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    resultados = executar(args.tickets, args.serializador)
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    print(
+        f"💾 BYTES DE CHECKPOINT POR TICKET ({args.tickets} tickets, "
+        f"serializador {args.serializador})"
+    )
+    print("=" * 78)
+    print(
+        f"{'modo':<8} {'bytes':>10} {'checkpoints':>12} {'writes':>8} "
+        f"{'commits':>8} {'p95 ms':>8} {'ms/ticket':>10}"
+    )
+    for r in resultados:
+        print(
+            f"{r['durabilidade']:<8} {r['bytes_por_ticket']:>10} "
+            f"{r['checkpoints_por_ticket']:>12} {r['writes_por_ticket']:>8} "
+            f"{r['commits_por_ticket']:>8} {r['escrita_ms_p95']:>8} "
+            f"{r['ms_por_ticket']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark Offline do Escalonador
+Dispara uma rajada de tickets no EscalonadorTickets com o chat falso (sem
+rede) e compara a espera na fila por prioridade entre a ordem de chegada
+(FIFO) e a fila ponderada
+
+Uso (a partir da pasta src):
+    python -m benchmarks.escalonador [--tickets 300] [--concorrencia 4]
+        [--latencia-llm 0.02] [--envelhecimento 5] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from benchmarks.llm_falso import EmbedderFalso, fabrica_falsa
+from benchmarks.workflow import gerar_consultas
+from graph.escalonador import ENVELHECIMENTO, EscalonadorTickets
+from graph.workflow_suporte import WorkflowSuporteMultiAgente
+from memory.cache_classificacao import cache_classificacao
+from memory.workflow_memory import SqliteSaverPool
+from utils.indice_semantico import definir_embedder, restaurar_embedder
+from utils.llm_pool import definir_fabrica_llm
+from utils.observabilidade import percentis
+
+MODOS = ("fifo", "ponderado")
+
+
+def medir_modo(
+    modo: str,
+    consultas: List[str],
+    concorrencia: int,
+    envelhecimento: float,
+    pasta: str,
+) -> Dict[str, Any]:
+    """Espera na fila e latência por prioridade com todos os tickets de uma vez"""
+    cache_classificacao.fechar()
+    cache_classificacao.db_path = os.path.join(pasta, f"cache_{modo}.db")
+    checkpointer = SqliteSaverPool(os.path.join(pasta, f"checkpoints_{modo}.db"))
+    workflow = WorkflowSuporteMultiAgente(
+        usar_classificador_local=False, checkpointer=checkpointer
+    )
+    inicios: Dict[str, float] = {}
+
+    async def executar(query: str, thread_id: str) -> Dict[str, Any]:
+        inicios[thread_id] = time.perf_counter()
+        return await workflow.aprocessar_consulta(query, thread_id)
+
+    escalonador = EscalonadorTickets(
+        executar=executar,
+        concorrencia=concorrencia,
+        max_fila=len(consultas),
+        envelhecimento=envelhecimento,
+    )
+    # A prioridade real é sempre calculada; no FIFO todos entram como Low
+    prioridades = [escalonador.priorizar(q) for q in consultas]
+    if modo == "fifo":
+        escalonador.pre_triagem = lambda query: ("General", "Neutral")
+
+    esperas: Dict[str, List[float]] = defaultdict(list)
+    latencias: Dict[str, List[float]] = defaultdict(list)
+
+    async def _ticket(i: int, query: str):
+        thread_id = f"bench_{modo}_{i}"
+        entrada = time.perf_counter()
+        await escalonador.processar(query, thread_id)
+        esperas[prioridades[i]].append(inicios[thread_id] - entrada)
+        latencias[prioridades[i]].append(time.perf_counter() - entrada)
+
+    async def _rajada():
+        escalonador.iniciar()
+        await asyncio.gather(*(_ticket(i, q) for i, q in enumerate(consultas)))
+        await escalonador.parar()
+
+    inicio = time.perf_counter()
+    asyncio.run(_rajada())
+    segundos = time.perf_counter() - inicio
+    checkpointer.fechar()
+    return {
+        "modo": modo,
+        "tickets_por_segundo": round(len(consultas) / segundos, 2),
+        "prioridades": {
+            prioridade: {
+                "tickets": len(esperas[prioridade]),
+                "espera_ms": percentis(esperas[prioridade]),
+                "latencia_ms": percentis(latencias[prioridade]),
+            }
+            for prioridade in escalonador.fila.pesos
+            if esperas[prioridade]
+        },
+    }
+
+
+def executar(
+    tickets: int = 300,
+    concorrencia: int = 4,
+    latencia_llm: float = 0.02,
+    envelhecimento: float = ENVELHECIMENTO,
+) -> Dict[str, Any]:
+    consultas = gerar_consultas(tickets)
+    definir_fabrica_llm(fabrica_falsa(latencia_llm))
+    caminho_cache = cache_classificacao.db_path
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            definir_embedder(EmbedderFalso(), pasta=pasta)
+            resultados = [
+                medir_modo(modo, consultas, concorrencia, envelhecimento, pasta)
+                for modo in MODOS
+            ]
+    finally:
+        cache_classificacao.fechar()
+        cache_classificacao.db_path = caminho_cache
+        definir_fabrica_llm(None)
+        restaurar_embedder()
+    return {
+        "configuracao": {
+            "tickets": tickets,
+            "concorrencia": concorrencia,
+            "latencia_llm_ms": latencia_llm * 1000,
+            "envelhecimento_s": envelhecimento,
+        },
+        "modos": resultados,
+    }
+
+
+def _mostrar(relatorio: Dict[str, Any]):
+    config = relatorio["configuracao"]
+    print(
+        f"🏁 BENCHMARK DO ESCALONADOR ({config['tickets']} tickets em rajada, "
+        f"concorrência {config['concorrencia']}, LLM falso "
+        f"{config['latencia_llm_ms']:.1f} ms)"
+    )
+    print("=" * 78)
+    for resultado in relatorio["modos"]:
+        print(f"⚡ {resultado['modo']}: {resultado['tickets_por_segundo']} tickets/s")
+        for prioridade, dados in resultado["prioridades"].items():
+            espera = dados["espera_ms"]
+            print(
+                f"   {prioridade:<7} {dados['tickets']:>5} tickets | espera p50 "
+                f"{espera['p50']:>9} ms  p95 {espera['p95']:>9} ms  "
+                f"max {espera['max']:>9} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do escalonador")
+    parser.add_argument("--tickets", type=int, default=300)
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument(
+        "--latencia-llm", type=float, default=0.02, help="Segundos por chamada"
+    )
+    parser.add_argument(
+        "--envelhecimento",
+        type=float,
+        default=ENVELHECIMENTO,
+        help="Segundos de espera que valem um atendimento de peso 1 (0 desativa)",
+    )
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    relatorio = executar(
+        args.tickets, args.concorrencia, args.latencia_llm, args.envelhecimento
+    )
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    else:
+        _mostrar(relatorio)
+
+
+if __name__ == "__main__":
+    main()
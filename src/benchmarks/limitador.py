@@ -0,0 +1,193 @@
+"""
+Benchmark Offline do Limitador de LLM
+Simula a API de chat da OpenAI com cota de requisições por minuto (429 com
+retry-after e cabeçalhos x-ratelimit-*) e dispara uma rajada de chamadas
+de ChatOpenAI: só com as novas tentativas do SDK e com o limitador
+
+Uso (a partir da pasta src):
+    python -m benchmarks.limitador [--chamadas 300] [--concorrencia 64]
+        [--rpm 3000] [--latencia 0.05] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from utils.limitador_llm import Limitadores, TransporteLimitadoAsync
+
+MODOS = ("sdk", "limitador")
+# A API simulada acumula no máximo este tanto de segundos de cota
+RAJADA_API_SEGUNDOS = 1.0
+
+
+class ApiSimulada:
+    """Endpoint de chat com cota (balde por segundo) e latência com jitter"""
+
+    def __init__(self, rpm: int, latencia: float):
+        self.rpm = rpm
+        self.taxa = rpm / 60.0
+        self.capacidade = self.taxa * RAJADA_API_SEGUNDOS
+        self.saldo = self.capacidade
+        self.atualizado = time.monotonic()
+        self.latencia = latencia
+        self.aceitas = 0
+        self.recusadas = 0
+
+    def _cabecalhos(self) -> Dict[str, str]:
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, int(self.saldo))),
+            "x-ratelimit-limit-tokens": "10000000",
+            "x-ratelimit-remaining-tokens": "10000000",
+        }
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        agora = time.monotonic()
+        self.saldo = min(
+            self.capacidade, self.saldo + (agora - self.atualizado) * self.taxa
+        )
+        self.atualizado = agora
+        if self.saldo < 1:
+            self.recusadas += 1
+            espera_ms = int((1 - self.saldo) / self.taxa * 1000)
+            return httpx.Response(
+                429,
+                headers={**self._cabecalhos(), "retry-after-ms": str(espera_ms)},
+                json={
+                    "error": {
+                        "message": "Rate limit reached",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+            )
+        self.saldo -= 1
+        self.aceitas += 1
+        await asyncio.sleep(self.latencia * random.uniform(0.8, 1.5))
+        return httpx.Response(
+            200,
+            headers=self._cabecalhos(),
+            json={
+                "id": "chatcmpl-simulado",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": json.loads(request.content)["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "General"},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 50,
+                    "completion_tokens": 1,
+                    "total_tokens": 51,
+                },
+            },
+        )
+
+
+def medir_modo(
+    modo: str, chamadas: int, concorrencia: int, rpm: int, latencia: float
+) -> Dict[str, Any]:
+    api = ApiSimulada(rpm, latencia)
+    transporte: httpx.AsyncBaseTransport = httpx.MockTransport(api)
+    if modo == "limitador":
+        # Começa com a cota padrão e aprende a real pelos cabeçalhos
+        transporte = TransporteLimitadoAsync(transporte, limitadores=Limitadores())
+    llm = ChatOpenAI(
+        model="gpt-4o-mini",
+        api_key="simulada",
+        max_retries=0 if modo == "limitador" else 2,
+        http_async_client=httpx.AsyncClient(transport=transporte),
+    )
+    falhas = 0
+
+    async def _rajada():
+        semaforo = asyncio.Semaphore(concorrencia)
+
+        async def _chamada(i: int):
+            nonlocal falhas
+            async with semaforo:
+                try:
+                    await llm.ainvoke(f"Classifique a consulta {i}")
+                except Exception:
+                    falhas += 1
+
+        await asyncio.gather(*(_chamada(i) for i in range(chamadas)))
+
+    inicio = time.perf_counter()
+    asyncio.run(_rajada())
+    segundos = time.perf_counter() - inicio
+    sucessos = chamadas - falhas
+    return {
+        "modo": modo,
+        "sucessos": sucessos,
+        "falhas": falhas,
+        "respostas_429": api.recusadas,
+        "segundos": round(segundos, 2),
+        "chamadas_por_segundo": round(sucessos / segundos, 2),
+        "uso_da_cota": round(sucessos / segundos / api.taxa, 3),
+    }
+
+
+def executar(
+    chamadas: int = 300, concorrencia: int = 64, rpm: int = 3000, latencia: float = 0.05
+) -> Dict[str, Any]:
+    return {
+        "configuracao": {
+            "chamadas": chamadas,
+            "concorrencia": concorrencia,
+            "rpm": rpm,
+            "latencia_ms": latencia * 1000,
+        },
+        "modos": [
+            medir_modo(modo, chamadas, concorrencia, rpm, latencia) for modo in MODOS
+        ],
+    }
+
+
+def _mostrar(relatorio: Dict[str, Any]):
+    config = relatorio["configuracao"]
+    print(
+        f"🏁 BENCHMARK DO LIMITADOR ({config['chamadas']} chamadas, concorrência "
+        f"{config['concorrencia']}, cota {config['rpm']} RPM, latência "
+        f"{config['latencia_ms']:.0f} ms)"
+    )
+    print("=" * 78)
+    for resultado in relatorio["modos"]:
+        print(
+            f"⚡ {resultado['modo']:<10} {resultado['sucessos']:>5} ok "
+            f"{resultado['falhas']:>5} falhas | {resultado['respostas_429']:>5} "
+            f"respostas 429 | {resultado['chamadas_por_segundo']:>7} ok/s "
+            f"({resultado['uso_da_cota']:.0%} da cota)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do limitador")
+    parser.add_argument("--chamadas", type=int, default=300)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--rpm", type=int, default=3000, help="Cota da API simulada")
+    parser.add_argument(
+        "--latencia", type=float, default=0.05, help="Segundos por chamada"
+    )
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    relatorio = executar(args.chamadas, args.concorrencia, args.rpm, args.latencia)
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    else:
+        _mostrar(relatorio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Modelo de Chat Falso para Benchmarks Offline
+Responde às chains de triagem com classificações por palavra-chave e
+latência configurável, sem acessar a rede; inclui um embedder
+determinístico para o índice semântico (sem baixar modelos)
+"""
+
+import re
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from utils.texto import normalizar_texto
+
+_CONSULTA = re.compile(r"Consulta:\s*(.*)")
+
+PALAVRAS_CATEGORIA = {
+    "Technical": ("login", "erro", "bug", "travou", "senha", "sistema", "app"),
+    "Billing": ("cobr", "pagamento", "reembolso", "estorno", "fatura", "cartao"),
+}
+PALAVRAS_NEGATIVAS = ("irritad", "pessim", "absurdo", "cansad", "odeio", "perdi")
+PALAVRAS_POSITIVAS = ("obrigad", "otimo", "excelente", "parabens", "adorei")
+
+
+def classificar_por_palavras(query: str) -> tuple:
+    """Retorna (categoria, sentimento) por palavras-chave"""
+    texto = normalizar_texto(query)
+    categoria = next(
+        (
+            nome
+            for nome, palavras in PALAVRAS_CATEGORIA.items()
+            if any(p in texto for p in palavras)
+        ),
+        "General",
+    )
+    if any(p in texto for p in PALAVRAS_NEGATIVAS):
+        sentimento = "Negative"
+    elif any(p in texto for p in PALAVRAS_POSITIVAS):
+        sentimento = "Positive"
+    else:
+        sentimento = "Neutral"
+    return categoria, sentimento
+
+
+class ChatFalso(BaseChatModel):
+    """
+    Chat model determinístico para as chains do coordenador.
+
+    Com tools vinculadas (with_structured_output) responde com um tool call
+    de categoria + sentimento; sem tools responde só a palavra pedida pelo
+    prompt (categoria ou sentimento). `respostas` fixa (categoria,
+    sentimento) para consultas específicas (chave: consulta normalizada).
+    """
+
+    latencia: float = 0.0
+    respostas: Dict[str, Tuple[str, str]] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat-falso"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latencia:
+            time.sleep(self.latencia)
+        prompt = str(messages[-1].content)
+        encontrado = _CONSULTA.search(prompt)
+        consulta = encontrado.group(1) if encontrado else prompt
+        categoria, sentimento = self.respostas.get(
+            normalizar_texto(consulta)
+        ) or classificar_por_palavras(consulta)
+
+        tools = kwargs.get("tools")
+        if tools:
+            mensagem = AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": tools[0]["function"]["name"],
+                        "args": {"categoria": categoria, "sentimento": sentimento},
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                    }
+                ],
+            )
+        elif "Positive, Neutral ou Negative" in prompt:
+            mensagem = AIMessage(content=sentimento)
+        else:
+            mensagem = AIMessage(content=categoria)
+        return ChatResult(generations=[ChatGeneration(message=mensagem)])
+
+
+class EmbedderFalso:
+    """Embedder determinístico: trigramas de caracteres em um vetor com hash"""
+
+    nome = "falso/trigramas"
+
+    def __init__(self, dimensao: int = 256):
+        self.dimensao = dimensao
+
+    def __call__(self, textos: Sequence[str]) -> np.ndarray:
+        matriz = np.zeros((len(textos), self.dimensao), dtype=np.float32)
+        for linha, texto in enumerate(textos):
+            texto = f" {normalizar_texto(texto)} "
+            for i in range(len(texto) - 2):
+                coluna = zlib.crc32(texto[i : i + 3].encode("utf-8")) % self.dimensao
+                matriz[linha, coluna] += 1
+        return matriz
+
+
+def fabrica_falsa(
+    latencia: float = 0.0, respostas: Optional[Dict[str, Tuple[str, str]]] = None
+):
+    """Fábrica para utils.llm_pool.definir_fabrica_llm"""
+    respostas = {normalizar_texto(q): r for q, r in (respostas or {}).items()}
+    return lambda modelo, temperatura: ChatFalso(latencia=latencia, respostas=respostas)
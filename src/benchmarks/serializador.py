@@ -0,0 +1,111 @@
+"""
+Micro-benchmark do Serializador de Checkpoints
+Compara tamanho e tempo de encode/decode do JsonPlusSerializer (padrão)
+com o serializador compacto, com e sem zlib
+
+Uso (a partir da pasta src):
+    python -m benchmarks.serializador [--mensagens 10] [--repeticoes 2000] [--json]
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from memory.serializador import criar_serializador
+from utils.state import AgentType, CategoryType, PriorityType, SentimentType
+from utils.state import criar_estado_inicial
+
+SERIALIZADORES = ("padrao", "compacto", "compacto_zlib")
+
+
+def checkpoint_exemplo(mensagens: int) -> Dict[str, Any]:
+    """Checkpoint com o estado de um ticket finalizado e um histórico de mensagens"""
+    estado = criar_estado_inicial("O sistema travou e perdi todos os meus dados!")
+    historico = []
+    for i in range(mensagens):
+        historico.append(HumanMessage(content=f"Pergunta {i} do cliente", id=f"h{i}"))
+        historico.append(
+            AIMessage(
+                content=f"Resposta {i}: reinicie o aplicativo e tente novamente.",
+                id=f"a{i}",
+            )
+        )
+    estado.update(
+        messages=historico,
+        category=CategoryType.TECHNICAL,
+        sentiment=SentimentType.NEGATIVE,
+        priority=PriorityType.HIGH,
+        agent_used=AgentType.TECNICO,
+        response="⚠️ Este problema será escalado para um especialista de nível 2.",
+        escalated=True,
+    )
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = dict(estado)
+    checkpoint["channel_versions"] = {canal: f"{7:032}.0.1" for canal in estado}
+    return checkpoint
+
+
+def medir(nome: str, objeto: Any, repeticoes: int) -> Dict[str, Any]:
+    """Mede tamanho, encode e decode (µs por operação) de um serializador"""
+    serde = criar_serializador(nome)
+    tipo, dados = serde.dumps_typed(objeto)
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        serde.dumps_typed(objeto)
+    encode = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        restaurado = serde.loads_typed((tipo, dados))
+    decode = (time.perf_counter() - inicio) / repeticoes
+
+    return {
+        "serializador": nome,
+        "tipo": tipo,
+        "bytes": len(dados),
+        "encode_us": round(encode * 1e6, 1),
+        "decode_us": round(decode * 1e6, 1),
+        "ida_e_volta_exata": restaurado == objeto,
+    }
+
+
+def executar(mensagens: int = 10, repeticoes: int = 2000) -> List[Dict[str, Any]]:
+    """Roda o micro-benchmark para todos os serializadores"""
+    checkpoint = checkpoint_exemplo(mensagens)
+    return [medir(nome, checkpoint, repeticoes) for nome in SERIALIZADORES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de serialização")
+    parser.add_argument("--mensagens", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    resultados = executar(args.mensagens, args.repeticoes)
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    base = resultados[0]["bytes"]
+    print(f"📦 SERIALIZAÇÃO DE CHECKPOINT ({args.mensagens * 2} mensagens)")
+    print("=" * 72)
+    print(
+        f"{'serializador':<15} {'bytes':>8} {'%':>6} {'encode µs':>10} "
+        f"{'decode µs':>10} {'exato':>6}"
+    )
+    for r in resultados:
+        print(
+            f"{r['serializador']:<15} {r['bytes']:>8} {r['bytes'] * 100 / base:>5.0f}% "
+            f"{r['encode_us']:>10} {r['decode_us']:>10} "
+            f"{'✅' if r['ida_e_volta_exata'] else '❌':>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
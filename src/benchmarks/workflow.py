@@ -0,0 +1,375 @@
+"""
+Benchmark Offline do Workflow
+Executa o WorkflowSuporteMultiAgente com o chat falso (sem rede) e mede a
+latência de cada nó, tickets/s em vários níveis de concorrência, bytes e
+tempo de checkpoint por ticket e o pico de memória (RSS)
+
+Uso (a partir da pasta src):
+    python -m benchmarks.workflow [--tickets 200] [--concorrencia 1 4 16]
+        [--latencia-llm 0.005] [--respostas respostas.json]
+        [--json] [--saida resultado.json]
+        [--baseline baseline.json] [--tolerancia 0.2]
+
+Com --baseline, o processo termina com código 1 se alguma métrica piorar
+além da tolerância em relação a um resultado anterior (gravado com --saida).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.bytes_checkpoint import CONSULTAS_EXEMPLO, bytes_no_banco
+from benchmarks.llm_falso import EmbedderFalso, fabrica_falsa
+from graph.workflow_suporte import DURABILIDADE_PADRAO, WorkflowSuporteMultiAgente
+from memory.cache_classificacao import cache_classificacao
+from memory.serializador import SERIALIZADOR_PADRAO, criar_serializador
+from memory.workflow_memory import SqliteSaverPool
+from utils.indice_semantico import definir_embedder, restaurar_embedder
+from utils.llm_pool import definir_fabrica_llm
+from utils.observabilidade import percentis
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+NIVEIS_CONCORRENCIA = (1, 4, 16)
+# Diferenças de latência abaixo disso (ms) são ruído e não contam como regressão
+FOLGA_MS = 1.0
+
+
+def pico_rss_mb() -> float:
+    """Pico de memória residente do processo (MB), ou 0 se indisponível"""
+    if resource is None:
+        return 0.0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class CronometroNos(BaseCallbackHandler):
+    """Mede a duração de cada execução de nó do grafo (callbacks de chain)"""
+
+    # Executa no próprio loop/thread do nó: não distorce a medição no async
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inicios: Dict[UUID, tuple] = {}
+        self.duracoes: Dict[str, List[float]] = {}
+        self.erros: Dict[str, int] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        nome = kwargs.get("name")
+        # Só o run do próprio nó (os runs internos herdam o metadata)
+        if metadata and nome and metadata.get("langgraph_node") == nome:
+            with self._lock:
+                self._inicios[run_id] = (nome, time.perf_counter())
+
+    def _finalizar(self, run_id: UUID, erro: bool):
+        with self._lock:
+            inicio = self._inicios.pop(run_id, None)
+            if inicio is None:
+                return
+            nome, t0 = inicio
+            self.duracoes.setdefault(nome, []).append(time.perf_counter() - t0)
+            if erro:
+                self.erros[nome] = self.erros.get(nome, 0) + 1
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finalizar(run_id, erro=False)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finalizar(run_id, erro=True)
+
+
+def gerar_consultas(tickets: int) -> List[str]:
+    """Consultas de exemplo numeradas (cada uma passa pela triagem completa)"""
+    return [
+        f"{CONSULTAS_EXEMPLO[i % len(CONSULTAS_EXEMPLO)]} (pedido {i})"
+        for i in range(tickets)
+    ]
+
+
+def medir_concorrencia(
+    consultas: List[str],
+    concorrencia: int,
+    pasta: str,
+    serializador: str,
+    durabilidade: str,
+) -> Dict[str, Any]:
+    """Processa as consultas com `concorrencia` tickets simultâneos"""
+    # Banco de checkpoints e cache de classificação novos para cada nível
+    cache_classificacao.fechar()
+    cache_classificacao.db_path = os.path.join(pasta, f"cache_c{concorrencia}.db")
+    checkpointer = SqliteSaverPool(
+        os.path.join(pasta, f"checkpoints_c{concorrencia}.db"),
+        serde=criar_serializador(serializador),
+    )
+    workflow = WorkflowSuporteMultiAgente(
+        usar_classificador_local=False,
+        durabilidade=durabilidade,
+        checkpointer=checkpointer,
+    )
+    cronometro = CronometroNos()
+    workflow.app = workflow.app.with_config(callbacks=[cronometro])
+
+    latencias: List[float] = []
+    erros = 0
+
+    async def _executar():
+        semaforo = asyncio.Semaphore(concorrencia)
+
+        async def _ticket(i: int, query: str):
+            nonlocal erros
+            async with semaforo:
+                inicio = time.perf_counter()
+                try:
+                    await workflow.aprocessar_consulta(query, thread_id=f"bench_{i}")
+                except Exception:
+                    erros += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        await asyncio.gather(*(_ticket(i, q) for i, q in enumerate(consultas)))
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(_executar())
+    segundos = time.perf_counter() - inicio
+
+    gravado = bytes_no_banco(checkpointer)
+    estatisticas = checkpointer.estatisticas()
+    checkpointer.fechar()
+    n = len(consultas)
+    return {
+        "concorrencia": concorrencia,
+        "tickets": n,
+        "erros": erros,
+        "tickets_por_segundo": round(n / segundos, 2),
+        "latencia_ticket_ms": percentis(latencias),
+        "nos_ms": {
+            nome: percentis(duracoes)
+            for nome, duracoes in sorted(cronometro.duracoes.items())
+        },
+        "erros_nos": cronometro.erros,
+        "checkpoint": {
+            "bytes_por_ticket": round(gravado["bytes"] / n, 1),
+            "checkpoints_por_ticket": round(gravado["checkpoints"] / n, 2),
+            "commits_por_ticket": round(estatisticas["commits"] / n, 2),
+            "escrita_ms_p95": estatisticas["escrita_ms_p95"],
+            "commit_ms_p95": estatisticas["commit_ms_p95"],
+        },
+    }
+
+
+def executar(
+    tickets: int = 200,
+    niveis: List[int] = list(NIVEIS_CONCORRENCIA),
+    latencia_llm: float = 0.005,
+    respostas: Optional[Dict[str, Any]] = None,
+    serializador: str = SERIALIZADOR_PADRAO,
+    durabilidade: str = DURABILIDADE_PADRAO,
+) -> Dict[str, Any]:
+    """Roda o benchmark em todos os níveis de concorrência"""
+    consultas = gerar_consultas(tickets)
+    definir_fabrica_llm(fabrica_falsa(latencia_llm, respostas))
+    caminho_cache = cache_classificacao.db_path
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            # Embedder determinístico: nada de carregar/baixar modelos no meio
+            # da medição, e o índice fica na pasta temporária
+            definir_embedder(EmbedderFalso(), pasta=pasta)
+            resultados = [
+                medir_concorrencia(consultas, c, pasta, serializador, durabilidade)
+                for c in niveis
+            ]
+    finally:
+        cache_classificacao.fechar()
+        cache_classificacao.db_path = caminho_cache
+        definir_fabrica_llm(None)
+        restaurar_embedder()
+    return {
+        "configuracao": {
+            "tickets": tickets,
+            "latencia_llm_ms": latencia_llm * 1000,
+            "serializador": serializador,
+            "durabilidade": durabilidade,
+            "python": sys.version.split()[0],
+        },
+        "niveis": resultados,
+        "pico_rss_mb": pico_rss_mb(),
+    }
+
+
+# === COMPARAÇÃO COM BASELINE ===
+
+
+def _pior(atual: float, base: float, tolerancia: float, maior_melhor: bool) -> bool:
+    if maior_melhor:
+        return atual < base * (1 - tolerancia)
+    return atual > base * (1 + tolerancia)
+
+
+def comparar(
+    atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float = 0.2
+) -> List[str]:
+    """Lista as métricas que pioraram além da tolerância (vazia = sem regressão)"""
+    regressoes = []
+
+    def verificar(nome: str, a: float, b: float, maior_melhor=False, ms=False):
+        if ms and abs(a - b) < FOLGA_MS:
+            return
+        if _pior(a, b, tolerancia, maior_melhor):
+            regressoes.append(f"{nome}: {b} -> {a}")
+
+    base_por_nivel = {n["concorrencia"]: n for n in baseline.get("niveis", [])}
+    for nivel in atual["niveis"]:
+        base = base_por_nivel.get(nivel["concorrencia"])
+        if base is None:
+            continue
+        prefixo = f"c={nivel['concorrencia']}"
+        verificar(
+            f"{prefixo} tickets_por_segundo",
+            nivel["tickets_por_segundo"],
+            base["tickets_por_segundo"],
+            maior_melhor=True,
+        )
+        verificar(
+            f"{prefixo} latencia_ticket p95",
+            nivel["latencia_ticket_ms"]["p95"],
+            base["latencia_ticket_ms"]["p95"],
+            ms=True,
+        )
+        for no, tempos in nivel["nos_ms"].items():
+            if no in base["nos_ms"]:
+                verificar(
+                    f"{prefixo} nó {no} p95",
+                    tempos["p95"],
+                    base["nos_ms"][no]["p95"],
+                    ms=True,
+                )
+        verificar(
+            f"{prefixo} checkpoint bytes_por_ticket",
+            nivel["checkpoint"]["bytes_por_ticket"],
+            base["checkpoint"]["bytes_por_ticket"],
+        )
+        if nivel["erros"] > base["erros"]:
+            regressoes.append(f"{prefixo} erros: {base['erros']} -> {nivel['erros']}")
+    if baseline.get("pico_rss_mb"):
+        verificar("pico_rss_mb", atual["pico_rss_mb"], baseline["pico_rss_mb"])
+    return regressoes
+
+
+# === CLI ===
+
+
+def _mostrar(relatorio: Dict[str, Any]):
+    config = relatorio["configuracao"]
+    print(
+        f"🏁 BENCHMARK DO WORKFLOW ({config['tickets']} tickets, LLM falso "
+        f"{config['latencia_llm_ms']:.1f} ms, {config['durabilidade']}, "
+        f"{config['serializador']})"
+    )
+    print("=" * 78)
+    for nivel in relatorio["niveis"]:
+        latencia = nivel["latencia_ticket_ms"]
+        checkpoint = nivel["checkpoint"]
+        print(
+            f"⚡ concorrência {nivel['concorrencia']:>3}: "
+            f"{nivel['tickets_por_segundo']:>8} tickets/s | ticket p50 "
+            f"{latencia['p50']} ms, p95 {latencia['p95']} ms | erros {nivel['erros']}"
+        )
+        print(
+            f"   💾 {checkpoint['bytes_por_ticket']} bytes/ticket, "
+            f"{checkpoint['commits_por_ticket']} commits/ticket, "
+            f"escrita p95 {checkpoint['escrita_ms_p95']} ms"
+        )
+        for no, tempos in nivel["nos_ms"].items():
+            print(
+                f"   {no:<22} p50 {tempos['p50']:>8} ms  p95 {tempos['p95']:>8} ms"
+                f"  max {tempos['max']:>8} ms"
+            )
+    print(f"🧠 Pico de RSS: {relatorio['pico_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do workflow")
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument(
+        "--concorrencia", type=int, nargs="+", default=list(NIVEIS_CONCORRENCIA)
+    )
+    parser.add_argument(
+        "--latencia-llm", type=float, default=0.005, help="Segundos por chamada"
+    )
+    parser.add_argument(
+        "--respostas",
+        help="JSON {consulta: [categoria, sentimento]} com respostas fixas do LLM",
+    )
+    parser.add_argument(
+        "--serializador",
+        default=SERIALIZADOR_PADRAO,
+        choices=["padrao", "compacto", "compacto_zlib"],
+    )
+    parser.add_argument(
+        "--durabilidade", default=DURABILIDADE_PADRAO, choices=["sync", "async", "exit"]
+    )
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    parser.add_argument("--saida", help="Grava o resultado em JSON (futuro baseline)")
+    parser.add_argument("--baseline", help="Resultado anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    respostas = None
+    if args.respostas:
+        with open(args.respostas, encoding="utf-8") as arquivo:
+            respostas = {q: tuple(r) for q, r in json.load(arquivo).items()}
+
+    relatorio = executar(
+        args.tickets,
+        args.concorrencia,
+        args.latencia_llm,
+        respostas,
+        args.serializador,
+        args.durabilidade,
+    )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+
+    regressoes = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            regressoes = comparar(relatorio, json.load(arquivo), args.tolerancia)
+        relatorio["regressoes"] = regressoes
+
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+    else:
+        _mostrar(relatorio)
+        if args.baseline:
+            if regressoes:
+                print(
+                    f"❌ {len(regressoes)} regressões (tolerância {args.tolerancia:.0%}):"
+                )
+                for regressao in regressoes:
+                    print(f"   {regressao}")
+            else:
+                print("✅ Sem regressões em relação ao baseline")
+
+    if regressoes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Escalonador de Tickets por Prioridade
+Fila assíncrona na frente do workflow: cada ticket passa por uma pré-triagem
+barata (sem LLM), recebe a prioridade das regras de roteamento (as mesmas
+de determinar_prioridade) e espera a vez em uma fila ponderada (WFQ)
+
+Entre as prioridades, a fila é justa por peso: sob carga, a cada 10 tickets
+atendidos cerca de 6 são High, 3 Medium e 1 Low (pesos padrão), então um
+cliente irritado não espera atrás de uma rajada de perguntas de FAQ e as
+prioridades baixas continuam andando. O envelhecimento desconta da etiqueta
+de cada ticket o tempo que ele já esperou, o que limita a espera de qualquer
+ticket. A fila é limitada: cheia, um ticket novo tira o mais recente de
+prioridade menor ou é recusado (FilaCheia), para o cliente tentar depois.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from utils.motor_regras import obter_motor_regras
+from utils.observabilidade import metricas
+from utils.texto import normalizar_texto
+
+# === CONFIGURAÇÃO ===
+
+PESOS_PADRAO = {"High": 6.0, "Medium": 3.0, "Low": 1.0}
+MAX_FILA = int(os.getenv("ESCALONADOR_MAX_FILA", 200))
+CONCORRENCIA = int(os.getenv("ESCALONADOR_CONCORRENCIA", 8))
+# Segundos de espera que valem um atendimento de peso 1 (0 = sem envelhecimento)
+ENVELHECIMENTO = float(os.getenv("ESCALONADOR_ENVELHECIMENTO", 5.0))
+# Quanto um ticket aguarda vaga em uma fila cheia antes de ser recusado
+ESPERA_ADMISSAO = float(os.getenv("ESCALONADOR_ESPERA_ADMISSAO", 0.0))
+
+# Pré-triagem por palavras (texto normalizado: sem acentos, minúsculas)
+_NEGATIVO = re.compile(
+    r"\b(absurd|pessim|horrivel|ridicul|inaceitavel|irritad|revoltad|cansad"
+    r"|odeio|descaso|vergonha|procon|lixo|nunca mais|de novo|perdi)"
+)
+_CATEGORIAS = (
+    (
+        "Billing",
+        re.compile(
+            r"\b(cobr|pagamento|pagar|pago|reembols|estorn|fatura|boleto|cartao"
+            r"|pix|assinatura|mensalidade|duplicad)"
+        ),
+    ),
+    (
+        "Technical",
+        re.compile(
+            r"\b(login|senha|erro|bug|trav|app|aplicativo|sistema|site|acess"
+            r"|instal|atualiza|lent|carrega)"
+        ),
+    ),
+)
+
+metricas.declarar(
+    "suporte_fila_espera_segundos",
+    "histogram",
+    "Tempo na fila do escalonador até o início do processamento",
+)
+metricas.declarar(
+    "suporte_fila_latencia_segundos",
+    "histogram",
+    "Tempo da entrada na fila até o resultado do workflow",
+)
+metricas.declarar(
+    "suporte_fila_tickets_total",
+    "counter",
+    "Tickets por prioridade e desfecho (concluido, erro, recusado, descartado)",
+)
+metricas.declarar(
+    "suporte_fila_envelhecidos_total",
+    "counter",
+    "Tickets atendidos antes da vez pelo envelhecimento",
+)
+
+logger = logging.getLogger(__name__)
+
+# Recebe a consulta e devolve (categoria, sentimento)
+PreTriagem = Callable[[str], Tuple[str, str]]
+
+
+class FilaCheia(Exception):
+    """Fila do escalonador sem vaga para o ticket (tentar mais tarde)"""
+
+    def __init__(self, prioridade: str, tamanho: int):
+        super().__init__(f"Fila cheia ({tamanho} tickets), prioridade {prioridade}")
+        self.prioridade = prioridade
+        self.tamanho = tamanho
+
+
+# === PRÉ-TRIAGEM ===
+
+
+def pre_triagem_palavras(query: str) -> Tuple[str, str]:
+    """(categoria, sentimento) por palavras-chave, em microssegundos"""
+    texto = normalizar_texto(query)
+    categoria = next(
+        (nome for nome, padrao in _CATEGORIAS if padrao.search(texto)), "General"
+    )
+    sentimento = "Negative" if _NEGATIVO.search(texto) else "Neutral"
+    return categoria, sentimento
+
+
+def criar_pre_triagem(classificador_local=None) -> PreTriagem:
+    """
+    Pré-triagem sem LLM: o classificador local quando ele está confiante,
+    senão as palavras-chave (categoria e sentimento decididos em separado).
+    """
+    if classificador_local is None:
+        return pre_triagem_palavras
+
+    def pre_triagem(query: str) -> Tuple[str, str]:
+        categoria, sentimento = pre_triagem_palavras(query)
+        local = classificador_local.classificar(query)
+        if local["categoria_confiavel"]:
+            categoria = local["categoria"]
+        if local["sentimento_confiavel"]:
+            sentimento = local["sentimento"]
+        return categoria, sentimento
+
+    return pre_triagem
+
+
+# === FILA PONDERADA ===
+
+
+@dataclass
+class _Ticket:
+    query: str
+    thread_id: str
+    prioridade: str
+    etiqueta: float  # tempo virtual de término (WFQ)
+    futuro: asyncio.Future
+    entrada: float = field(default_factory=time.perf_counter)
+
+
+class FilaPonderada:
+    """
+    Fila justa por peso (self-clocked fair queueing) com envelhecimento.
+
+    Cada ticket recebe a etiqueta max(V, última da prioridade) + 1/peso e
+    sai o de menor etiqueta, descontado o envelhecimento (espera /
+    ENVELHECIMENTO). Dentro de uma prioridade a ordem é FIFO, então só o
+    primeiro de cada prioridade é comparado: retirar é O(prioridades).
+    """
+
+    def __init__(
+        self,
+        pesos: Optional[Dict[str, float]] = None,
+        envelhecimento: float = ENVELHECIMENTO,
+    ):
+        self.pesos = {**PESOS_PADRAO, **(pesos or {})}
+        self.envelhecimento = envelhecimento
+        self.filas: Dict[str, Deque[_Ticket]] = {p: deque() for p in self.pesos}
+        self._ultima = {p: 0.0 for p in self.pesos}
+        self._virtual = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(fila) for fila in self.filas.values())
+
+    def etiquetar(self, prioridade: str) -> float:
+        """Etiqueta do próximo ticket da prioridade (sem enfileirar)"""
+        inicio = max(self._virtual, self._ultima[prioridade])
+        return inicio + 1.0 / self.pesos[prioridade]
+
+    def inserir(self, ticket: _Ticket):
+        self._ultima[ticket.prioridade] = ticket.etiqueta
+        self.filas[ticket.prioridade].append(ticket)
+
+    def _pontuacao(self, ticket: _Ticket, agora: float) -> float:
+        if self.envelhecimento <= 0:
+            return ticket.etiqueta
+        return ticket.etiqueta - (agora - ticket.entrada) / self.envelhecimento
+
+    def retirar(self) -> Tuple[_Ticket, bool]:
+        """Próximo ticket e se ele passou na frente pelo envelhecimento"""
+        agora = time.perf_counter()
+        primeiros = [fila[0] for fila in self.filas.values() if fila]
+        escolhido = min(primeiros, key=lambda t: self._pontuacao(t, agora))
+        envelhecido = escolhido.etiqueta > min(t.etiqueta for t in primeiros)
+        self.filas[escolhido.prioridade].popleft()
+        self._virtual = max(self._virtual, escolhido.etiqueta)
+        return escolhido, envelhecido
+
+    def descartar_menor(self, prioridade: str) -> Optional[_Ticket]:
+        """Tira o ticket mais recente de prioridade menor que `prioridade`"""
+        peso = self.pesos[prioridade]
+        for candidata in sorted(self.filas, key=self.pesos.get):
+            if self.pesos[candidata] < peso and self.filas[candidata]:
+                return self.filas[candidata].pop()
+        return None
+
+
+# === ESCALONADOR ===
+
+
+class EscalonadorTickets:
+    """
+    Fila de tickets com `concorrencia` execuções simultâneas do workflow.
+
+    Uso:
+        escalonador = EscalonadorTickets(workflow)
+        escalonador.iniciar()          # dentro do loop asyncio
+        resultado = await escalonador.processar(query, thread_id)
+        await escalonador.parar()
+    """
+
+    def __init__(
+        self,
+        workflow=None,
+        concorrencia: int = CONCORRENCIA,
+        max_fila: int = MAX_FILA,
+        pesos: Optional[Dict[str, float]] = None,
+        envelhecimento: float = ENVELHECIMENTO,
+        espera_admissao: float = ESPERA_ADMISSAO,
+        pre_triagem: Optional[PreTriagem] = None,
+        executar: Optional[Callable[[str, str], Awaitable[Dict[str, Any]]]] = None,
+    ):
+        """
+        Args:
+            workflow: WorkflowSuporteMultiAgente que processa os tickets.
+            concorrencia: Tickets processados ao mesmo tempo.
+            max_fila: Tickets aguardando (além dos em execução).
+            pesos: Peso de cada prioridade na fila (padrão: PESOS_PADRAO).
+            envelhecimento: Segundos de espera que valem um atendimento de
+                peso 1 (0 desativa).
+            espera_admissao: Segundos que um ticket aguarda vaga com a fila
+                cheia antes de FilaCheia.
+            pre_triagem: (categoria, sentimento) sem LLM (padrão: classificador
+                local do workflow + palavras-chave).
+            executar: Corrotina (query, thread_id) -> resultado (padrão:
+                workflow.aprocessar_consulta).
+        """
+        if workflow is None and executar is None:
+            raise ValueError("Informe o workflow ou a função executar")
+        self.executar = executar or workflow.aprocessar_consulta
+        self.pre_triagem = pre_triagem or criar_pre_triagem(
+            getattr(workflow, "classificador_local", None)
+        )
+        self.concorrencia = concorrencia
+        self.max_fila = max_fila
+        self.espera_admissao = espera_admissao
+        self.fila = FilaPonderada(pesos, envelhecimento)
+        self.em_execucao = 0
+        self._condicao: Optional[asyncio.Condition] = None
+        self._trabalhadores: list = []
+        self._encerrando = False
+
+    # === CICLO DE VIDA ===
+
+    def iniciar(self):
+        """Cria os trabalhadores no loop asyncio em execução"""
+        if self._trabalhadores:
+            return
+        self._encerrando = False
+        self._condicao = asyncio.Condition()
+        self._trabalhadores = [
+            asyncio.create_task(self._trabalhar(), name=f"escalonador_{i}")
+            for i in range(self.concorrencia)
+        ]
+        logger.info(
+            "Escalonador iniciado: %d trabalhadores, fila de até %d tickets",
+            self.concorrencia,
+            self.max_fila,
+        )
+
+    async def parar(self, drenar: bool = True):
+        """Encerra os trabalhadores (com drenar=True, termina a fila antes)"""
+        if not self._trabalhadores:
+            return
+        async with self._condicao:
+            self._encerrando = True
+            if not drenar:
+                while len(self.fila):
+                    ticket, _ = self.fila.retirar()
+                    if not ticket.futuro.done():
+                        ticket.futuro.cancel()
+            self._condicao.notify_all()
+        await asyncio.gather(*self._trabalhadores, return_exceptions=True)
+        self._trabalhadores = []
+        logger.info("Escalonador encerrado")
+
+    # === INTERFACE PÚBLICA ===
+
+    def priorizar(self, query: str) -> str:
+        """Prioridade do ticket pelas regras, a partir da pré-triagem"""
+        categoria, sentimento = self.pre_triagem(query)
+        return obter_motor_regras().avaliar(categoria, sentimento, query).prioridade
+
+    async def processar(self, query: str, thread_id: str) -> Dict[str, Any]:
+        """
+        Enfileira o ticket e espera o resultado do workflow.
+
+        Raises:
+            FilaCheia: sem vaga na fila (nem descartando prioridade menor).
+        """
+        if not self._trabalhadores:
+            raise RuntimeError("Escalonador não iniciado (chame iniciar())")
+        prioridade = self.priorizar(query)
+        futuro = asyncio.get_running_loop().create_future()
+        async with self._condicao:
+            await self._admitir(prioridade)
+            etiqueta = self.fila.etiquetar(prioridade)
+            self.fila.inserir(_Ticket(query, thread_id, prioridade, etiqueta, futuro))
+            self._condicao.notify_all()
+        # Se o cliente desistir, o futuro cancelado faz o trabalhador pular o ticket
+        return await futuro
+
+    async def _admitir(self, prioridade: str):
+        """Garante uma vaga na fila (chamado com a condição adquirida)"""
+        if len(self.fila) < self.max_fila:
+            return
+        descartado = self.fila.descartar_menor(prioridade)
+        if descartado is not None:
+            self._descartar(descartado)
+            return
+        if self.espera_admissao > 0:
+            try:
+                await asyncio.wait_for(
+                    self._condicao.wait_for(lambda: len(self.fila) < self.max_fila),
+                    self.espera_admissao,
+                )
+                return
+            except asyncio.TimeoutError:
+                pass
+        metricas.incrementar(
+            "suporte_fila_tickets_total", prioridade=prioridade, desfecho="recusado"
+        )
+        raise FilaCheia(prioridade, len(self.fila))
+
+    def _descartar(self, ticket: _Ticket):
+        metricas.incrementar(
+            "suporte_fila_tickets_total",
+            prioridade=ticket.prioridade,
+            desfecho="descartado",
+        )
+        logger.warning(
+            "Ticket %s (%s) descartado da fila cheia",
+            ticket.thread_id,
+            ticket.prioridade,
+        )
+        if not ticket.futuro.done():
+            ticket.futuro.set_exception(FilaCheia(ticket.prioridade, len(self.fila)))
+
+    async def _trabalhar(self):
+        while True:
+            async with self._condicao:
+                await self._condicao.wait_for(
+                    lambda: len(self.fila) or self._encerrando
+                )
+                if not len(self.fila):
+                    return
+                ticket, envelhecido = self.fila.retirar()
+                # Libera vaga para quem aguarda admissão
+                self._condicao.notify_all()
+            if ticket.futuro.done():  # cliente desistiu enquanto esperava
+                continue
+            await self._executar(ticket, envelhecido)
+
+    async def _executar(self, ticket: _Ticket, envelhecido: bool):
+        prioridade = ticket.prioridade
+        metricas.observar(
+            "suporte_fila_espera_segundos",
+            time.perf_counter() - ticket.entrada,
+            prioridade=prioridade,
+        )
+        if envelhecido:
+            metricas.incrementar(
+                "suporte_fila_envelhecidos_total", prioridade=prioridade
+            )
+        self.em_execucao += 1
+        desfecho = "concluido"
+        try:
+            resultado = await self.executar(ticket.query, ticket.thread_id)
+            if not ticket.futuro.done():
+                ticket.futuro.set_result(resultado)
+        except Exception as e:
+            desfecho = "erro"
+            logger.error("Erro no ticket da thread %s: %s", ticket.thread_id, e)
+            if not ticket.futuro.done():
+                ticket.futuro.set_exception(e)
+        finally:
+            self.em_execucao -= 1
+            metricas.observar(
+                "suporte_fila_latencia_segundos",
+                time.perf_counter() - ticket.entrada,
+                prioridade=prioridade,
+            )
+            metricas.incrementar(
+                "suporte_fila_tickets_total", prioridade=prioridade, desfecho=desfecho
+            )
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Tamanho da fila (total e por prioridade) e tickets em execução"""
+        return {
+            "tamanho": len(self.fila),
+            "em_execucao": self.em_execucao,
+            **{
+                f"tamanho_{prioridade.lower()}": len(fila)
+                for prioridade, fila in self.fila.filas.items()
+            },
+        }
@@ -3,7 +3,19 @@ Workflow de Suporte Multi-Agente usando LangGraph
 Versão simplificada e estável para fins educacionais
 """
 
-from typing import Dict, Any
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from datetime import datetime
 
@@ -12,41 +24,192 @@ from utils.state import (
     StateSuporteSimples,
     CategoryType,
     AgentType,
+    OrigemRotulo,
     criar_estado_inicial,
 )
-from agents.agente_coordenador import categorizar_consulta, analisar_sentimento
-from agents.agente_tecnico import buscar_solucao_tecnica, avaliar_complexidade_tecnica
+from agents.agente_coordenador import (
+    categorizar_consulta,
+    analisar_sentimento,
+    determinar_prioridade,
+    triar_consulta,
+    triar_consultas_lote,
+    categorizar_consultas_lote,
+    analisar_sentimentos_lote,
+)
+from agents.agente_tecnico import buscar_solucao_tecnica
 from agents.agente_financeiro import consultar_politica_financeira, calcular_reembolso
 from agents.agente_geral import buscar_informacao_empresa
-from memory.workflow_memory import checkpointer
+from agents.classificador_local import ClassificadorLocal, carregar_classificador
+from memory.historico import GerenciadorHistorico
+from memory.workflow_memory import obter_checkpointer
+from utils.motor_regras import Decisao, obter_motor_regras
+from utils.observabilidade import instrumentar_no, metricas
+from utils.texto import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+
+# Nós de triagem e os campos que cada um define (eventos de streaming)
+EVENTOS_TRIAGEM = {
+    "category": "categoria",
+    "sentiment": "sentimento",
+    "priority": "prioridade",
+}
+NOS_TRIAGEM = {"triar", "categorizar", "analisar_sentimento", "consolidar_triagem"}
+
+# Modos de durabilidade do checkpoint (parâmetro durability do LangGraph):
+#   sync  - grava cada passo antes de iniciar o próximo
+#   async - grava cada passo em segundo plano, enquanto o próximo executa
+#   exit  - grava só quando a execução termina (ou é interrompida)
+MODOS_DURABILIDADE = ("sync", "async", "exit")
+DURABILIDADE_PADRAO = os.getenv("WORKFLOW_DURABILIDADE", "async")
+
+# Diagrama do workflow (gerado só sob demanda)
+DIAGRAMA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "workflow_diagram.png"
+)
+
+# Agente escolhido por nó especialista
+AGENTE_POR_NO = {
+    "agent_tecnico": AgentType.TECNICO,
+    "agent_financeiro": AgentType.FINANCEIRO,
+    "agent_geral": AgentType.GERAL,
+}
+NO_POR_AGENTE = {agente: no for no, agente in AGENTE_POR_NO.items()}
+
+# Consultas idênticas (texto normalizado) simultâneas de threads sem histórico
+# compartilham uma execução (opt-in)
+COALESCER_PADRAO = os.getenv("WORKFLOW_COALESCER", "0") == "1"
+# Campos do resultado copiados da execução compartilhada para cada thread
+CAMPOS_COALESCIDOS = (
+    "category",
+    "sentiment",
+    "priority",
+    "response",
+    "agent_used",
+    "escalated",
+)
+
+metricas.declarar(
+    "suporte_consultas_coalescidas_total",
+    "counter",
+    "Consultas atendidas pela execução em andamento de uma consulta idêntica",
+)
 
 
 class WorkflowSuporteMultiAgente:
     """Workflow principal usando tools diretamente - versão educacional simplificada"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        triagem_conjunta: bool = True,
+        usar_classificador_local: bool = True,
+        classificador_local: Optional[ClassificadorLocal] = None,
+        limiar_categoria: Optional[float] = None,
+        limiar_sentimento: Optional[float] = None,
+        durabilidade: str = DURABILIDADE_PADRAO,
+        checkpointer=None,
+        historico: Optional[GerenciadorHistorico] = None,
+        coalescer: bool = COALESCER_PADRAO,
+    ):
+        """
+        Args:
+            triagem_conjunta: Se True, categoria, sentimento e prioridade saem de
+                uma única chamada ao LLM (nó "triar"). Se False, usa o caminho
+                com dois nós, "categorizar" e "analisar_sentimento",
+                executados em paralelo e consolidados em "consolidar_triagem".
+            usar_classificador_local: Tenta o classificador local antes do LLM
+                (só tem efeito se houver um modelo treinado).
+            classificador_local: Classificador já carregado (opcional).
+            limiar_categoria: Confiança mínima para aceitar a categoria local.
+            limiar_sentimento: Confiança mínima para aceitar o sentimento local.
+            durabilidade: Quando os checkpoints são gravados: "sync", "async"
+                ou "exit" (ver MODOS_DURABILIDADE).
+            checkpointer: Checkpointer do grafo (padrão: o global de
+                memory.workflow_memory).
+            historico: Orçamento de tokens das mensagens de cada thread
+                (padrão: GerenciadorHistorico com a configuração do ambiente).
+            coalescer: Consultas idênticas simultâneas (texto normalizado) de
+                threads ainda sem histórico compartilham a triagem e o agente
+                especialista de uma única execução; cada thread_id recebe o
+                próprio checkpoint. Threads com histórico sempre rodam sozinhas.
+        """
+        if durabilidade not in MODOS_DURABILIDADE:
+            raise ValueError(
+                f"durabilidade deve ser um de {MODOS_DURABILIDADE}, não {durabilidade!r}"
+            )
+        self.triagem_conjunta = triagem_conjunta
+        self.durabilidade = durabilidade
+        self.checkpointer = checkpointer
+        self.historico = historico or GerenciadorHistorico()
+        self.coalescer = coalescer
+        # Execuções em andamento por consulta normalizada (estado final)
+        self._em_andamento: Dict[str, Future] = {}
+        self._lock_em_andamento = threading.Lock()
+        self.tempos_inicializacao: Dict[str, float] = {}
+
+        # Fast-path local: evita o LLM quando o classificador está confiante
+        inicio = time.perf_counter()
+        self.classificador_local = None
+        if usar_classificador_local:
+            self.classificador_local = classificador_local or carregar_classificador()
+        self.tempos_inicializacao["classificador_local"] = time.perf_counter() - inicio
+        if self.classificador_local is not None:
+            if limiar_categoria is not None:
+                self.classificador_local.limiar_categoria = limiar_categoria
+            if limiar_sentimento is not None:
+                self.classificador_local.limiar_sentimento = limiar_sentimento
+
         # Criar workflow
+        inicio = time.perf_counter()
         self.app = self._criar_workflow()
+        self.tempos_inicializacao["compilacao"] = time.perf_counter() - inicio
 
     def _criar_workflow(self) -> StateGraph:
         """Cria workflow simplificado usando tools diretamente"""
         workflow = StateGraph(StateSuporteSimples)
 
         # === NÓSAÇÕES ===
-        workflow.add_node("inicializar", self._inicializar)
-        workflow.add_node("categorizar", self._categorizar)
-        workflow.add_node("analisar_sentimento", self._analisar_sentimento)
-        workflow.add_node("agent_tecnico", self._processar_tecnico)
-        workflow.add_node("agent_financeiro", self._processar_financeiro)
-        workflow.add_node("agent_geral", self._processar_geral)
+        # Nós que chamam o LLM têm versão síncrona e assíncrona (invoke/ainvoke)
+        self._adicionar_no(
+            workflow, "inicializar", self._inicializar, self._ainicializar
+        )
+        if self.triagem_conjunta:
+            self._adicionar_no(workflow, "triar", self._triar, self._atriar)
+        else:
+            self._adicionar_no(
+                workflow, "categorizar", self._categorizar, self._acategorizar
+            )
+            self._adicionar_no(
+                workflow,
+                "analisar_sentimento",
+                self._analisar_sentimento,
+                self._aanalisar_sentimento,
+            )
+            self._adicionar_no(workflow, "consolidar_triagem", self._consolidar_triagem)
+        self._adicionar_no(workflow, "agent_tecnico", self._processar_tecnico)
+        self._adicionar_no(workflow, "agent_financeiro", self._processar_financeiro)
+        self._adicionar_no(workflow, "agent_geral", self._processar_geral)
 
         # === EDGES ===
-        workflow.add_edge("inicializar", "categorizar")
-        workflow.add_edge("categorizar", "analisar_sentimento")
+        if self.triagem_conjunta:
+            workflow.add_edge("inicializar", "triar")
+            ultimo_no_triagem = "triar"
+        else:
+            # Fan-out: categorização e sentimento são independentes e rodam em paralelo
+            workflow.add_edge("inicializar", "categorizar")
+            workflow.add_edge("inicializar", "analisar_sentimento")
+            # Fan-in: aguarda os dois ramos antes de rotear
+            workflow.add_edge(
+                ["categorizar", "analisar_sentimento"], "consolidar_triagem"
+            )
+            ultimo_no_triagem = "consolidar_triagem"
+        # processar_lote retoma o grafo a partir deste nó
+        self.no_final_triagem = ultimo_no_triagem
 
         # Roteamento direto após análise
         workflow.add_conditional_edges(
-            "analisar_sentimento",
+            ultimo_no_triagem,
             self._rotear_agente,
             {
                 "agent_tecnico": "agent_tecnico",
@@ -63,58 +226,196 @@ class WorkflowSuporteMultiAgente:
         # Ponto de entrada
         workflow.set_entry_point("inicializar")
 
-        return workflow.compile(checkpointer=checkpointer)
+        # O checkpointer atende tanto invoke quanto ainvoke
+        return workflow.compile(checkpointer=self.checkpointer or obter_checkpointer())
+
+    @staticmethod
+    def _adicionar_no(workflow: StateGraph, nome: str, funcao, afuncao=None):
+        """Adiciona o nó instrumentado (duração e erros em utils.observabilidade)"""
+        funcao = instrumentar_no(nome, funcao)
+        if afuncao is not None:
+            funcao = RunnableLambda(funcao, afunc=instrumentar_no(nome, afuncao))
+        workflow.add_node(nome, funcao)
 
     # === FUNÇÕES DOS NÓS ===
 
     def _inicializar(self, state: StateSuporteSimples) -> StateSuporteSimples:
-        """Inicializa estado com timestamp"""
-        print("🚀 Inicializando processamento...")
-        return {**state, "timestamp": datetime.now().isoformat()}
+        """Inicializa estado com timestamp e mantém o histórico no orçamento"""
+        logger.debug("Inicializando processamento")
+        return {
+            "timestamp": datetime.now().isoformat(),
+            **self.historico.compactar(state),
+        }
+
+    async def _ainicializar(self, state: StateSuporteSimples) -> StateSuporteSimples:
+        """Versão assíncrona de _inicializar"""
+        logger.debug("Inicializando processamento")
+        return {
+            "timestamp": datetime.now().isoformat(),
+            **await self.historico.acompactar(state),
+        }
+
+    def _classificar_local(self, query: str) -> Optional[Dict[str, Any]]:
+        """Previsão do classificador local, ou None se ele não estiver ativo"""
+        if self.classificador_local is None:
+            return None
+        return self.classificador_local.classificar(query)
+
+    def _triagem_local(self, query: str) -> Optional[Dict[str, str]]:
+        """Triagem completa pelo classificador local, se ele estiver confiante"""
+        local = self._classificar_local(query)
+        if not (local and local["categoria_confiavel"] and local["sentimento_confiavel"]):
+            return None
+        metricas.incrementar("suporte_classificador_local_total", etapa="triagem")
+        logger.debug("Triagem resolvida pelo classificador local")
+        return {
+            "categoria": local["categoria"],
+            "sentimento": local["sentimento"],
+            "origem": OrigemRotulo.LOCAL,
+            "prioridade": determinar_prioridade.invoke(
+                {
+                    "categoria": local["categoria"],
+                    "sentimento": local["sentimento"],
+                    "query": query,
+                }
+            ),
+        }
+
+    def _categoria_local(self, query: str) -> Optional[str]:
+        """Categoria pelo classificador local, se ele estiver confiante"""
+        local = self._classificar_local(query)
+        if not (local and local["categoria_confiavel"]):
+            return None
+        metricas.incrementar("suporte_classificador_local_total", etapa="categoria")
+        logger.debug("Categoria resolvida pelo classificador local")
+        return local["categoria"]
+
+    def _sentimento_local(self, query: str) -> Optional[str]:
+        """Sentimento pelo classificador local, se ele estiver confiante"""
+        local = self._classificar_local(query)
+        if not (local and local["sentimento_confiavel"]):
+            return None
+        metricas.incrementar("suporte_classificador_local_total", etapa="sentimento")
+        logger.debug("Sentimento resolvido pelo classificador local")
+        return local["sentimento"]
+
+    def _resultado_triagem(self, triagem: Dict[str, str]) -> Dict[str, Any]:
+        # Triagens do LLM não trazem "origem"; as do fast-path local trazem
+        origem = triagem.get("origem", OrigemRotulo.LLM)
+        logger.info(
+            "Triagem: categoria=%s sentimento=%s prioridade=%s",
+            triagem["categoria"],
+            triagem["sentimento"],
+            triagem["prioridade"],
+        )
+        return {
+            "category": triagem["categoria"],
+            "sentiment": triagem["sentimento"],
+            "priority": triagem["prioridade"],
+            "origem_categoria": origem,
+            "origem_sentimento": origem,
+        }
+
+    def _triar(self, state: StateSuporteSimples) -> Dict[str, Any]:
+        """Categoriza, analisa sentimento e prioriza com uma única chamada ao LLM"""
+        logger.debug("Triando consulta (categoria + sentimento + prioridade)")
+        query = state["query"]
+        triagem = self._triagem_local(query) or triar_consulta.invoke({"query": query})
+        return self._resultado_triagem(triagem)
 
-    def _categorizar(self, state: StateSuporteSimples) -> StateSuporteSimples:
+    async def _atriar(self, state: StateSuporteSimples) -> Dict[str, Any]:
+        """Versão assíncrona de _triar"""
+        logger.debug("Triando consulta (categoria + sentimento + prioridade)")
+        query = state["query"]
+        triagem = self._triagem_local(query) or await triar_consulta.ainvoke(
+            {"query": query}
+        )
+        return self._resultado_triagem(triagem)
+
+    def _categorizar(self, state: StateSuporteSimples) -> Dict[str, Any]:
         """Categoriza consulta usando tool de categorização diretamente"""
-        print("🎯 Categorizando consulta...")
+        logger.debug("Categorizando consulta")
 
-        # Usar tool de categorização diretamente
+        # Usar tool de categorização diretamente (se o fast-path local não resolver)
         query = state["query"]
-        categoria = categorizar_consulta.invoke({"query": query})
+        categoria = self._categoria_local(query)
+        origem = OrigemRotulo.LOCAL if categoria else OrigemRotulo.LLM
+        categoria = categoria or categorizar_consulta.invoke({"query": query})
 
-        print(f"📂 Categoria identificada: {categoria}")
-        return {**state, "category": categoria}
+        logger.info("Categoria identificada: %s", categoria)
+        # Retorna só as chaves de categoria: este nó roda em paralelo com o de
+        # sentimento
+        return {"category": categoria, "origem_categoria": origem}
+
+    async def _acategorizar(self, state: StateSuporteSimples) -> Dict[str, Any]:
+        """Versão assíncrona de _categorizar"""
+        logger.debug("Categorizando consulta")
+        query = state["query"]
+        categoria = self._categoria_local(query)
+        origem = OrigemRotulo.LOCAL if categoria else OrigemRotulo.LLM
+        categoria = categoria or await categorizar_consulta.ainvoke({"query": query})
+        logger.info("Categoria identificada: %s", categoria)
+        return {"category": categoria, "origem_categoria": origem}
 
-    def _analisar_sentimento(self, state: StateSuporteSimples) -> StateSuporteSimples:
+    def _analisar_sentimento(self, state: StateSuporteSimples) -> Dict[str, Any]:
         """Analisa sentimento usando tool de sentimento diretamente"""
-        print("😊 Analisando sentimento...")
+        logger.debug("Analisando sentimento")
 
-        # Usar tool de sentimento diretamente
+        # Usar tool de sentimento diretamente (se o fast-path local não resolver)
         query = state["query"]
-        sentimento = analisar_sentimento.invoke({"query": query})
+        sentimento = self._sentimento_local(query)
+        origem = OrigemRotulo.LOCAL if sentimento else OrigemRotulo.LLM
+        sentimento = sentimento or analisar_sentimento.invoke({"query": query})
 
-        print(f"💭 Sentimento detectado: {sentimento}")
-        return {**state, "sentiment": sentimento}
+        logger.info("Sentimento detectado: %s", sentimento)
+        # Retorna só as chaves de sentimento: este nó roda em paralelo com o de
+        # categoria
+        return {"sentiment": sentimento, "origem_sentimento": origem}
+
+    async def _aanalisar_sentimento(
+        self, state: StateSuporteSimples
+    ) -> Dict[str, Any]:
+        """Versão assíncrona de _analisar_sentimento"""
+        logger.debug("Analisando sentimento")
+        query = state["query"]
+        sentimento = self._sentimento_local(query)
+        origem = OrigemRotulo.LOCAL if sentimento else OrigemRotulo.LLM
+        sentimento = sentimento or await analisar_sentimento.ainvoke({"query": query})
+        logger.info("Sentimento detectado: %s", sentimento)
+        return {"sentiment": sentimento, "origem_sentimento": origem}
+
+    def _consolidar_triagem(self, state: StateSuporteSimples) -> Dict[str, Any]:
+        """Junta os ramos paralelos de triagem e calcula a prioridade"""
+        prioridade = determinar_prioridade.invoke(
+            {
+                "categoria": state["category"],
+                "sentimento": state["sentiment"],
+                "query": state["query"],
+            }
+        )
+        logger.info("Prioridade definida: %s", prioridade)
+        return {"priority": prioridade}
 
     def _processar_tecnico(self, state: StateSuporteSimples) -> StateSuporteSimples:
         """Processa com ferramentas técnicas diretamente"""
-        print("🔧 Processando com Agente Técnico...")
+        logger.debug("Processando com Agente Técnico")
 
         query = state["query"]
 
-        # Usar tools técnicas diretamente
+        # Usar tools técnicas diretamente; a escalação vem das regras
         solucao = buscar_solucao_tecnica.invoke({"problema": query})
-        complexidade = avaliar_complexidade_tecnica.invoke({"query": query})
 
         # Criar resposta baseada nas tools
-        if complexidade == "escalate":
+        if self._decisao(state).escalar:
             resposta = f"⚠️ Este problema será escalado para um especialista de nível 2.\n\n{solucao}"
             escalado = True
         else:
             resposta = f"🔧 Solução técnica encontrada:\n\n{solucao}"
             escalado = False
 
-        print("✅ Solução técnica gerada")
+        logger.debug("Solução técnica gerada (escalado=%s)", escalado)
         return {
-            **state,
+            "messages": [AIMessage(content=resposta)],
             "response": resposta,
             "agent_used": AgentType.TECNICO,
             "escalated": escalado,
@@ -122,17 +423,18 @@ class WorkflowSuporteMultiAgente:
 
     def _processar_financeiro(self, state: StateSuporteSimples) -> StateSuporteSimples:
         """Processa com ferramentas financeiras diretamente"""
-        print("💰 Processando com Agente Financeiro...")
+        logger.debug("Processando com Agente Financeiro")
 
         query = state["query"]
 
-        # Usar tools financeiras diretamente
-        if "reembolso" in query.lower() or "estorno" in query.lower():
+        # Usar tools financeiras diretamente (tipo de consulta definido pelas regras)
+        consulta = self._decisao(state).consulta_financeira
+        if consulta == "reembolso":
             politica = consultar_politica_financeira.invoke(
                 {"tipo_consulta": "reembolso"}
             )
             resposta = f"💰 Política de Reembolso:\n\n{politica}\n\nSe precisar calcular um valor específico, por favor informe o valor da compra e há quantos dias foi realizada."
-        elif "pagamento" in query.lower():
+        elif consulta == "pagamento":
             politica = consultar_politica_financeira.invoke(
                 {"tipo_consulta": "pagamento"}
             )
@@ -142,9 +444,9 @@ class WorkflowSuporteMultiAgente:
             politica = consultar_politica_financeira.invoke({"tipo_consulta": query})
             resposta = f"💰 Informação Financeira:\n\n{politica}"
 
-        print("✅ Resposta financeira gerada")
+        logger.debug("Resposta financeira gerada (consulta=%s)", consulta)
         return {
-            **state,
+            "messages": [AIMessage(content=resposta)],
             "response": resposta,
             "agent_used": AgentType.FINANCEIRO,
             "escalated": False,
@@ -152,7 +454,7 @@ class WorkflowSuporteMultiAgente:
 
     def _processar_geral(self, state: StateSuporteSimples) -> StateSuporteSimples:
         """Processa com ferramentas gerais diretamente"""
-        print("ℹ️ Processando com Agente Geral...")
+        logger.debug("Processando com Agente Geral")
 
         query = state["query"]
 
@@ -160,9 +462,9 @@ class WorkflowSuporteMultiAgente:
         informacao = buscar_informacao_empresa.invoke({"tipo_info": query})
         resposta = f"ℹ️ Informação da Empresa:\n\n{informacao}"
 
-        print("✅ Informações gerais fornecidas")
+        logger.debug("Informações gerais fornecidas")
         return {
-            **state,
+            "messages": [AIMessage(content=resposta)],
             "response": resposta,
             "agent_used": AgentType.GERAL,
             "escalated": False,
@@ -175,20 +477,23 @@ class WorkflowSuporteMultiAgente:
         category = state.get("category", CategoryType.GENERAL)
         sentiment = state.get("sentiment", "Neutral")
 
-        print(
-            f"🎯 Roteando baseado em - Categoria: {category}, Sentimento: {sentiment}"
+        logger.debug(
+            "Roteando baseado em categoria=%s, sentimento=%s", category, sentiment
         )
 
         if sentiment == "Negative":
-            print("⚠️ Sentimento negativo detectado - processando com atenção especial")
+            logger.info("Sentimento negativo - processando com atenção especial")
 
-        # Roteamento baseado na categoria
-        if category == "Technical":
-            return "agent_tecnico"
-        elif category == "Billing":
-            return "agent_financeiro"
-        else:
-            return "agent_geral"
+        # Roteamento pela tabela de regras (agents/regras_roteamento.json)
+        return self._decisao(state).agente
+
+    def _decisao(self, state: StateSuporteSimples) -> Decisao:
+        """Decisão das regras para o ticket (avaliada uma vez e reaproveitada)"""
+        return obter_motor_regras().avaliar(
+            state.get("category", CategoryType.GENERAL),
+            state.get("sentiment", "Neutral"),
+            state.get("query", ""),
+        )
 
     # === INTERFACE PÚBLICA ===
 
@@ -198,8 +503,23 @@ class WorkflowSuporteMultiAgente:
         """
         Interface principal para processar uma consulta com memória
         """
-        print(f"\n🎯 Processando consulta: '{query[:50]}...'")
+        logger.info("Processando consulta [%s]: %r", thread_id, query[:50])
+        if not (self.coalescer and self._thread_nova(thread_id)):
+            return self._formatar_resultado(self._invocar(query, thread_id), thread_id)
+
+        futuro, lider = self._registrar_execucao(query)
+        if not lider:
+            return self._gravar_coalescida(query, thread_id, futuro.result())
+        try:
+            result = self._invocar(query, thread_id)
+        except BaseException as e:
+            self._concluir_execucao(query, futuro, erro=e)
+            raise
+        self._concluir_execucao(query, futuro, result)
+        return self._formatar_resultado(result, thread_id)
 
+    def _invocar(self, query: str, thread_id: str) -> StateSuporteSimples:
+        """Executa o grafo para a consulta na thread e devolve o estado final"""
         # Estado inicial
         initial_state = criar_estado_inicial(query)
 
@@ -207,15 +527,365 @@ class WorkflowSuporteMultiAgente:
         config = {"configurable": {"thread_id": thread_id}}
 
         # Executar workflow com memória
-        result = self.app.invoke(initial_state, config=config)
+        result = self.app.invoke(
+            initial_state, config=config, durability=self.durabilidade
+        )
+
+        logger.info("Processamento concluído por: %s", result["agent_used"])
+        return result
+
+    async def aprocessar_consulta(
+        self, query: str, thread_id: str = "demo_session"
+    ) -> Dict[str, Any]:
+        """
+        Versão assíncrona de processar_consulta (usa ainvoke e as tools assíncronas)
+        """
+        logger.info("Processando consulta (async) [%s]: %r", thread_id, query[:50])
+        if not (self.coalescer and await self._athread_nova(thread_id)):
+            result = await self._ainvocar(query, thread_id)
+            return self._formatar_resultado(result, thread_id)
+
+        futuro, lider = self._registrar_execucao(query)
+        if not lider:
+            result = await asyncio.shield(asyncio.wrap_future(futuro))
+            return await self._agravar_coalescida(query, thread_id, result)
+        # Em uma task própria: se o líder for cancelado (ex.: cliente
+        # desconectou), a execução continua para quem está aguardando
+        execucao = asyncio.ensure_future(self._ainvocar(query, thread_id))
+        execucao.add_done_callback(
+            lambda tarefa: self._concluir_tarefa(query, futuro, tarefa)
+        )
+        result = await asyncio.shield(execucao)
+        return self._formatar_resultado(result, thread_id)
+
+    async def _ainvocar(self, query: str, thread_id: str) -> StateSuporteSimples:
+        """Versão assíncrona de _invocar"""
+        config = {"configurable": {"thread_id": thread_id}}
+        result = await self.app.ainvoke(
+            criar_estado_inicial(query), config=config, durability=self.durabilidade
+        )
+
+        logger.info("Processamento concluído por: %s", result["agent_used"])
+        return result
+
+    # === COALESCÊNCIA DE CONSULTAS IDÊNTICAS ===
+
+    # Só threads sem checkpoint coalescem: a resposta de uma thread com
+    # histórico (mensagens, resumo) depende da conversa, não só da consulta
+    def _thread_nova(self, thread_id: str) -> bool:
+        config = {"configurable": {"thread_id": thread_id}}
+        return self.app.checkpointer.get_tuple(config) is None
+
+    async def _athread_nova(self, thread_id: str) -> bool:
+        config = {"configurable": {"thread_id": thread_id}}
+        return await self.app.checkpointer.aget_tuple(config) is None
+
+    def _registrar_execucao(self, query: str) -> Tuple[Future, bool]:
+        """Future da execução em andamento da consulta e se esta chamada a lidera"""
+        chave = normalizar_texto(query)
+        with self._lock_em_andamento:
+            futuro = self._em_andamento.get(chave)
+            if futuro is not None:
+                return futuro, False
+            futuro = self._em_andamento[chave] = Future()
+            return futuro, True
+
+    def _concluir_execucao(
+        self,
+        query: str,
+        futuro: Future,
+        result: Optional[StateSuporteSimples] = None,
+        erro: Optional[BaseException] = None,
+    ):
+        """Libera a chave e entrega o estado final (ou o erro) a quem aguarda"""
+        with self._lock_em_andamento:
+            self._em_andamento.pop(normalizar_texto(query), None)
+        if erro is not None:
+            futuro.set_exception(erro)
+        else:
+            futuro.set_result(result)
 
-        print(f"🎉 Processamento concluído por: {result['agent_used']}")
+    def _concluir_tarefa(self, query: str, futuro: Future, tarefa: asyncio.Task):
+        if tarefa.cancelled():
+            self._concluir_execucao(query, futuro, erro=asyncio.CancelledError())
+        elif tarefa.exception() is not None:
+            self._concluir_execucao(query, futuro, erro=tarefa.exception())
+        else:
+            self._concluir_execucao(query, futuro, tarefa.result())
 
-        # Retornar resultado limpo
+    def _estado_coalescido(
+        self, query: str, thread_id: str, compartilhado: StateSuporteSimples
+    ) -> Dict[str, Any]:
+        """Estado da thread com o resultado da execução compartilhada"""
+        metricas.incrementar("suporte_consultas_coalescidas_total")
+        logger.info(
+            "Consulta [%s] atendida por execução idêntica em andamento", thread_id
+        )
+        return {
+            **criar_estado_inicial(query),
+            **{campo: compartilhado[campo] for campo in CAMPOS_COALESCIDOS},
+            # Rótulos copiados não são um exemplo novo para o classificador
+            "origem_categoria": OrigemRotulo.COALESCIDA,
+            "origem_sentimento": OrigemRotulo.COALESCIDA,
+            "messages": [
+                HumanMessage(content=query),
+                AIMessage(content=compartilhado["response"]),
+            ],
+        }
+
+    def _gravar_coalescida(
+        self, query: str, thread_id: str, compartilhado: StateSuporteSimples
+    ) -> Dict[str, Any]:
+        """
+        Grava o checkpoint da thread como se o agente especialista tivesse
+        rodado nela (o grafo fica concluído) e devolve o resultado
+        """
+        estado = self._estado_coalescido(query, thread_id, compartilhado)
+        no = NO_POR_AGENTE[AgentType(estado["agent_used"])]
+        self.app.update_state(
+            {"configurable": {"thread_id": thread_id}}, estado, as_node=no
+        )
+        return self._formatar_resultado(estado, thread_id)
+
+    async def _agravar_coalescida(
+        self, query: str, thread_id: str, compartilhado: StateSuporteSimples
+    ) -> Dict[str, Any]:
+        """Versão assíncrona de _gravar_coalescida"""
+        estado = self._estado_coalescido(query, thread_id, compartilhado)
+        no = NO_POR_AGENTE[AgentType(estado["agent_used"])]
+        await self.app.aupdate_state(
+            {"configurable": {"thread_id": thread_id}}, estado, as_node=no
+        )
+        return self._formatar_resultado(estado, thread_id)
+
+    async def aprocessar_consultas(
+        self,
+        queries: List[str],
+        thread_ids: Optional[List[str]] = None,
+        max_concorrencia: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        Processa várias consultas concorrentemente, no máximo `max_concorrencia`
+        ao mesmo tempo. Cada consulta roda na sua própria thread_id.
+
+        Args:
+            queries: Consultas a processar.
+            thread_ids: Uma thread_id por consulta (gerada se omitida).
+            max_concorrencia: Limite de consultas em execução simultânea.
+
+        Returns:
+            list: Resultados na mesma ordem de `queries`. Consultas que falharem
+                trazem a chave "erro" no lugar da resposta.
+        """
+        if thread_ids is None:
+            lote = uuid.uuid4().hex[:8]
+            thread_ids = [f"lote_{lote}_{i}" for i in range(len(queries))]
+        if len(thread_ids) != len(queries):
+            raise ValueError("thread_ids deve ter o mesmo tamanho de queries")
+
+        semaforo = asyncio.Semaphore(max_concorrencia)
+
+        async def _processar(query: str, thread_id: str) -> Dict[str, Any]:
+            async with semaforo:
+                try:
+                    return await self.aprocessar_consulta(query, thread_id)
+                except Exception as e:
+                    logger.error("Erro na consulta da thread %s: %s", thread_id, e)
+                    return {"query": query, "thread_id": thread_id, "erro": str(e)}
+
+        return await asyncio.gather(
+            *(_processar(q, t) for q, t in zip(queries, thread_ids))
+        )
+
+    def stream_consulta(
+        self, query: str, thread_id: str = "demo_session"
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Processa a consulta emitindo eventos à medida que o grafo avança.
+
+        Eventos (dicts com a chave "evento"):
+            - "categoria", "sentimento", "prioridade": assim que a triagem os define
+            - "agente": quando o agente especialista começa a executar
+            - "resposta_parcial": trechos da resposta (campo "texto")
+            - "fim": resultado completo, igual ao de processar_consulta
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        for modo, chunk in self.app.stream(
+            criar_estado_inicial(query),
+            config,
+            stream_mode=["tasks", "updates"],
+            durability=self.durabilidade,
+        ):
+            yield from self._eventos_stream(modo, chunk)
+
+        final = self.app.get_state(config).values
+        yield {"evento": "fim", "resultado": self._formatar_resultado(final, thread_id)}
+
+    async def astream_consulta(
+        self, query: str, thread_id: str = "demo_session"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Versão assíncrona de stream_consulta (usa astream)"""
+        config = {"configurable": {"thread_id": thread_id}}
+        async for modo, chunk in self.app.astream(
+            criar_estado_inicial(query),
+            config,
+            stream_mode=["tasks", "updates"],
+            durability=self.durabilidade,
+        ):
+            for evento in self._eventos_stream(modo, chunk):
+                yield evento
+
+        final = (await self.app.aget_state(config)).values
+        yield {"evento": "fim", "resultado": self._formatar_resultado(final, thread_id)}
+
+    def _eventos_stream(self, modo: str, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Converte um chunk do app.stream em eventos para o cliente"""
+        eventos = []
+
+        # Início de tarefa: o roteamento já escolheu o agente especialista
+        if modo == "tasks":
+            if chunk["name"] in AGENTE_POR_NO and "input" in chunk:
+                eventos.append(
+                    {"evento": "agente", "valor": AGENTE_POR_NO[chunk["name"]]}
+                )
+            return eventos
+
+        for no, atualizacao in chunk.items():
+            if not atualizacao:
+                continue
+            if no in NOS_TRIAGEM:
+                for campo, evento in EVENTOS_TRIAGEM.items():
+                    if campo in atualizacao:
+                        eventos.append({"evento": evento, "valor": atualizacao[campo]})
+            elif no in AGENTE_POR_NO and atualizacao.get("response"):
+                # Os especialistas montam a resposta de uma vez; ela é repassada
+                # em trechos (linha a linha) para o front-end exibir progressivamente
+                for trecho in atualizacao["response"].splitlines(keepends=True):
+                    eventos.append({"evento": "resposta_parcial", "texto": trecho})
+        return eventos
+
+    def processar_lote(
+        self,
+        queries: List[str],
+        thread_ids: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Processa um lote de consultas (backfill / reprocessamento offline).
+
+        A triagem de todas as consultas é feita primeiro, com as chamadas ao
+        LLM agrupadas em chain.batch. Depois cada ticket entra no grafo já
+        triado (como se o nó de triagem tivesse rodado) e segue pelo
+        roteamento e pelo agente especialista, com checkpoint na sua thread.
+
+        Args:
+            queries: Consultas a processar.
+            thread_ids: Uma thread_id por consulta (gerada se omitida).
+
+        Returns:
+            list: Resultados na mesma ordem de `queries`. Consultas que falharem
+                trazem a chave "erro" no lugar da resposta.
+        """
+        if thread_ids is None:
+            lote = uuid.uuid4().hex[:8]
+            thread_ids = [f"lote_{lote}_{i}" for i in range(len(queries))]
+        if len(thread_ids) != len(queries):
+            raise ValueError("thread_ids deve ter o mesmo tamanho de queries")
+        if not queries:
+            return []
+
+        logger.info("Processando lote de %d consultas", len(queries))
+        triagens = self._triar_lote(queries)
+
+        configs = [{"configurable": {"thread_id": t}} for t in thread_ids]
+        for query, triagem, config in zip(queries, triagens, configs):
+            estado = {
+                **criar_estado_inicial(query),
+                "category": triagem["categoria"],
+                "sentiment": triagem["sentimento"],
+                "priority": triagem["prioridade"],
+                "origem_categoria": triagem["origem_categoria"],
+                "origem_sentimento": triagem["origem_sentimento"],
+            }
+            self.app.update_state(config, estado, as_node=self.no_final_triagem)
+
+        # Roteamento + agentes especialistas para todos os tickets
+        finais = self.app.batch(
+            [None] * len(queries),
+            configs,
+            return_exceptions=True,
+            durability=self.durabilidade,
+        )
+
+        resultados = []
+        for query, thread_id, final in zip(queries, thread_ids, finais):
+            if isinstance(final, Exception):
+                logger.error("Erro na consulta da thread %s: %s", thread_id, final)
+                resultados.append(
+                    {"query": query, "thread_id": thread_id, "erro": str(final)}
+                )
+            else:
+                resultados.append(self._formatar_resultado(final, thread_id))
+        logger.info("Lote concluído: %d consultas", len(resultados))
+        return resultados
+
+    def _triar_lote(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Triagem de várias consultas, com o fast-path local antes do LLM"""
+        if self.triagem_conjunta:
+            triagens = [self._triagem_local(q) for q in queries]
+            pendentes = [i for i, t in enumerate(triagens) if t is None]
+            if pendentes:
+                lote = triar_consultas_lote([queries[i] for i in pendentes])
+                for i, triagem in zip(pendentes, lote):
+                    triagens[i] = triagem
+            for triagem in triagens:
+                origem = triagem.pop("origem", OrigemRotulo.LLM)
+                triagem["origem_categoria"] = triagem["origem_sentimento"] = origem
+            return triagens
+
+        categorias = [self._categoria_local(q) for q in queries]
+        origens_categoria = [
+            OrigemRotulo.LOCAL if c else OrigemRotulo.LLM for c in categorias
+        ]
+        pendentes = [i for i, c in enumerate(categorias) if c is None]
+        if pendentes:
+            lote = categorizar_consultas_lote([queries[i] for i in pendentes])
+            for i, categoria in zip(pendentes, lote):
+                categorias[i] = categoria
+
+        sentimentos = [self._sentimento_local(q) for q in queries]
+        origens_sentimento = [
+            OrigemRotulo.LOCAL if s else OrigemRotulo.LLM for s in sentimentos
+        ]
+        pendentes = [i for i, s in enumerate(sentimentos) if s is None]
+        if pendentes:
+            lote = analisar_sentimentos_lote([queries[i] for i in pendentes])
+            for i, sentimento in zip(pendentes, lote):
+                sentimentos[i] = sentimento
+
+        return [
+            {
+                "categoria": categoria,
+                "sentimento": sentimento,
+                "prioridade": determinar_prioridade.invoke(
+                    {"categoria": categoria, "sentimento": sentimento, "query": query}
+                ),
+                "origem_categoria": origens_categoria[i],
+                "origem_sentimento": origens_sentimento[i],
+            }
+            for i, (query, categoria, sentimento) in enumerate(
+                zip(queries, categorias, sentimentos)
+            )
+        ]
+
+    def _formatar_resultado(
+        self, result: StateSuporteSimples, thread_id: str
+    ) -> Dict[str, Any]:
+        """Retorna resultado limpo a partir do estado final"""
         return {
             "query": result["query"],
             "category": result["category"],
             "sentiment": result["sentiment"],
+            "priority": result["priority"],
             "response": result["response"],
             "agent_used": result["agent_used"],
             "escalated": result["escalated"],
@@ -227,26 +897,141 @@ class WorkflowSuporteMultiAgente:
 # === FUNÇÃO HELPER ===
 
 
-def criar_workflow() -> WorkflowSuporteMultiAgente:
+def _env_ativo(nome: str) -> bool:
+    return os.getenv(nome, "").strip().lower() in ("1", "true", "sim", "yes")
+
+
+_ASSINATURA_PNG = b"\x89PNG\r\n\x1a\n"
+_CHAVE_HASH_PNG = b"workflow-hash"
+
+
+def _png_com_hash(imagem: bytes, assinatura: str) -> bytes:
+    """Insere o hash do grafo num chunk tEXt logo após o IHDR do PNG"""
+    if not imagem.startswith(_ASSINATURA_PNG):
+        return imagem
+    (tamanho_ihdr,) = struct.unpack(">I", imagem[8:12])
+    fim_ihdr = 8 + 12 + tamanho_ihdr
+    dados = _CHAVE_HASH_PNG + b"\0" + assinatura.encode("ascii")
+    chunk = (
+        struct.pack(">I", len(dados))
+        + b"tEXt"
+        + dados
+        + struct.pack(">I", zlib.crc32(b"tEXt" + dados))
+    )
+    return imagem[:fim_ihdr] + chunk + imagem[fim_ihdr:]
+
+
+def _hash_png(caminho: str) -> Optional[str]:
+    """Hash do grafo gravado no PNG por _png_com_hash (None se não houver)"""
+    try:
+        with open(caminho, "rb") as f:
+            imagem = f.read()
+    except OSError:
+        return None
+    if not imagem.startswith(_ASSINATURA_PNG):
+        return None
+    posicao = 8
+    while posicao + 8 <= len(imagem):
+        tamanho, tipo = struct.unpack(">I4s", imagem[posicao : posicao + 8])
+        if tipo == b"IDAT":
+            break
+        if tipo == b"tEXt":
+            chave, _, valor = imagem[posicao + 8 : posicao + 8 + tamanho].partition(
+                b"\0"
+            )
+            if chave == _CHAVE_HASH_PNG:
+                return valor.decode("ascii")
+        posicao += 12 + tamanho
+    return None
+
+
+def salvar_diagrama(
+    workflow: WorkflowSuporteMultiAgente,
+    caminho: str = DIAGRAMA_PATH,
+    png: bool = True,
+    permitir_rede: bool = False,
+) -> str:
+    """
+    Salva o diagrama do workflow, reaproveitando o arquivo se o grafo não mudou.
+
+    O texto Mermaid é sempre gravado ao lado do PNG (.mmd), com o hash da
+    estrutura do grafo na primeira linha; o PNG guarda o próprio hash num
+    chunk tEXt, e cada arquivo só é reaproveitado se o seu hash bater. O PNG
+    é desenhado localmente via graphviz; o render remoto (mermaid.ink) só é
+    usado com permitir_rede=True.
+
+    Args:
+        workflow: Workflow já compilado.
+        caminho: Caminho do PNG (o .mmd usa o mesmo nome).
+        png: Se False, grava só o texto Mermaid.
+        permitir_rede: Permite o render remoto quando graphviz não está instalado.
+
+    Returns:
+        str: Caminho do arquivo mais completo disponível (PNG ou .mmd).
+    """
+    grafo = workflow.app.get_graph()
+    mermaid = grafo.draw_mermaid()
+    assinatura = hashlib.sha256(mermaid.encode("utf-8")).hexdigest()[:16]
+    cabecalho = f"%% hash: {assinatura}"
+    caminho_mmd = os.path.splitext(caminho)[0] + ".mmd"
+
+    # Cache: cada arquivo vale só se foi gerado a partir deste mesmo grafo
+    mmd_em_cache = False
+    if os.path.exists(caminho_mmd):
+        with open(caminho_mmd, encoding="utf-8") as f:
+            mmd_em_cache = f.readline().strip() == cabecalho
+    if mmd_em_cache and (not png or _hash_png(caminho) == assinatura):
+        logger.info("Diagrama inalterado (hash %s), usando cache", assinatura)
+        return caminho if png else caminho_mmd
+
+    if not mmd_em_cache:
+        with open(caminho_mmd, "w", encoding="utf-8") as f:
+            f.write(f"{cabecalho}\n{mermaid}")
+    if not png:
+        logger.info("Diagrama Mermaid salvo em: %s", caminho_mmd)
+        return caminho_mmd
+
+    try:
+        imagem = grafo.draw_png()
+    except ImportError:
+        if not permitir_rede:
+            logger.warning(
+                "graphviz indisponível; diagrama salvo só em Mermaid: %s", caminho_mmd
+            )
+            return caminho_mmd
+        imagem = grafo.draw_mermaid_png()
+
+    with open(caminho, "wb") as f:
+        f.write(_png_com_hash(imagem, assinatura))
+    logger.info("Diagrama salvo em: %s", caminho)
+    return caminho
+
+
+def criar_workflow(gerar_diagrama: Optional[bool] = None) -> WorkflowSuporteMultiAgente:
     """
     Função helper para criar e configurar o workflow
     Versão simplificada e estável
+
+    Args:
+        gerar_diagrama: Salva o diagrama do grafo. Se None, segue a variável
+            de ambiente WORKFLOW_DIAGRAMA (desligado por padrão, para não
+            atrasar o startup). WORKFLOW_DIAGRAMA_REDE=1 permite o render remoto.
     """
-    print("🔧 Criando workflow multi-agente refatorado...")
+    logger.info("Criando workflow multi-agente")
     workflow = WorkflowSuporteMultiAgente()
-    print("✅ Workflow criado com agentes refatorados!")
+    logger.info("Workflow criado")
 
-    # Gerar visualização do grafo
-    try:
-        print("📊 Gerando visualização do workflow...")
-        graph_image = workflow.app.get_graph().draw_mermaid_png()
-
-        # Salvar na pasta graph
-        with open("src/graph/workflow_diagram.png", "wb") as f:
-            f.write(graph_image)
-        print("✅ Diagrama salvo em: src/graph/workflow_diagram.png")
+    if gerar_diagrama is None:
+        gerar_diagrama = _env_ativo("WORKFLOW_DIAGRAMA")
 
-    except Exception as e:
-        print(f"⚠️ Erro ao gerar diagrama: {e}")
+    # Gerar visualização do grafo
+    if gerar_diagrama:
+        try:
+            logger.info("Gerando visualização do workflow")
+            salvar_diagrama(
+                workflow, permitir_rede=_env_ativo("WORKFLOW_DIAGRAMA_REDE")
+            )
+        except Exception as e:
+            logger.warning("Erro ao gerar diagrama: %s", e)
 
     return workflow
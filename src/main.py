@@ -1,33 +1,24 @@
 """
-Exemplo Completo - Sistema Multi-Agente com LangSmith
-Execute este arquivo para ver os agentes funcionando no LangSmith
+Exemplo Completo - Sistema Multi-Agente
+Execute este arquivo para ver os agentes funcionando; as métricas e os
+spans ficam locais (utils.observabilidade). O LangSmith só é usado se o
+.env o ativar (LANGSMITH_TRACING=true e LANGSMITH_API_KEY)
 """
 
 import os
 from dotenv import load_dotenv
 from graph.workflow_suporte import criar_workflow
+from utils.observabilidade import configurar_logging, metricas
 
 # Carregar variáveis de ambiente
 load_dotenv()
-
-# Configurar OpenAI API Key
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+configurar_logging()
 
 # Verificar se API key está configurada
 if not os.getenv("OPENAI_API_KEY"):
     print("❌ ERRO: OPENAI_API_KEY não encontrada no arquivo .env")
     exit(1)
 
-# Configurar LangSmith
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = os.getenv(
-    "LANGSMITH_PROJECT", "demo-sistema-multi-agente"
-)
-os.environ["LANGCHAIN_ENDPOINT"] = os.getenv(
-    "LANGSMITH_ENDPOINT", "https://api.smith.langchain.com"
-)
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-
 
 def main():
     """Função principal para demonstração educacional"""
@@ -96,10 +87,12 @@ def main():
 
     # Resumo final
     print(f"\n🎉 Concluído: {sucessos}/{len(casos_teste)} casos corretos")
-    if os.getenv("LANGSMITH_API_KEY"):
-        print(
-            f"🔍 Traces: https://smith.langchain.com (projeto: {os.environ['LANGCHAIN_PROJECT']})"
-        )
+    print("\n⏱️ TEMPO POR NÓ")
+    for rotulos, histograma in metricas.series("suporte_no_segundos"):
+        media = histograma.soma / histograma.total * 1000
+        print(f"   {rotulos['no']:<20} {histograma.total:>3}x {media:8.1f} ms")
+    for rotulos, tokens in metricas.series("suporte_llm_tokens_total"):
+        print(f"🔢 Tokens de {rotulos['tipo']} ({rotulos['modelo']}): {tokens}")
 
 
 if __name__ == "__main__":
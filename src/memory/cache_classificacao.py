@@ -0,0 +1,256 @@
+"""
+Cache de Classificação do Coordenador
+LRU em memória na frente de uma tabela SQLite, com TTL e invalidação
+automática quando o prompt de uma tarefa muda
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from utils.texto import normalizar_texto
+
+# === CONFIGURAÇÃO ===
+
+CACHE_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache_classificacao.db"
+)
+TTL_PADRAO_SEGUNDOS = int(os.getenv("CACHE_CLASSIFICACAO_TTL", 7 * 24 * 3600))
+MAX_ITENS_MEMORIA = int(os.getenv("CACHE_CLASSIFICACAO_MAX_ITENS", 2048))
+
+
+def hash_prompt(prompt: str) -> str:
+    """Hash curto do template do prompt (muda quando o prompt é editado)"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheClassificacao:
+    """
+    Cache em dois níveis para resultados de classificação do LLM.
+
+    A chave combina tarefa, consulta normalizada, modelo e hash do prompt,
+    então editar um prompt nunca devolve classificações antigas. Entradas
+    de prompts obsoletos são apagadas do SQLite na primeira consulta da
+    tarefa com o prompt novo. As versões assíncronas (aobter/asalvar)
+    consultam o LRU no event loop e levam o acesso ao SQLite para uma thread.
+    """
+
+    def __init__(
+        self,
+        db_path: str = CACHE_DB_PATH,
+        ttl_segundos: int = TTL_PADRAO_SEGUNDOS,
+        max_itens_memoria: int = MAX_ITENS_MEMORIA,
+    ):
+        self.db_path = db_path
+        self.ttl_segundos = ttl_segundos
+        self.max_itens_memoria = max_itens_memoria
+
+        self._memoria: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._prompts_verificados: set = set()
+        self._contadores = {
+            "hits_memoria": 0,
+            "hits_sqlite": 0,
+            "misses": 0,
+            "gravacoes": 0,
+            "expirados": 0,
+            "invalidados": 0,
+        }
+
+    # === CONEXÃO ===
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Abre a conexão SQLite na primeira utilização"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_classificacao (
+                    chave TEXT PRIMARY KEY,
+                    tarefa TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    expira_em REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_tarefa "
+                "ON cache_classificacao (tarefa, prompt_hash)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # === CHAVES ===
+
+    @staticmethod
+    def gerar_chave(tarefa: str, query: str, modelo: str, prompt: str) -> str:
+        """Gera a chave do cache para uma classificação"""
+        bruto = "\x1f".join(
+            [tarefa, normalizar_texto(query), modelo, hash_prompt(prompt)]
+        )
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    # === LEITURA / ESCRITA ===
+
+    def obter(self, tarefa: str, query: str, modelo: str, prompt: str) -> Optional[Any]:
+        """Retorna o valor em cache ou None (miss ou expirado)"""
+        chave = self.gerar_chave(tarefa, query, modelo, prompt)
+        agora = time.time()
+
+        with self._lock:
+            self._invalidar_prompt_obsoleto(tarefa, prompt)
+
+            valor = self._obter_memoria(chave, agora)
+            if valor is not None:
+                return valor
+
+            linha = (
+                self._conexao()
+                .execute(
+                    "SELECT valor, expira_em FROM cache_classificacao WHERE chave = ?",
+                    (chave,),
+                )
+                .fetchone()
+            )
+            if linha is not None:
+                valor, expira_em = json.loads(linha[0]), linha[1]
+                if expira_em > agora:
+                    self._guardar_memoria(chave, valor, expira_em)
+                    self._contadores["hits_sqlite"] += 1
+                    return valor
+                self._conexao().execute(
+                    "DELETE FROM cache_classificacao WHERE chave = ?", (chave,)
+                )
+                self._conexao().commit()
+                self._contadores["expirados"] += 1
+
+            self._contadores["misses"] += 1
+            return None
+
+    async def aobter(
+        self, tarefa: str, query: str, modelo: str, prompt: str
+    ) -> Optional[Any]:
+        """Versão assíncrona de obter: só o LRU roda no event loop"""
+        chave = self.gerar_chave(tarefa, query, modelo, prompt)
+        with self._lock:
+            valor = self._obter_memoria(chave, time.time())
+        if valor is not None:
+            return valor
+        return await asyncio.to_thread(self.obter, tarefa, query, modelo, prompt)
+
+    def _obter_memoria(self, chave: str, agora: float) -> Optional[Any]:
+        """Hit no LRU em memória (chamar com o lock)"""
+        item = self._memoria.get(chave)
+        if item is None:
+            return None
+        valor, expira_em = item
+        if expira_em > agora:
+            self._memoria.move_to_end(chave)
+            self._contadores["hits_memoria"] += 1
+            return valor
+        del self._memoria[chave]
+        self._contadores["expirados"] += 1
+        return None
+
+    def salvar(self, tarefa: str, query: str, modelo: str, prompt: str, valor: Any):
+        """Grava um resultado de classificação nos dois níveis"""
+        chave = self.gerar_chave(tarefa, query, modelo, prompt)
+        expira_em = time.time() + self.ttl_segundos
+
+        with self._lock:
+            self._guardar_memoria(chave, valor, expira_em)
+            self._conexao().execute(
+                "INSERT OR REPLACE INTO cache_classificacao "
+                "(chave, tarefa, prompt_hash, valor, expira_em) VALUES (?, ?, ?, ?, ?)",
+                (chave, tarefa, hash_prompt(prompt), json.dumps(valor), expira_em),
+            )
+            self._conexao().commit()
+            self._contadores["gravacoes"] += 1
+
+    async def asalvar(
+        self, tarefa: str, query: str, modelo: str, prompt: str, valor: Any
+    ):
+        """Versão assíncrona de salvar (a gravação no SQLite roda numa thread)"""
+        await asyncio.to_thread(self.salvar, tarefa, query, modelo, prompt, valor)
+
+    def _guardar_memoria(self, chave: str, valor: Any, expira_em: float):
+        """Insere no LRU em memória respeitando o limite de itens"""
+        self._memoria[chave] = (valor, expira_em)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    # === INVALIDAÇÃO ===
+
+    def _invalidar_prompt_obsoleto(self, tarefa: str, prompt: str):
+        """Apaga (uma vez por processo) entradas da tarefa feitas com outro prompt"""
+        assinatura = (tarefa, hash_prompt(prompt))
+        if assinatura in self._prompts_verificados:
+            return
+        cursor = self._conexao().execute(
+            "DELETE FROM cache_classificacao WHERE tarefa = ? AND prompt_hash != ?",
+            (tarefa, assinatura[1]),
+        )
+        self._conexao().commit()
+        self._contadores["invalidados"] += max(cursor.rowcount, 0)
+        self._prompts_verificados.add(assinatura)
+
+    def invalidar(self, tarefa: Optional[str] = None) -> int:
+        """
+        Invalida entradas do cache.
+
+        Args:
+            tarefa: Se informada, apaga só as entradas dessa tarefa
+                (ex.: 'categorizar'); senão apaga tudo.
+
+        Returns:
+            int: Número de entradas removidas do SQLite.
+        """
+        with self._lock:
+            self._memoria.clear()
+            self._prompts_verificados.clear()
+            if tarefa is None:
+                cursor = self._conexao().execute("DELETE FROM cache_classificacao")
+            else:
+                cursor = self._conexao().execute(
+                    "DELETE FROM cache_classificacao WHERE tarefa = ?", (tarefa,)
+                )
+            self._conexao().commit()
+            removidos = max(cursor.rowcount, 0)
+            self._contadores["invalidados"] += removidos
+            return removidos
+
+    # === ESTATÍSTICAS ===
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de hit/miss e taxa de acerto"""
+        hits = self._contadores["hits_memoria"] + self._contadores["hits_sqlite"]
+        total = hits + self._contadores["misses"]
+        return {
+            **self._contadores,
+            "hits": hits,
+            "taxa_acerto": round(hits / total, 4) if total else 0.0,
+            "itens_memoria": len(self._memoria),
+        }
+
+    def fechar(self):
+        """Fecha a conexão SQLite"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Instância global usada pelas tools do coordenador
+cache_classificacao = CacheClassificacao()
@@ -0,0 +1,248 @@
+"""
+Janela de Histórico por Orçamento de Tokens
+Mantém as mensagens de cada thread dentro de um orçamento de tokens: quando
+ele estoura, os turnos mais antigos saem do estado e são incorporados a um
+resumo incremental
+
+O resumo fica no próprio estado (campo resumo_historico) e, portanto, no
+checkpoint: cada turno só é resumido uma vez, no momento em que sai da
+janela. A compactação leva o histórico até uma fração do orçamento
+(HISTORICO_ALVO), então o resumo não é refeito a cada turno.
+"""
+
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableLambda
+
+from utils.llm_pool import obter_chain
+from utils.observabilidade import metricas
+
+# === CONFIGURAÇÃO ===
+
+HISTORICO_MAX_TOKENS = int(os.getenv("HISTORICO_MAX_TOKENS", 2000))
+# Após compactar, o histórico fica com no máximo esta fração do orçamento
+HISTORICO_ALVO = float(os.getenv("HISTORICO_ALVO", 0.6))
+# "resumir" (turnos antigos viram resumo) ou "cortar" (são descartados)
+HISTORICO_MODO = os.getenv("HISTORICO_MODO", "resumir")
+MODOS_HISTORICO = ("resumir", "cortar")
+MODELO_RESUMO = "gpt-4o-mini"
+PALAVRAS_RESUMO = 150
+
+PROMPT_RESUMO = """
+        Você mantém o resumo de um atendimento de suporte ao cliente.
+
+        Resumo atual:
+        {resumo}
+
+        Novas mensagens (mais antigas primeiro):
+        {conversa}
+
+        Reescreva o resumo incorporando as novas mensagens, em no máximo
+        {palavras} palavras. Preserve problemas relatados, dados do cliente,
+        valores, prazos, soluções já tentadas e pendências.
+        """
+
+metricas.declarar(
+    "suporte_historico_compactacoes_total",
+    "counter",
+    "Compactações do histórico de uma thread",
+)
+metricas.declarar(
+    "suporte_historico_mensagens_removidas_total",
+    "counter",
+    "Mensagens que saíram da janela de histórico",
+)
+
+logger = logging.getLogger(__name__)
+
+# Recebe (resumo atual, mensagens que saem da janela) e devolve o novo resumo
+Resumidor = Callable[[str, Sequence[BaseMessage]], str]
+
+_PAPEIS = {HumanMessage: "Cliente", AIMessage: "Atendente", ToolMessage: "Ferramenta"}
+
+
+def contar_tokens(mensagens: Sequence[BaseMessage]) -> int:
+    """Estimativa de tokens (aprox. 4 caracteres por token, sem tokenizer)"""
+    return count_tokens_approximately(mensagens) if mensagens else 0
+
+
+def dividir_turnos(mensagens: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """
+    Agrupa as mensagens em turnos: cada HumanMessage abre um turno.
+
+    Cortar só entre turnos mantém juntos um tool call e sua ToolMessage.
+    """
+    turnos: List[List[BaseMessage]] = []
+    for mensagem in mensagens:
+        if isinstance(mensagem, HumanMessage) or not turnos:
+            turnos.append([])
+        turnos[-1].append(mensagem)
+    return turnos
+
+
+def formatar_conversa(mensagens: Sequence[BaseMessage]) -> str:
+    linhas = []
+    for mensagem in mensagens:
+        papel = _PAPEIS.get(type(mensagem), type(mensagem).__name__)
+        texto = mensagem.content if isinstance(mensagem.content, str) else ""
+        if texto.strip():
+            linhas.append(f"{papel}: {texto.strip()}")
+    return "\n".join(linhas)
+
+
+def _entrada_resumo(resumo: str, mensagens: Sequence[BaseMessage]) -> Dict[str, Any]:
+    return {
+        "resumo": resumo or "(vazio)",
+        "conversa": formatar_conversa(mensagens),
+        "palavras": PALAVRAS_RESUMO,
+    }
+
+
+def _chain_resumo():
+    return obter_chain("resumir_historico", PROMPT_RESUMO, MODELO_RESUMO)
+
+
+def resumir_com_llm(resumo: str, mensagens: Sequence[BaseMessage]) -> str:
+    """Resumidor padrão: chain compartilhada do llm_pool"""
+    return _chain_resumo().invoke(_entrada_resumo(resumo, mensagens)).content
+
+
+async def aresumir_com_llm(resumo: str, mensagens: Sequence[BaseMessage]) -> str:
+    return (await _chain_resumo().ainvoke(_entrada_resumo(resumo, mensagens))).content
+
+
+class GerenciadorHistorico:
+    """
+    Orçamento de tokens do histórico de uma thread.
+
+    compactar()/acompactar() devolvem a atualização de estado (RemoveMessage
+    dos turnos antigos + resumo novo); pre_model_hook() faz o mesmo e ainda
+    monta a entrada do LLM dos agentes create_react_agent.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = HISTORICO_MAX_TOKENS,
+        alvo: float = HISTORICO_ALVO,
+        modo: str = HISTORICO_MODO,
+        resumidor: Optional[Resumidor] = None,
+        aresumidor: Optional[Callable] = None,
+    ):
+        if modo not in MODOS_HISTORICO:
+            raise ValueError(f"modo deve ser um de {MODOS_HISTORICO}, não {modo!r}")
+        self.max_tokens = max_tokens
+        self.alvo = alvo
+        self.modo = modo
+        self.resumidor = resumidor or resumir_com_llm
+        self.aresumidor = aresumidor or (
+            aresumir_com_llm if resumidor is None else None
+        )
+
+    def selecionar(
+        self, mensagens: Sequence[BaseMessage], resumo: str = ""
+    ) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """
+        Divide o histórico em (antigas, mantidas).
+
+        Nada sai enquanto histórico + resumo couberem no orçamento. Ao
+        estourar, ficam os turnos mais recentes que caibam em `alvo` do
+        orçamento; o turno atual fica sempre, mesmo que sozinho passe dele.
+        """
+        tokens_resumo = (
+            count_tokens_approximately([SystemMessage(resumo)]) if resumo else 0
+        )
+        if contar_tokens(mensagens) + tokens_resumo <= self.max_tokens:
+            return [], list(mensagens)
+        limite = self.max_tokens * self.alvo - tokens_resumo
+        turnos = dividir_turnos(mensagens)
+        mantidos, total = 0, 0
+        for turno in reversed(turnos):
+            tokens = contar_tokens(turno)
+            if mantidos and total + tokens > limite:
+                break
+            mantidos += 1
+            total += tokens
+        antigas = [m for turno in turnos[: len(turnos) - mantidos] for m in turno]
+        return antigas, list(mensagens[len(antigas) :])
+
+    def _atualizacao(self, antigas: List[BaseMessage], resumo: str) -> Dict[str, Any]:
+        metricas.incrementar("suporte_historico_compactacoes_total", modo=self.modo)
+        metricas.incrementar(
+            "suporte_historico_mensagens_removidas_total", len(antigas), modo=self.modo
+        )
+        logger.debug(
+            "Histórico compactado: %d mensagens fora da janela (%s)",
+            len(antigas),
+            self.modo,
+        )
+        return {
+            "messages": [RemoveMessage(id=m.id) for m in antigas],
+            "resumo_historico": resumo,
+        }
+
+    def _fora_da_janela(self, state: Dict[str, Any]) -> Tuple[str, List[BaseMessage]]:
+        resumo = state.get("resumo_historico") or ""
+        antigas, _ = self.selecionar(state.get("messages") or [], resumo)
+        return resumo, [m for m in antigas if m.id is not None]
+
+    def compactar(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Atualização de estado que põe a thread dentro do orçamento ({} se já está)"""
+        resumo, antigas = self._fora_da_janela(state)
+        if not antigas:
+            return {}
+        if self.modo == "resumir":
+            resumo = self.resumidor(resumo, antigas)
+        return self._atualizacao(antigas, resumo)
+
+    async def acompactar(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Versão assíncrona de compactar"""
+        if self.aresumidor is None:
+            return self.compactar(state)
+        resumo, antigas = self._fora_da_janela(state)
+        if not antigas:
+            return {}
+        if self.modo == "resumir":
+            resumo = await self.aresumidor(resumo, antigas)
+        return self._atualizacao(antigas, resumo)
+
+    @staticmethod
+    def mensagens_llm(
+        mensagens: Sequence[BaseMessage], resumo: str = ""
+    ) -> List[BaseMessage]:
+        """Entrada do LLM: resumo (se houver) seguido das mensagens da janela"""
+        if not resumo:
+            return list(mensagens)
+        return [SystemMessage(f"Resumo da conversa anterior:\n{resumo}"), *mensagens]
+
+    def _entrada_llm(
+        self, state: Dict[str, Any], atualizacao: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        removidas = {m.id for m in atualizacao.get("messages", [])}
+        mensagens = [m for m in state["messages"] if m.id not in removidas]
+        resumo = atualizacao.get("resumo_historico", state.get("resumo_historico"))
+        return {
+            **atualizacao,
+            "llm_input_messages": self.mensagens_llm(mensagens, resumo or ""),
+        }
+
+    def pre_model_hook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """pre_model_hook para create_react_agent (compacta e monta a entrada)"""
+        return self._entrada_llm(state, self.compactar(state))
+
+    async def apre_model_hook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return self._entrada_llm(state, await self.acompactar(state))
+
+    def como_no(self) -> RunnableLambda:
+        """pre_model_hook com versões síncrona e assíncrona (invoke/ainvoke)"""
+        return RunnableLambda(self.pre_model_hook, afunc=self.apre_model_hook)
@@ -0,0 +1,390 @@
+"""
+Retenção e Compactação do Banco de Checkpoints
+Mantém só os últimos checkpoints de cada thread, expira conversas ociosas
+e devolve o espaço livre ao disco em segundo plano
+
+Uso (a partir da pasta src):
+    python -m memory.retencao relatorio [--top 20]
+    python -m memory.retencao podar [--manter 20] [--ttl-dias 30]
+    python -m memory.retencao compactar
+    python -m memory.retencao converter   # uma vez, fora do horário de pico
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from memory.workflow_memory import conectar_sqlite, db_path
+
+logger = logging.getLogger(__name__)
+
+# === CONFIGURAÇÃO ===
+
+CHECKPOINTS_POR_THREAD = int(os.getenv("RETENCAO_CHECKPOINTS_POR_THREAD", 20))
+TTL_THREAD_DIAS = float(os.getenv("RETENCAO_TTL_THREAD_DIAS", 30))
+INTERVALO_MINUTOS = float(os.getenv("RETENCAO_INTERVALO_MINUTOS", 30))
+PAGINAS_VACUUM = int(os.getenv("RETENCAO_PAGINAS_VACUUM", 2000))
+
+# Intervalos de 100 ns entre 1582-10-15 (época do UUID) e 1970-01-01
+_EPOCA_UUID = 0x01B21DD213814000
+
+
+def timestamp_checkpoint(checkpoint_id: str) -> float:
+    """
+    Extrai o horário Unix (segundos) de um checkpoint_id.
+
+    O LangGraph gera os ids com uuid6, que guarda o timestamp nos bits
+    mais significativos (por isso os ids também ordenam cronologicamente).
+    """
+    valor = uuid.UUID(checkpoint_id).int
+    intervalos = ((valor >> 80) << 12) | ((valor >> 64) & 0x0FFF)
+    return (intervalos - _EPOCA_UUID) / 1e7
+
+
+# === OPERAÇÕES ===
+
+
+def podar_checkpoints(conn: sqlite3.Connection, manter: int) -> int:
+    """Apaga os checkpoints além dos `manter` mais recentes de cada thread"""
+    cursor = conn.execute(
+        """
+        DELETE FROM checkpoints WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, ROW_NUMBER() OVER (
+                    PARTITION BY thread_id, checkpoint_ns
+                    ORDER BY checkpoint_id DESC
+                ) AS posicao
+                FROM checkpoints
+            ) WHERE posicao > ?
+        )
+        """,
+        (manter,),
+    )
+    removidos = max(cursor.rowcount, 0)
+    _apagar_writes_orfaos(conn)
+    conn.commit()
+    return removidos
+
+
+def expirar_threads(conn: sqlite3.Connection, ttl_segundos: float) -> List[str]:
+    """Apaga as threads cujo último checkpoint é mais antigo que o TTL"""
+    limite = time.time() - ttl_segundos
+    ultimos = conn.execute(
+        "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id"
+    ).fetchall()
+    expiradas = [
+        thread_id
+        for thread_id, checkpoint_id in ultimos
+        if timestamp_checkpoint(checkpoint_id) < limite
+    ]
+    for thread_id in expiradas:
+        conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+    conn.commit()
+    return expiradas
+
+
+def _apagar_writes_orfaos(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        DELETE FROM writes WHERE NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = writes.thread_id
+              AND c.checkpoint_ns = writes.checkpoint_ns
+              AND c.checkpoint_id = writes.checkpoint_id
+        )
+        """
+    )
+
+
+def auto_vacuum_incremental(conn: sqlite3.Connection) -> bool:
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def converter_auto_vacuum(conn: sqlite3.Connection) -> bool:
+    """
+    Converte o banco para auto_vacuum=INCREMENTAL (uma única vez).
+
+    Exige um VACUUM completo, que trava e reescreve o arquivo inteiro:
+    rode pela CLI, fora do horário de pico. Retorna False se o banco já
+    estava convertido.
+    """
+    if auto_vacuum_incremental(conn):
+        return False
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def compactar(conn: sqlite3.Connection, paginas: int = PAGINAS_VACUUM) -> Dict[str, int]:
+    """
+    Devolve páginas livres ao disco e trunca o arquivo -wal.
+
+    Libera até `paginas` páginas por rodada, sem travar o banco por muito
+    tempo. Bancos ainda sem auto_vacuum=INCREMENTAL (ver
+    converter_auto_vacuum) só têm o WAL truncado.
+    """
+    livres_antes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    livres_depois = livres_antes
+    if auto_vacuum_incremental(conn):
+        conn.execute(f"PRAGMA incremental_vacuum({int(paginas)})")
+        livres_depois = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    else:
+        logger.info(
+            "Banco sem auto_vacuum=INCREMENTAL; VACUUM incremental ignorado "
+            "(rode 'python -m memory.retencao converter' uma vez)"
+        )
+    ocupado, paginas_wal, copiadas = conn.execute(
+        "PRAGMA wal_checkpoint(TRUNCATE)"
+    ).fetchone()
+    return {
+        "paginas_liberadas": livres_antes - livres_depois,
+        "paginas_livres": livres_depois,
+        "wal_ocupado": ocupado,
+        "wal_paginas_copiadas": max(copiadas, 0),
+    }
+
+
+# === RELATÓRIO ===
+
+
+def tamanho_arquivos(caminho: str = db_path) -> Dict[str, int]:
+    """Tamanho em bytes do banco e dos arquivos -wal e -shm"""
+    return {
+        sufixo or "db": os.path.getsize(caminho + sufixo)
+        if os.path.exists(caminho + sufixo)
+        else 0
+        for sufixo in ("", "-wal", "-shm")
+    }
+
+
+def tamanho_por_thread(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Checkpoints, writes e bytes por thread, da maior para a menor"""
+    threads: Dict[str, Dict[str, Any]] = {}
+    for thread_id, quantidade, total, ultimo in conn.execute(
+        """
+        SELECT thread_id, COUNT(*),
+               SUM(LENGTH(checkpoint) + LENGTH(metadata)), MAX(checkpoint_id)
+        FROM checkpoints GROUP BY thread_id
+        """
+    ):
+        threads[thread_id] = {
+            "thread_id": thread_id,
+            "checkpoints": quantidade,
+            "writes": 0,
+            "bytes": total or 0,
+            "ultima_atividade": timestamp_checkpoint(ultimo),
+        }
+    for thread_id, quantidade, total in conn.execute(
+        "SELECT thread_id, COUNT(*), SUM(LENGTH(value)) FROM writes GROUP BY thread_id"
+    ):
+        item = threads.setdefault(
+            thread_id,
+            {
+                "thread_id": thread_id,
+                "checkpoints": 0,
+                "writes": 0,
+                "bytes": 0,
+                "ultima_atividade": None,
+            },
+        )
+        item["writes"] = quantidade
+        item["bytes"] += total or 0
+    return sorted(threads.values(), key=lambda item: item["bytes"], reverse=True)
+
+
+# === GERENCIADOR COM AGENDAMENTO ===
+
+
+class GerenciadorRetencao:
+    """
+    Executa poda, expiração e compactação periodicamente.
+
+    Usa uma conexão própria (WAL + busy_timeout), então roda em paralelo
+    ao checkpointer do workflow sem compartilhar o lock dele. O agendamento
+    usa uma trava de arquivo ao lado do banco: com vários workers do
+    uvicorn, só o primeiro processo que chega agenda a retenção.
+    """
+
+    def __init__(
+        self,
+        caminho: str = db_path,
+        manter: int = CHECKPOINTS_POR_THREAD,
+        ttl_dias: Optional[float] = TTL_THREAD_DIAS,
+        intervalo_minutos: float = INTERVALO_MINUTOS,
+    ):
+        self.caminho = caminho
+        self.manter = manter
+        self.ttl_dias = ttl_dias
+        self.intervalo_minutos = intervalo_minutos
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self._trava = None
+        self.ultima_execucao: Dict[str, Any] = {}
+
+    def executar(self) -> Dict[str, Any]:
+        """Roda uma rodada completa de retenção e retorna o resumo"""
+        with self._lock:
+            inicio = time.perf_counter()
+            antes = sum(tamanho_arquivos(self.caminho).values())
+            conn = conectar_sqlite(self.caminho)
+            try:
+                expiradas = []
+                if self.ttl_dias:
+                    expiradas = expirar_threads(conn, self.ttl_dias * 86400)
+                podados = podar_checkpoints(conn, self.manter)
+                compactacao = compactar(conn)
+            finally:
+                conn.close()
+            self.ultima_execucao = {
+                "threads_expiradas": len(expiradas),
+                "checkpoints_podados": podados,
+                **compactacao,
+                "bytes_antes": antes,
+                "bytes_depois": sum(tamanho_arquivos(self.caminho).values()),
+                "segundos": round(time.perf_counter() - inicio, 3),
+            }
+            return self.ultima_execucao
+
+    def _executar_agendado(self):
+        try:
+            resumo = self.executar()
+            logger.info(
+                "Retenção: %d checkpoints podados, %d threads expiradas",
+                resumo["checkpoints_podados"],
+                resumo["threads_expiradas"],
+            )
+        except Exception:
+            logger.exception("Erro na retenção de checkpoints")
+
+    def _adquirir_trava(self) -> bool:
+        """Trava exclusiva do agendamento, mantida até parar()"""
+        if fcntl is None:
+            return True
+        trava = open(self.caminho + ".retencao.lock", "w")
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            trava.close()
+            return False
+        self._trava = trava
+        return True
+
+    def _liberar_trava(self):
+        if self._trava is not None:
+            self._trava.close()  # fechar o arquivo libera o flock
+            self._trava = None
+
+    def iniciar(self) -> bool:
+        """
+        Agenda a retenção em segundo plano (BackgroundScheduler).
+
+        Retorna False se outro processo já agendou a retenção deste banco.
+        """
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        if self._scheduler is not None:
+            return True
+        if not self._adquirir_trava():
+            logger.info("Retenção já agendada por outro processo; ignorando")
+            return False
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self._executar_agendado,
+            "interval",
+            minutes=self.intervalo_minutos,
+            id="retencao_checkpoints",
+            max_instances=1,
+            coalesce=True,
+        )
+        self._scheduler.start()
+        return True
+
+    def parar(self):
+        """Encerra o agendamento (aguarda a rodada em andamento)"""
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=True)
+            self._scheduler = None
+        self._liberar_trava()
+
+
+# === CLI ===
+
+
+def _formatar_bytes(valor: int) -> str:
+    for unidade in ("B", "KB", "MB"):
+        if valor < 1024:
+            return f"{valor:.0f} {unidade}"
+        valor /= 1024
+    return f"{valor:.1f} GB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retenção do banco de checkpoints")
+    parser.add_argument("--db", default=db_path, help="Caminho do conversas.db")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    relatorio = sub.add_parser("relatorio", help="Tamanho do banco por thread")
+    relatorio.add_argument("--top", type=int, default=20)
+
+    podar = sub.add_parser("podar", help="Poda, expira e compacta uma vez")
+    podar.add_argument("--manter", type=int, default=CHECKPOINTS_POR_THREAD)
+    podar.add_argument("--ttl-dias", type=float, default=TTL_THREAD_DIAS)
+
+    sub.add_parser("compactar", help="Só VACUUM incremental e checkpoint do WAL")
+    sub.add_parser(
+        "converter",
+        help="Converte para auto_vacuum=INCREMENTAL (VACUUM completo, uma vez)",
+    )
+    args = parser.parse_args()
+
+    if args.comando == "relatorio":
+        conn = conectar_sqlite(args.db)
+        try:
+            threads = tamanho_por_thread(conn)
+        finally:
+            conn.close()
+        print("📁 ARQUIVOS")
+        for nome, tamanho in tamanho_arquivos(args.db).items():
+            print(f"   {nome:<6} {_formatar_bytes(tamanho):>10}")
+        print(f"🧵 THREADS ({len(threads)})")
+        print(f"   {'thread_id':<36} {'ckpts':>6} {'writes':>7} {'tamanho':>10}")
+        for item in threads[: args.top]:
+            print(
+                f"   {item['thread_id'][:36]:<36} {item['checkpoints']:>6} "
+                f"{item['writes']:>7} {_formatar_bytes(item['bytes']):>10}"
+            )
+    elif args.comando == "podar":
+        gerenciador = GerenciadorRetencao(args.db, args.manter, args.ttl_dias)
+        for nome, valor in gerenciador.executar().items():
+            print(f"   {nome}: {valor}")
+    elif args.comando == "converter":
+        conn = conectar_sqlite(args.db)
+        try:
+            if converter_auto_vacuum(conn):
+                print("✅ Banco convertido para auto_vacuum=INCREMENTAL")
+            else:
+                print("ℹ️ Banco já usa auto_vacuum=INCREMENTAL")
+        finally:
+            conn.close()
+    else:
+        conn = conectar_sqlite(args.db)
+        try:
+            for nome, valor in compactar(conn).items():
+                print(f"   {nome}: {valor}")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Serializador Compacto de Checkpoints
+msgpack com codificação própria para os enums do estado e para mensagens,
+compressão zlib opcional e fallback para o serializador padrão do LangGraph
+"""
+
+import os
+import zlib
+from enum import Enum
+from typing import Any, Dict, Tuple, Type
+
+import ormsgpack
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    FunctionMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from utils.state import (
+    AgentType,
+    CategoryType,
+    OrigemRotulo,
+    PriorityType,
+    SentimentType,
+)
+
+# Serializador do checkpointer: "compacto", "compacto_zlib" ou "padrao"
+SERIALIZADOR_PADRAO = os.getenv("CHECKPOINTER_SERIALIZADOR", "compacto")
+
+# Tipos gravados no banco (coluna "type"); os do JsonPlusSerializer não mudam
+TIPO_COMPACTO = "compacto"
+TIPO_COMPACTO_ZLIB = "compacto_zlib"
+
+# Só comprime valores maiores que isso (abaixo o cabeçalho zlib não compensa)
+MIN_BYTES_COMPRESSAO = 256
+
+# Códigos de extensão msgpack (0-7 já são usados pelo LangGraph)
+EXT_ENUM = 64
+EXT_MENSAGEM = 65
+EXT_TUPLA = 66
+
+# Enums do estado: o valor vira (código do enum, .value do membro). Gravar o
+# .value (e não a posição) mantém checkpoints antigos corretos quando membros
+# são adicionados, removidos ou reordenados. Novos enums só no fim da tupla.
+ENUMS: Tuple[Type[Enum], ...] = (
+    CategoryType,
+    SentimentType,
+    AgentType,
+    PriorityType,
+    OrigemRotulo,
+)
+_CODIGO_ENUM = {enum: codigo for codigo, enum in enumerate(ENUMS)}
+
+# Mensagens conhecidas: (código da classe, campos sem os valores padrão)
+MENSAGENS: Tuple[Type[BaseMessage], ...] = (
+    HumanMessage,
+    AIMessage,
+    SystemMessage,
+    ToolMessage,
+    FunctionMessage,
+)
+_CODIGO_MENSAGEM = {classe: codigo for codigo, classe in enumerate(MENSAGENS)}
+
+_OPCOES = (
+    ormsgpack.OPT_NON_STR_KEYS
+    | ormsgpack.OPT_PASSTHROUGH_ENUM
+    | ormsgpack.OPT_PASSTHROUGH_DATETIME
+    | ormsgpack.OPT_PASSTHROUGH_DATACLASS
+    | ormsgpack.OPT_PASSTHROUGH_UUID
+    | ormsgpack.OPT_PASSTHROUGH_TUPLE
+)
+
+
+class _NaoSuportado(TypeError):
+    """Valor fora do esquema compacto (vai para o serializador padrão)"""
+
+
+def _codificar(obj: Any) -> ormsgpack.Ext:
+    classe = type(obj)
+    if classe in _CODIGO_ENUM:
+        return ormsgpack.Ext(
+            EXT_ENUM, bytes((_CODIGO_ENUM[classe],)) + obj.value.encode("utf-8")
+        )
+    if classe in _CODIGO_MENSAGEM:
+        campos = obj.model_dump(exclude_defaults=True)
+        campos.pop("type", None)
+        return ormsgpack.Ext(
+            EXT_MENSAGEM,
+            ormsgpack.packb(
+                [_CODIGO_MENSAGEM[classe], campos], default=_codificar, option=_OPCOES
+            ),
+        )
+    if classe is tuple:
+        return ormsgpack.Ext(
+            EXT_TUPLA, ormsgpack.packb(list(obj), default=_codificar, option=_OPCOES)
+        )
+    raise _NaoSuportado(classe.__name__)
+
+
+def _decodificar(codigo: int, dados: bytes) -> Any:
+    if codigo == EXT_ENUM:
+        return ENUMS[dados[0]](dados[1:].decode("utf-8"))
+    if codigo == EXT_MENSAGEM:
+        codigo_classe, campos = ormsgpack.unpackb(
+            dados, ext_hook=_decodificar, option=ormsgpack.OPT_NON_STR_KEYS
+        )
+        return MENSAGENS[codigo_classe](**campos)
+    if codigo == EXT_TUPLA:
+        return tuple(
+            ormsgpack.unpackb(
+                dados, ext_hook=_decodificar, option=ormsgpack.OPT_NON_STR_KEYS
+            )
+        )
+    raise ValueError(f"Extensão msgpack desconhecida: {codigo}")
+
+
+class SerializadorCompacto(SerializerProtocol):
+    """
+    Serializador de checkpoints mais compacto que o padrão.
+
+    Enums do estado viram (código, valor) em vez de (módulo, classe, valor) e
+    mensagens guardam só um código de classe e os campos diferentes do
+    padrão. Tuplas continuam tuplas. Qualquer valor fora desse esquema
+    (ex.: objetos internos do LangGraph) é gravado pelo JsonPlusSerializer,
+    e checkpoints antigos continuam legíveis.
+
+    Args:
+        comprimir: Comprime com zlib valores acima de MIN_BYTES_COMPRESSAO.
+        nivel_compressao: Nível do zlib (1 = mais rápido, 9 = menor).
+    """
+
+    def __init__(self, comprimir: bool = False, nivel_compressao: int = 3):
+        self.comprimir = comprimir
+        self.nivel_compressao = nivel_compressao
+        self.padrao = JsonPlusSerializer()
+        self.contadores: Dict[str, int] = {"compactos": 0, "fallbacks": 0}
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return self.padrao.dumps_typed(obj)
+        try:
+            dados = ormsgpack.packb(obj, default=_codificar, option=_OPCOES)
+        except (_NaoSuportado, ormsgpack.MsgpackEncodeError):
+            self.contadores["fallbacks"] += 1
+            return self.padrao.dumps_typed(obj)
+
+        self.contadores["compactos"] += 1
+        if self.comprimir and len(dados) > MIN_BYTES_COMPRESSAO:
+            comprimido = zlib.compress(dados, self.nivel_compressao)
+            if len(comprimido) < len(dados):
+                return TIPO_COMPACTO_ZLIB, comprimido
+        return TIPO_COMPACTO, dados
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        tipo, dados = data
+        if tipo == TIPO_COMPACTO_ZLIB:
+            tipo, dados = TIPO_COMPACTO, zlib.decompress(dados)
+        if tipo == TIPO_COMPACTO:
+            return ormsgpack.unpackb(
+                dados, ext_hook=_decodificar, option=ormsgpack.OPT_NON_STR_KEYS
+            )
+        return self.padrao.loads_typed(data)
+
+
+def criar_serializador(nome: str = SERIALIZADOR_PADRAO) -> SerializerProtocol:
+    """
+    Cria o serializador de checkpoints pelo nome.
+
+    Args:
+        nome: "compacto", "compacto_zlib" ou "padrao" (JsonPlusSerializer).
+    """
+    if nome == "compacto":
+        return SerializadorCompacto()
+    if nome == "compacto_zlib":
+        return SerializadorCompacto(comprimir=True)
+    if nome == "padrao":
+        return JsonPlusSerializer()
+    raise ValueError(f"Serializador desconhecido: {nome!r}")
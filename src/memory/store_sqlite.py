@@ -0,0 +1,684 @@
+"""
+Store de Longo Prazo em SQLite
+Substitui o InMemoryStore: persiste entre reinícios, tem limite de itens
+(LRU), TTL, cache em memória dos itens mais usados e busca vetorial opcional
+"""
+
+import asyncio
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langgraph.store.base import (
+    BaseStore,
+    GetOp,
+    IndexConfig,
+    Item,
+    ListNamespacesOp,
+    MatchCondition,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+    TTLConfig,
+    ensure_embeddings,
+    get_text_at_path,
+    tokenize_path,
+)
+
+# === CONFIGURAÇÃO ===
+
+STORE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "store.db")
+MAX_ITENS = int(os.getenv("STORE_MAX_ITENS", 50_000))
+MAX_ITENS_MEMORIA = int(os.getenv("STORE_MAX_ITENS_MEMORIA", 1024))
+TTL_PADRAO_MINUTOS = float(os.getenv("STORE_TTL_MINUTOS", 30 * 24 * 60))
+
+# Separador dos rótulos do namespace na coluna de texto (não aparece em rótulos)
+_SEP = "\x1f"
+# Intervalo mínimo entre varreduras de itens expirados
+_INTERVALO_VARREDURA = 60.0
+
+
+@dataclasses.dataclass
+class _EntradaMemoria:
+    """Item no cache em memória e o que é preciso para validá-lo"""
+
+    item: Item
+    ttl_minutos: Optional[float]
+    expira_em: Optional[float]
+    atualizado_em: float  # valor bruto da coluna, comparado na validação
+    versao: int  # PRAGMA data_version em que a entrada foi lida/validada
+
+
+def _ns_texto(namespace: Tuple[str, ...]) -> str:
+    return _SEP.join(namespace)
+
+
+def _ns_tupla(texto: str) -> Tuple[str, ...]:
+    return tuple(texto.split(_SEP)) if texto else ()
+
+
+def _data(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def _corresponde(valor: Any, filtro: Any) -> bool:
+    """Compara um valor com o filtro (igualdade aninhada e $eq/$ne/$gt/$gte/$lt/$lte)"""
+    if isinstance(filtro, dict):
+        if any(chave.startswith("$") for chave in filtro):
+            return all(
+                _aplicar_operador(valor, op, alvo) for op, alvo in filtro.items()
+            )
+        if not isinstance(valor, dict):
+            return False
+        return all(_corresponde(valor.get(k), v) for k, v in filtro.items())
+    return valor == filtro
+
+
+def _aplicar_operador(valor: Any, operador: str, alvo: Any) -> bool:
+    if operador == "$eq":
+        return valor == alvo
+    if operador == "$ne":
+        return valor != alvo
+    if valor is None:
+        return False
+    if operador == "$gt":
+        return float(valor) > float(alvo)
+    if operador == "$gte":
+        return float(valor) >= float(alvo)
+    if operador == "$lt":
+        return float(valor) < float(alvo)
+    if operador == "$lte":
+        return float(valor) <= float(alvo)
+    raise ValueError(f"Operador de filtro não suportado: {operador}")
+
+
+def _namespace_corresponde(
+    condicao: MatchCondition, namespace: Tuple[str, ...]
+) -> bool:
+    caminho = condicao.path
+    if len(namespace) < len(caminho):
+        return False
+    if condicao.match_type == "prefix":
+        pares = zip(namespace, caminho)
+    elif condicao.match_type == "suffix":
+        pares = zip(reversed(namespace), reversed(caminho))
+    else:
+        raise ValueError(
+            f"Tipo de correspondência não suportado: {condicao.match_type}"
+        )
+    return all(p == "*" or n == p for n, p in pares)
+
+
+class SqliteStoreLimitado(BaseStore):
+    """
+    BaseStore persistente em SQLite com limite de tamanho.
+
+    - Itens ficam na tabela `itens`, indexada por namespace (buscas por
+      prefixo usam o índice) e por último acesso (para o LRU).
+    - Ao passar de `max_itens`, os itens menos acessados são removidos.
+    - Itens com TTL expiram; leituras podem renovar o TTL (refresh_on_read).
+    - Os itens mais lidos ficam num LRU em memória; as renovações de
+      acesso são gravadas em lote, uma transação por chamada de batch().
+      Cada hit confere o TTL do item, e, se outra conexão (ex.: outro
+      worker do uvicorn) gravou no banco desde a leitura (PRAGMA
+      data_version), o item é revalidado pelo atualizado_em.
+    - Com `index` (dims + embed), valores são vetorizados no put e
+      search(query=...) ordena por similaridade de cosseno (NumPy).
+
+    Args:
+        db_path: Caminho do arquivo SQLite.
+        max_itens: Limite de itens no banco (LRU acima disso).
+        max_itens_memoria: Limite do cache em memória.
+        ttl: Configuração de TTL (default_ttl em minutos, refresh_on_read).
+        index: Configuração de busca vetorial (opcional).
+    """
+
+    supports_ttl = True
+
+    def __init__(
+        self,
+        db_path: str = STORE_DB_PATH,
+        max_itens: int = MAX_ITENS,
+        max_itens_memoria: int = MAX_ITENS_MEMORIA,
+        ttl: Optional[TTLConfig] = None,
+        index: Optional[IndexConfig] = None,
+    ):
+        self.db_path = db_path
+        self.max_itens = max_itens
+        self.max_itens_memoria = max_itens_memoria
+        self.ttl_config: TTLConfig = ttl or {
+            "default_ttl": TTL_PADRAO_MINUTOS,
+            "refresh_on_read": True,
+        }
+
+        self.index_config = None
+        self.embeddings = None
+        self._campos_indexados: List[Tuple[str, Any]] = []
+        if index is not None:
+            self.index_config = dict(index)
+            self.embeddings = ensure_embeddings(index["embed"])
+            campos = index.get("fields") or ["$"]
+            self._campos_indexados = [
+                (campo, tokenize_path(campo) if campo != "$" else "$")
+                for campo in campos
+            ]
+
+        self._memoria: "OrderedDict[Tuple[Tuple[str, ...], str], _EntradaMemoria]" = (
+            OrderedDict()
+        )
+        self._versao_dados = 0
+        self._acessos_pendentes: Dict[Tuple[str, str], Optional[float]] = {}
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._ultima_varredura = 0.0
+        self._contadores = {
+            "hits_memoria": 0,
+            "leituras_sqlite": 0,
+            "gravacoes": 0,
+            "remocoes": 0,
+            "removidos_lru": 0,
+            "expirados": 0,
+            "buscas": 0,
+            "buscas_vetoriais": 0,
+        }
+
+    # === CONEXÃO ===
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Abre a conexão SQLite na primeira utilização"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS itens (
+                    namespace TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    ttl_minutos REAL,
+                    expira_em REAL,
+                    PRIMARY KEY (namespace, chave)
+                );
+                CREATE INDEX IF NOT EXISTS idx_itens_acesso ON itens (acessado_em);
+                CREATE INDEX IF NOT EXISTS idx_itens_expira ON itens (expira_em);
+                CREATE TABLE IF NOT EXISTS vetores (
+                    namespace TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    campo TEXT NOT NULL,
+                    vetor BLOB NOT NULL,
+                    PRIMARY KEY (namespace, chave, campo)
+                );
+                """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # === BATCH ===
+
+    def batch(self, ops: Iterable[Op]) -> List[Result]:
+        ops = list(ops)
+        resultados: List[Result] = [None] * len(ops)
+        with self._lock:
+            agora = time.time()
+            self._varrer_expirados(agora)
+            # Muda só quando outra conexão confirma escritas no arquivo
+            self._versao_dados = (
+                self._conexao().execute("PRAGMA data_version").fetchone()[0]
+            )
+
+            gets = [(i, op) for i, op in enumerate(ops) if isinstance(op, GetOp)]
+            if gets:
+                for (i, _), item in zip(
+                    gets, self._obter_lote([op for _, op in gets], agora)
+                ):
+                    resultados[i] = item
+
+            for i, op in enumerate(ops):
+                if isinstance(op, SearchOp):
+                    resultados[i] = self._buscar(op, agora)
+                elif isinstance(op, ListNamespacesOp):
+                    resultados[i] = self._listar_namespaces(op, agora)
+
+            # Puts por último, com a última escrita de cada chave prevalecendo
+            puts: Dict[Tuple[Tuple[str, ...], str], PutOp] = {}
+            for op in ops:
+                if isinstance(op, PutOp):
+                    puts[(op.namespace, op.key)] = op
+            if puts:
+                self._gravar_lote(list(puts.values()), agora)
+            self._gravar_acessos()
+        return resultados
+
+    async def abatch(self, ops: Iterable[Op]) -> List[Result]:
+        return await asyncio.to_thread(self.batch, list(ops))
+
+    # === LEITURA ===
+
+    def _ttl_renovado(
+        self, ttl_minutos: Optional[float], agora: float
+    ) -> Optional[float]:
+        return agora + ttl_minutos * 60 if ttl_minutos else None
+
+    def _registrar_acesso(self, namespace, chave, ttl_minutos, renovar, agora):
+        expira_em = self._ttl_renovado(ttl_minutos, agora) if renovar else None
+        self._acessos_pendentes[(_ns_texto(namespace), chave)] = expira_em
+
+    def _entrada_da_linha(self, linha) -> _EntradaMemoria:
+        namespace, chave, valor, criado, atualizado, ttl_minutos, expira_em = linha
+        item = Item(
+            value=json.loads(valor),
+            key=chave,
+            namespace=_ns_tupla(namespace),
+            created_at=_data(criado),
+            updated_at=_data(atualizado),
+        )
+        return _EntradaMemoria(
+            item, ttl_minutos, expira_em, atualizado, self._versao_dados
+        )
+
+    def _validar_memoria(self, chaves: List[Tuple[Tuple[str, ...], str]]):
+        """
+        Revalida entradas lidas antes da última escrita de outra conexão:
+        ficam só as que não mudaram (mesmo atualizado_em), com o expira_em
+        atual do banco (outro processo pode tê-lo renovado)
+        """
+        for inicio in range(0, len(chaves), 400):
+            parte = chaves[inicio : inicio + 400]
+            marcadores = ",".join("(?, ?)" for _ in parte)
+            parametros = [v for ns, chave in parte for v in (_ns_texto(ns), chave)]
+            linhas = {
+                (_ns_tupla(ns), chave): (atualizado, expira_em)
+                for ns, chave, atualizado, expira_em in self._conexao().execute(
+                    "SELECT namespace, chave, atualizado_em, expira_em FROM itens "
+                    f"WHERE (namespace, chave) IN (VALUES {marcadores})",
+                    parametros,
+                )
+            }
+            for chave in parte:
+                entrada = self._memoria[chave]
+                atual = linhas.get(chave)
+                if atual is None or atual[0] != entrada.atualizado_em:
+                    del self._memoria[chave]
+                    continue
+                entrada.expira_em, entrada.versao = atual[1], self._versao_dados
+
+    def _obter_lote(self, ops: Sequence[GetOp], agora: float) -> List[Optional[Item]]:
+        """Resolve vários GetOp com o cache em memória e um único SELECT"""
+        renovar_padrao = self.ttl_config.get("refresh_on_read", True)
+        desatualizadas = list(
+            {
+                (op.namespace, op.key)
+                for op in ops
+                if (op.namespace, op.key) in self._memoria
+                and self._memoria[(op.namespace, op.key)].versao != self._versao_dados
+            }
+        )
+        if desatualizadas:
+            self._validar_memoria(desatualizadas)
+
+        resultados: Dict[Tuple[Tuple[str, ...], str], Optional[Item]] = {}
+        faltando = []
+        ttls_lidos: Dict[Tuple[Tuple[str, ...], str], Optional[float]] = {}
+        for op in ops:
+            chave = (op.namespace, op.key)
+            entrada = self._memoria.get(chave)
+            if entrada is not None and entrada.expira_em is not None:
+                if entrada.expira_em <= agora:
+                    del self._memoria[chave]
+                    entrada = None
+            if entrada is not None:
+                self._memoria.move_to_end(chave)
+                self._contadores["hits_memoria"] += 1
+                resultados[chave] = entrada.item
+                renovar = op.refresh_ttl and renovar_padrao
+                self._registrar_acesso(
+                    op.namespace, op.key, entrada.ttl_minutos, renovar, agora
+                )
+                if renovar and entrada.ttl_minutos:
+                    entrada.expira_em = self._ttl_renovado(entrada.ttl_minutos, agora)
+            elif chave not in resultados:
+                faltando.append(chave)
+                resultados[chave] = None
+
+        for inicio in range(0, len(faltando), 400):
+            parte = faltando[inicio : inicio + 400]
+            marcadores = ",".join("(?, ?)" for _ in parte)
+            parametros = [v for ns, chave in parte for v in (_ns_texto(ns), chave)]
+            linhas = (
+                self._conexao()
+                .execute(
+                    "SELECT namespace, chave, valor, criado_em, atualizado_em, "
+                    "ttl_minutos, expira_em "
+                    f"FROM itens WHERE (namespace, chave) IN (VALUES {marcadores}) "
+                    "AND (expira_em IS NULL OR expira_em > ?)",
+                    (*parametros, agora),
+                )
+                .fetchall()
+            )
+            self._contadores["leituras_sqlite"] += len(parte)
+            for linha in linhas:
+                entrada = self._entrada_da_linha(linha)
+                chave = (entrada.item.namespace, entrada.item.key)
+                resultados[chave] = entrada.item
+                ttls_lidos[chave] = entrada.ttl_minutos
+                self._guardar_memoria(chave, entrada)
+
+        for op in ops:
+            chave = (op.namespace, op.key)
+            if chave in ttls_lidos:
+                renovar = op.refresh_ttl and renovar_padrao
+                self._registrar_acesso(
+                    op.namespace, op.key, ttls_lidos[chave], renovar, agora
+                )
+                if renovar and ttls_lidos[chave] and chave in self._memoria:
+                    self._memoria[chave].expira_em = self._ttl_renovado(
+                        ttls_lidos[chave], agora
+                    )
+        return [resultados[(op.namespace, op.key)] for op in ops]
+
+    def _guardar_memoria(self, chave, entrada: _EntradaMemoria):
+        self._memoria[chave] = entrada
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def _gravar_acessos(self):
+        """Grava em lote o último acesso (e o TTL renovado) dos itens lidos"""
+        if not self._acessos_pendentes:
+            return
+        agora = time.time()
+        conn = self._conexao()
+        conn.executemany(
+            "UPDATE itens SET acessado_em = ?, "
+            "expira_em = COALESCE(?, expira_em) WHERE namespace = ? AND chave = ?",
+            [
+                (agora, expira_em, namespace, chave)
+                for (namespace, chave), expira_em in self._acessos_pendentes.items()
+            ],
+        )
+        conn.commit()
+        self._acessos_pendentes.clear()
+
+    # === BUSCA ===
+
+    def _condicao_prefixo(self, prefixo: Tuple[str, ...]) -> Tuple[str, tuple]:
+        """WHERE de prefixo de namespace usando o índice da chave primária"""
+        if not prefixo:
+            return "1 = 1", ()
+        texto = _ns_texto(prefixo)
+        # Namespaces filhos ficam entre "prefixo\x1f" e "prefixo\x20"
+        return (
+            "(namespace = ? OR (namespace >= ? AND namespace < ?))",
+            (texto, texto + _SEP, texto + chr(ord(_SEP) + 1)),
+        )
+
+    def _buscar(self, op: SearchOp, agora: float) -> List[SearchItem]:
+        self._contadores["buscas"] += 1
+        condicao, parametros = self._condicao_prefixo(op.namespace_prefix)
+        linhas = (
+            self._conexao()
+            .execute(
+                "SELECT namespace, chave, valor, criado_em, atualizado_em, "
+                "ttl_minutos, expira_em "
+                f"FROM itens WHERE {condicao} AND (expira_em IS NULL OR expira_em > ?) "
+                "ORDER BY atualizado_em DESC",
+                (*parametros, agora),
+            )
+            .fetchall()
+        )
+
+        candidatos = []
+        for linha in linhas:
+            entrada = self._entrada_da_linha(linha)
+            item, ttl_minutos = entrada.item, entrada.ttl_minutos
+            if op.filter and not all(
+                _corresponde(item.value.get(k), v) for k, v in op.filter.items()
+            ):
+                continue
+            candidatos.append((item, ttl_minutos))
+
+        pontuacoes: Dict[Tuple[str, str], float] = {}
+        if op.query and self.embeddings is not None and candidatos:
+            self._contadores["buscas_vetoriais"] += 1
+            pontuacoes = self._pontuar(op.query, op.namespace_prefix)
+            candidatos.sort(
+                key=lambda par: pontuacoes.get(
+                    (_ns_texto(par[0].namespace), par[0].key), float("-inf")
+                ),
+                reverse=True,
+            )
+
+        selecionados = candidatos[op.offset : op.offset + op.limit]
+        renovar = op.refresh_ttl and self.ttl_config.get("refresh_on_read", True)
+        resultado = []
+        for item, ttl_minutos in selecionados:
+            self._registrar_acesso(
+                item.namespace, item.key, ttl_minutos, renovar, agora
+            )
+            resultado.append(
+                SearchItem(
+                    namespace=item.namespace,
+                    key=item.key,
+                    value=item.value,
+                    created_at=item.created_at,
+                    updated_at=item.updated_at,
+                    score=pontuacoes.get((_ns_texto(item.namespace), item.key)),
+                )
+            )
+        return resultado
+
+    def _pontuar(
+        self, query: str, prefixo: Tuple[str, ...]
+    ) -> Dict[Tuple[str, str], float]:
+        """Similaridade de cosseno da query com os vetores do prefixo (melhor campo)"""
+        condicao, parametros = self._condicao_prefixo(prefixo)
+        linhas = (
+            self._conexao()
+            .execute(
+                f"SELECT namespace, chave, vetor FROM vetores WHERE {condicao}",
+                parametros,
+            )
+            .fetchall()
+        )
+        if not linhas:
+            return {}
+        matriz = np.frombuffer(
+            b"".join(l[2] for l in linhas), dtype=np.float32
+        ).reshape(len(linhas), -1)
+        consulta = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        normas = np.linalg.norm(matriz, axis=1) * (np.linalg.norm(consulta) or 1.0)
+        similaridades = (matriz @ consulta) / np.where(normas == 0, 1.0, normas)
+
+        pontuacoes: Dict[Tuple[str, str], float] = {}
+        for (namespace, chave, _), similaridade in zip(linhas, similaridades.tolist()):
+            atual = pontuacoes.get((namespace, chave))
+            if atual is None or similaridade > atual:
+                pontuacoes[(namespace, chave)] = similaridade
+        return pontuacoes
+
+    def _listar_namespaces(
+        self, op: ListNamespacesOp, agora: float
+    ) -> List[Tuple[str, ...]]:
+        linhas = (
+            self._conexao()
+            .execute(
+                "SELECT DISTINCT namespace FROM itens "
+                "WHERE expira_em IS NULL OR expira_em > ? ORDER BY namespace",
+                (agora,),
+            )
+            .fetchall()
+        )
+        namespaces = set()
+        for (texto,) in linhas:
+            namespace = _ns_tupla(texto)
+            if op.match_conditions and not all(
+                _namespace_corresponde(c, namespace) for c in op.match_conditions
+            ):
+                continue
+            if op.max_depth is not None:
+                namespace = namespace[: op.max_depth]
+            namespaces.add(namespace)
+        return sorted(namespaces)[op.offset : op.offset + op.limit]
+
+    # === ESCRITA ===
+
+    def _textos_para_indexar(self, op: PutOp) -> List[Tuple[str, str]]:
+        """(campo, texto) a vetorizar para um put, conforme op.index e a config"""
+        if self.embeddings is None or op.index is False or op.value is None:
+            return []
+        if op.index is None:
+            campos = self._campos_indexados
+        else:
+            campos = [(campo, tokenize_path(campo)) for campo in op.index]
+        textos = []
+        for campo, caminho in campos:
+            if caminho == "$":
+                textos.append((campo, json.dumps(op.value, ensure_ascii=False)))
+                continue
+            for i, texto in enumerate(get_text_at_path(op.value, caminho)):
+                textos.append((f"{campo}.{i}" if i else campo, texto))
+        return textos
+
+    def _gravar_lote(self, ops: List[PutOp], agora: float):
+        """Aplica puts e deletes em uma única transação"""
+        conn = self._conexao()
+        remover, gravar, indexar = [], [], []
+        for op in ops:
+            namespace = _ns_texto(op.namespace)
+            self._memoria.pop((op.namespace, op.key), None)
+            self._acessos_pendentes.pop((namespace, op.key), None)
+            if op.value is None:
+                remover.append((namespace, op.key))
+                continue
+            # BaseStore.put já aplica o default_ttl; None aqui é "sem TTL"
+            ttl_minutos = op.ttl
+            gravar.append(
+                (
+                    namespace,
+                    op.key,
+                    json.dumps(op.value, ensure_ascii=False),
+                    agora,
+                    agora,
+                    agora,
+                    ttl_minutos,
+                    self._ttl_renovado(ttl_minutos, agora),
+                )
+            )
+            indexar.extend(
+                (namespace, op.key, campo, texto)
+                for campo, texto in self._textos_para_indexar(op)
+            )
+
+        # Vetores calculados antes de abrir a transação de escrita
+        vetores = []
+        if indexar:
+            embeddings = self.embeddings.embed_documents([t for *_, t in indexar])
+            vetores = [
+                (ns, chave, campo, np.asarray(vetor, dtype=np.float32).tobytes())
+                for (ns, chave, campo, _), vetor in zip(indexar, embeddings)
+            ]
+
+        chaves_alteradas = remover + [(g[0], g[1]) for g in gravar]
+        conn.executemany(
+            "DELETE FROM vetores WHERE namespace = ? AND chave = ?", chaves_alteradas
+        )
+        conn.executemany("DELETE FROM itens WHERE namespace = ? AND chave = ?", remover)
+        conn.executemany(
+            """
+            INSERT INTO itens (namespace, chave, valor, criado_em, atualizado_em,
+                               acessado_em, ttl_minutos, expira_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, chave) DO UPDATE SET
+                valor = excluded.valor,
+                atualizado_em = excluded.atualizado_em,
+                acessado_em = excluded.acessado_em,
+                ttl_minutos = excluded.ttl_minutos,
+                expira_em = excluded.expira_em
+            """,
+            gravar,
+        )
+        conn.executemany("INSERT INTO vetores VALUES (?, ?, ?, ?)", vetores)
+        self._contadores["gravacoes"] += len(gravar)
+        self._contadores["remocoes"] += len(remover)
+        if gravar:
+            self._aplicar_limite(conn)
+        conn.commit()
+
+    def _aplicar_limite(self, conn: sqlite3.Connection):
+        """Remove os itens menos acessados acima de max_itens (LRU)"""
+        excesso = (
+            conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0] - self.max_itens
+        )
+        if excesso <= 0:
+            return
+        antigos = conn.execute(
+            "SELECT namespace, chave FROM itens ORDER BY acessado_em LIMIT ?",
+            (excesso,),
+        ).fetchall()
+        conn.executemany("DELETE FROM itens WHERE namespace = ? AND chave = ?", antigos)
+        conn.executemany(
+            "DELETE FROM vetores WHERE namespace = ? AND chave = ?", antigos
+        )
+        for namespace, chave in antigos:
+            self._memoria.pop((_ns_tupla(namespace), chave), None)
+        self._contadores["removidos_lru"] += len(antigos)
+
+    # === MANUTENÇÃO ===
+
+    def _varrer_expirados(self, agora: float):
+        if agora - self._ultima_varredura < _INTERVALO_VARREDURA:
+            return
+        self._ultima_varredura = agora
+        self.limpar_expirados()
+
+    def limpar_expirados(self) -> int:
+        """Remove itens com TTL vencido; retorna quantos foram removidos"""
+        with self._lock:
+            conn = self._conexao()
+            agora = time.time()
+            expirados = conn.execute(
+                "SELECT namespace, chave FROM itens WHERE expira_em <= ?", (agora,)
+            ).fetchall()
+            conn.executemany(
+                "DELETE FROM itens WHERE namespace = ? AND chave = ?", expirados
+            )
+            conn.executemany(
+                "DELETE FROM vetores WHERE namespace = ? AND chave = ?", expirados
+            )
+            conn.commit()
+            for namespace, chave in expirados:
+                self._memoria.pop((_ns_tupla(namespace), chave), None)
+            self._contadores["expirados"] += len(expirados)
+            return len(expirados)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de uso e tamanho atual do store"""
+        with self._lock:
+            total = self._conexao().execute("SELECT COUNT(*) FROM itens").fetchone()[0]
+        return {
+            **self._contadores,
+            "itens": total,
+            "itens_memoria": len(self._memoria),
+            "max_itens": self.max_itens,
+        }
+
+    def fechar(self):
+        """Grava acessos pendentes e fecha a conexão SQLite"""
+        with self._lock:
+            if self._conn is not None:
+                self._gravar_acessos()
+                self._conn.close()
+                self._conn = None
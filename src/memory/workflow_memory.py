@@ -3,40 +3,327 @@ Sistema de Memória Simples usando LangGraph Checkpointer
 Implementação minimalista seguindo padrão oficial
 """
 
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
 from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.store.memory import InMemoryStore
 from langchain_core.messages import HumanMessage
+import asyncio
+import logging
 import sqlite3
 import os
+import queue
+import threading
+import time
 
-# === CONFIGURAÇÃO GLOBAL DE MEMÓRIA ===
+from memory.serializador import SERIALIZADOR_PADRAO, criar_serializador
+from memory.store_sqlite import SqliteStoreLimitado
+
+logger = logging.getLogger(__name__)
 
-# Memória de longo prazo - persiste entre conversas
-in_memory_store = InMemoryStore()
+# === CONFIGURAÇÃO GLOBAL DE MEMÓRIA ===
 
-# Criar diretório se não existir
 db_path = "src/memory/conversas.db"
-os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+# Conexões de leitura do pool (0 = uma única conexão compartilhada)
+CONEXOES_LEITURA = int(os.getenv("CHECKPOINTER_CONEXOES_LEITURA", 4))
+
+# WAL + synchronous=NORMAL: commits sem fsync por transação, ainda seguros
+# contra corrupção; busy_timeout evita "database is locked" sob concorrência
+PRAGMAS_SQLITE = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+
+
+class SqliteSaverAssincrono(SqliteSaver):
+    """
+    SqliteSaver que também atende invoke/ainvoke/astream.
+
+    Os métodos assíncronos executam as operações síncronas em threads
+    (asyncio.to_thread), então o event loop não bloqueia no disco e o mesmo
+    checkpointer serve ao app síncrono e ao assíncrono.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config,
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before=None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator:
+        itens = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in itens:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def conectar_sqlite(caminho: str, somente_leitura: bool = False) -> sqlite3.Connection:
+    """Abre uma conexão SQLite com os PRAGMAs de desempenho aplicados"""
+    conn = sqlite3.connect(caminho, check_same_thread=False)
+    for pragma in PRAGMAS_SQLITE:
+        conn.execute(pragma)
+    if somente_leitura:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class SqliteSaverPool(SqliteSaverAssincrono):
+    """
+    Checkpointer SQLite com uma conexão de escrita e um pool de leitura.
+
+    Em WAL, leitores não bloqueiam o escritor nem uns aos outros, então
+    get_tuple/list de sessões diferentes rodam em paralelo (inclusive via
+    aget_tuple/alist, que executam em threads). Cada put_writes e cada put
+    grava e confirma sua própria transação curta, com self.lock mantido do
+    INSERT ao commit: os writes de uma tarefa concluída sobrevivem a falhas
+    no mesmo super-step e ficam visíveis a outros workers, e nenhuma
+    transação fica aberta enquanto os nós executam.
+    """
+
+    def __init__(
+        self, caminho: str, conexoes_leitura: int = CONEXOES_LEITURA, serde=None
+    ):
+        self._local = threading.local()
+        super().__init__(conectar_sqlite(caminho), serde=serde)
+        # Reentrante: put/put_writes seguram o lock até o commit e a classe
+        # base o adquire de novo em self.cursor()
+        self.lock = threading.RLock()
+        self.caminho = caminho
+        self._leitores: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(conexoes_leitura):
+            self._leitores.put(conectar_sqlite(caminho, somente_leitura=True))
+        self.conexoes_leitura = conexoes_leitura
+
+        self._latencias_escrita: deque = deque(maxlen=2048)
+        self._latencias_commit: deque = deque(maxlen=2048)
+        self._contadores = {
+            "checkpoints": 0,
+            "writes": 0,
+            "commits": 0,
+            "leituras": 0,
+            "leituras_fora_do_pool": 0,
+        }
+
+    # A classe base usa self.conn; dentro de um cursor de leitura ela passa
+    # a ser a conexão emprestada do pool (por thread)
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return getattr(self._local, "conn", None) or self._conn_escrita
+
+    @conn.setter
+    def conn(self, valor: sqlite3.Connection):
+        self._conn_escrita = valor
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        if transaction:
+            with self.lock:
+                self.setup()
+                cur = self._conn_escrita.cursor()
+                try:
+                    yield cur
+                finally:
+                    cur.close()
+            return
+
+        with self.lock:
+            self.setup()
+        self._contadores["leituras"] += 1
+        try:
+            leitor = self._leitores.get_nowait()
+            do_pool = True
+        except queue.Empty:
+            # Pool esgotado (ex.: geradores de list() abertos): conexão avulsa
+            leitor = conectar_sqlite(self.caminho, somente_leitura=True)
+            do_pool = False
+            self._contadores["leituras_fora_do_pool"] += 1
+        anterior = getattr(self._local, "conn", None)
+        self._local.conn = leitor
+        cur = leitor.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+            self._local.conn = anterior
+            if do_pool:
+                self._leitores.put(leitor)
+            else:
+                leitor.close()
+
+    def _commit(self):
+        inicio = time.perf_counter()
+        self._conn_escrita.commit()
+        self._latencias_commit.append(time.perf_counter() - inicio)
+        self._contadores["commits"] += 1
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        inicio = time.perf_counter()
+        with self.lock:
+            resultado = super().put(config, checkpoint, metadata, new_versions)
+            self._commit()
+            self._contadores["checkpoints"] += 1
+        self._latencias_escrita.append(time.perf_counter() - inicio)
+        return resultado
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        inicio = time.perf_counter()
+        with self.lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._commit()
+            self._contadores["writes"] += 1
+        self._latencias_escrita.append(time.perf_counter() - inicio)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            super().delete_thread(thread_id)
+            self._commit()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores e latências (ms) de escrita e commit"""
+
+        def percentil(amostras, p: float) -> float:
+            if not amostras:
+                return 0.0
+            ordenadas = sorted(amostras)
+            indice = min(len(ordenadas) - 1, int(p * len(ordenadas)))
+            return round(ordenadas[indice] * 1000, 3)
+
+        escrita = list(self._latencias_escrita)
+        commit = list(self._latencias_commit)
+        return {
+            **self._contadores,
+            "conexoes_leitura": self.conexoes_leitura,
+            "leitores_livres": self._leitores.qsize(),
+            "escrita_ms_p50": percentil(escrita, 0.50),
+            "escrita_ms_p95": percentil(escrita, 0.95),
+            "escrita_ms_max": percentil(escrita, 1.0),
+            "commit_ms_p50": percentil(commit, 0.50),
+            "commit_ms_p95": percentil(commit, 0.95),
+        }
+
+    def fechar(self):
+        """Fecha todas as conexões (as escritas já estão confirmadas)"""
+        while not self._leitores.empty():
+            self._leitores.get_nowait().close()
+        self._conn_escrita.close()
 
 
 # Memória de curto prazo - persiste dentro de uma thread/conversa
 # Criar conexão SQLite explicitamente
-def criar_checkpointer():
-    """Cria checkpointer SQLite de forma segura"""
+def criar_checkpointer(
+    conexoes_leitura: int = CONEXOES_LEITURA, serializador: str = SERIALIZADOR_PADRAO
+):
+    """
+    Cria checkpointer SQLite de forma segura
+
+    Args:
+        conexoes_leitura: Tamanho do pool de leitura. Com 0, usa uma única
+            conexão compartilhada (SqliteSaverAssincrono).
+        serializador: "compacto", "compacto_zlib" ou "padrao"
+            (ver memory.serializador).
+    """
     try:
+        # Criar diretório se não existir
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        serde = criar_serializador(serializador)
+        if conexoes_leitura > 0:
+            return SqliteSaverPool(db_path, conexoes_leitura, serde=serde)
         # Método mais seguro para criar SqliteSaver
-        conn = sqlite3.connect(db_path, check_same_thread=False)
-        checkpointer = SqliteSaver(conn)
+        conn = conectar_sqlite(db_path)
+        checkpointer = SqliteSaverAssincrono(conn, serde=serde)
         return checkpointer
     except Exception as e:
-        print(f"⚠️ Erro ao criar SqliteSaver: {e}")
-        print("🔄 Usando MemorySaver como fallback")
+        logger.warning("Erro ao criar SqliteSaver, usando MemorySaver: %s", e)
         from langgraph.checkpoint.memory import MemorySaver
 
         return MemorySaver()
 
 
-checkpointer = criar_checkpointer()
+# O SQLite só é aberto no primeiro uso, não durante o import
+_checkpointer = None
+_lock_checkpointer = threading.Lock()
+
+
+def obter_checkpointer():
+    """Retorna o checkpointer global, criando a conexão na primeira chamada"""
+    global _checkpointer
+    if _checkpointer is None:
+        with _lock_checkpointer:
+            if _checkpointer is None:
+                _checkpointer = criar_checkpointer()
+    return _checkpointer
+
+
+# Memória de longo prazo - persiste entre conversas e reinícios
+_store = None
+_lock_store = threading.Lock()
+
+
+def criar_store():
+    """Cria o store de longo prazo em SQLite (InMemoryStore se falhar)"""
+    try:
+        # Busca vetorial opcional, ex.: STORE_EMBEDDINGS=openai:text-embedding-3-small
+        embeddings = os.getenv("STORE_EMBEDDINGS")
+        index = None
+        if embeddings:
+            index = {
+                "dims": int(os.getenv("STORE_EMBEDDINGS_DIMS", 1536)),
+                "embed": embeddings,
+            }
+        return SqliteStoreLimitado(index=index)
+    except Exception as e:
+        logger.warning("Erro ao criar SqliteStoreLimitado, usando InMemoryStore: %s", e)
+        return InMemoryStore()
+
+
+def obter_store():
+    """Retorna o store de longo prazo global, criando-o na primeira chamada"""
+    global _store
+    if _store is None:
+        with _lock_store:
+            if _store is None:
+                _store = criar_store()
+    return _store
+
+
+def __getattr__(nome: str):
+    # Compatibilidade: `from memory.workflow_memory import checkpointer`
+    # (ou in_memory_store) continua funcionando, mas só abre a conexão
+    # quando é importado
+    if nome == "checkpointer":
+        return obter_checkpointer()
+    if nome == "in_memory_store":
+        return obter_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
 
 # === FUNÇÃO PARA CONFIGURAR MEMÓRIA ===
 
@@ -45,15 +332,19 @@ def configurar_memoria_sistema():
     """
     Configura sistema de memória global para todos os agentes
     """
-    print("🧠 Configurando sistema de memória...")
+    logger.info("Configurando sistema de memória")
+    checkpointer = obter_checkpointer()
     if isinstance(checkpointer, SqliteSaver):
-        print("✅ SqliteSaver (persistente) configurado")
-        print(f"📁 Arquivo: {os.path.abspath(db_path)}")
+        logger.info("SqliteSaver (persistente) em %s", os.path.abspath(db_path))
+    else:
+        logger.info("MemorySaver (temporário) configurado")
+    store = obter_store()
+    if isinstance(store, SqliteStoreLimitado):
+        logger.info("SqliteStoreLimitado (longo prazo) em %s", store.db_path)
     else:
-        print("✅ MemorySaver (temporário) configurado")
-    print("✅ InMemoryStore (longo prazo) configurado")
+        logger.info("InMemoryStore (longo prazo) configurado")
 
-    return checkpointer, in_memory_store
+    return checkpointer, store
 
 
 # === FUNÇÃO PARA PROCESSAR COM MEMÓRIA ===
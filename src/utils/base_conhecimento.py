@@ -0,0 +1,378 @@
+"""
+Base de Conhecimento Indexada
+Carrega artigos de arquivos JSON, YAML ou Markdown e os compila em um
+autômato Aho-Corasick sobre as palavras-chave normalizadas, com índice
+invertido palavra-chave -> artigos
+
+A busca percorre a consulta uma única vez, então o custo depende do
+tamanho da consulta e do número de palavras encontradas, não do número
+de artigos na base.
+
+Formatos aceitos (o domínio padrão é o nome do arquivo sem extensão):
+
+    JSON / YAML (YAML exige PyYAML):
+        {"dominio": "tecnico", "artigos": [
+            {"id": "login", "palavras_chave": ["login", "senha"],
+             "texto": "...", "prioridade": 0}
+        ]}
+
+    Markdown (um artigo por seção "##"):
+        ## login
+        Palavras-chave: login, senha, entrar
+
+        Texto do artigo...
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.texto import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+try:
+    import yaml
+except ImportError:  # PyYAML é opcional: só arquivos .yaml/.yml dependem dele
+    yaml = None
+
+# Pasta com os arquivos da base (padrão: src/agents/conhecimento)
+DIRETORIO_PADRAO = os.getenv(
+    "BASE_CONHECIMENTO_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "agents", "conhecimento"),
+)
+
+EXTENSOES = (".json", ".yaml", ".yml", ".md")
+
+_SECAO_MARKDOWN = re.compile(r"^##\s+(.+?)\s*$", re.MULTILINE)
+_LINHA_PALAVRAS = re.compile(r"^palavras[- ]chave\s*:\s*(.*)$", re.IGNORECASE)
+_LINHA_PRIORIDADE = re.compile(r"^prioridade\s*:\s*(-?\d+)\s*$", re.IGNORECASE)
+
+
+@dataclass
+class Artigo:
+    """Uma entrada da base de conhecimento"""
+
+    id: str
+    dominio: str
+    texto: str
+    palavras_chave: List[str] = field(default_factory=list)
+    prioridade: int = 0
+    origem: str = ""
+
+
+@dataclass
+class Resultado:
+    """Artigo encontrado e as palavras-chave da consulta que o acionaram"""
+
+    artigo: Artigo
+    pontuacao: float
+    palavras: List[str]
+
+
+# === AUTÔMATO AHO-CORASICK ===
+
+
+class AutomatoPalavras:
+    """
+    Autômato Aho-Corasick para encontrar várias palavras-chave de uma vez.
+
+    Só reporta ocorrências em fronteira de palavra ('erro' casa com
+    'deu erro' mas não com 'erros' nem 'aterro'). Os padrões e o texto
+    devem chegar já normalizados.
+    """
+
+    def __init__(self):
+        self._transicoes: List[Dict[str, int]] = [{}]
+        self._falha: List[int] = [0]
+        self._padroes: List[List[str]] = [[]]
+        self._saidas: List[List[str]] = [[]]
+        self._compilado = True
+
+    def __len__(self) -> int:
+        return len(self._transicoes)
+
+    def adicionar(self, padrao: str):
+        estado = 0
+        for caractere in padrao:
+            proximo = self._transicoes[estado].get(caractere)
+            if proximo is None:
+                proximo = len(self._transicoes)
+                self._transicoes[estado][caractere] = proximo
+                self._transicoes.append({})
+                self._falha.append(0)
+                self._padroes.append([])
+            estado = proximo
+        if padrao not in self._padroes[estado]:
+            self._padroes[estado].append(padrao)
+        self._compilado = False
+
+    def compilar(self):
+        """Calcula os links de falha (busca em largura a partir da raiz)"""
+        self._saidas = [list(padroes) for padroes in self._padroes]
+        fila = deque(self._transicoes[0].values())
+        for estado in fila:
+            self._falha[estado] = 0
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                destino = self._transicoes[falha].get(caractere, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] = (
+                    self._saidas[proximo] + self._saidas[self._falha[proximo]]
+                )
+        self._compilado = True
+
+    def encontrar(self, texto: str) -> Iterator[Tuple[int, str]]:
+        """Gera (posição inicial, padrão) de cada ocorrência no texto"""
+        if not self._compilado:
+            self.compilar()
+        estado = 0
+        for fim, caractere in enumerate(texto):
+            while estado and caractere not in self._transicoes[estado]:
+                estado = self._falha[estado]
+            estado = self._transicoes[estado].get(caractere, 0)
+            for padrao in self._saidas[estado]:
+                inicio = fim - len(padrao) + 1
+                if _fronteira(texto, inicio - 1) and _fronteira(texto, fim + 1):
+                    yield inicio, padrao
+
+
+def _fronteira(texto: str, posicao: int) -> bool:
+    return posicao < 0 or posicao >= len(texto) or not texto[posicao].isalnum()
+
+
+def normalizar_palavra_chave(palavra: str) -> str:
+    """Normaliza uma palavra-chave como as consultas ('_' vira espaço)"""
+    return normalizar_texto(palavra.replace("_", " "))
+
+
+# === BASE DE CONHECIMENTO ===
+
+
+class BaseConhecimento:
+    """
+    Artigos de todos os domínios com um autômato e um índice invertido
+    compartilhados.
+
+    O id do artigo também conta como palavra-chave ('horario_funcionamento'
+    casa com 'horario funcionamento').
+    """
+
+    def __init__(self, artigos: Optional[List[Artigo]] = None):
+        self._artigos: List[Artigo] = []
+        self._indice: Dict[str, Set[int]] = defaultdict(set)
+        self._automato = AutomatoPalavras()
+        self._lock = threading.Lock()
+        for artigo in artigos or []:
+            self.adicionar(artigo)
+
+    def __len__(self) -> int:
+        return len(self._artigos)
+
+    @property
+    def dominios(self) -> List[str]:
+        return sorted({artigo.dominio for artigo in self._artigos})
+
+    def adicionar(self, artigo: Artigo):
+        with self._lock:
+            posicao = len(self._artigos)
+            self._artigos.append(artigo)
+            for palavra in [artigo.id, *artigo.palavras_chave]:
+                normalizada = normalizar_palavra_chave(palavra)
+                if not normalizada:
+                    continue
+                self._indice[normalizada].add(posicao)
+                self._automato.adicionar(normalizada)
+
+    def compilar(self) -> "BaseConhecimento":
+        with self._lock:
+            self._automato.compilar()
+        return self
+
+    def artigos(self, dominio: Optional[str] = None) -> List[Artigo]:
+        """Artigos carregados (todos ou só os de um domínio), na ordem de carga"""
+        return [a for a in self._artigos if dominio is None or a.dominio == dominio]
+
+    def artigo(self, dominio: str, id_artigo: str) -> Optional[Artigo]:
+        """Busca direta por id (linear; uso administrativo, não no hot path)"""
+        for artigo in self._artigos:
+            if artigo.dominio == dominio and artigo.id == id_artigo:
+                return artigo
+        return None
+
+    def buscar(
+        self, consulta: str, dominio: Optional[str] = None, limite: int = 3
+    ) -> List[Resultado]:
+        """
+        Retorna os artigos que casam com a consulta, do mais relevante ao menos.
+
+        A pontuação soma o número de palavras de cada palavra-chave distinta
+        encontrada (expressões longas pesam mais que termos soltos); empates
+        são resolvidos pela prioridade do artigo e depois pela ordem de carga.
+        """
+        texto = normalizar_texto(consulta)
+        encontradas = {padrao for _, padrao in self._automato.encontrar(texto)}
+
+        pontuacoes: Dict[int, float] = defaultdict(float)
+        palavras: Dict[int, List[str]] = defaultdict(list)
+        for palavra in encontradas:
+            peso = palavra.count(" ") + 1
+            for posicao in self._indice.get(palavra, ()):
+                if dominio and self._artigos[posicao].dominio != dominio:
+                    continue
+                pontuacoes[posicao] += peso
+                palavras[posicao].append(palavra)
+
+        ordenados = sorted(
+            pontuacoes,
+            key=lambda p: (-pontuacoes[p], -self._artigos[p].prioridade, p),
+        )
+        return [
+            Resultado(self._artigos[p], pontuacoes[p], sorted(palavras[p]))
+            for p in ordenados[:limite]
+        ]
+
+    def melhor(self, consulta: str, dominio: Optional[str] = None) -> Optional[Artigo]:
+        """Artigo mais relevante para a consulta, ou None"""
+        resultados = self.buscar(consulta, dominio, limite=1)
+        return resultados[0].artigo if resultados else None
+
+    def estatisticas(self) -> Dict[str, Any]:
+        por_dominio: Dict[str, int] = defaultdict(int)
+        for artigo in self._artigos:
+            por_dominio[artigo.dominio] += 1
+        return {
+            "artigos": len(self._artigos),
+            "palavras_chave": len(self._indice),
+            "estados_automato": len(self._automato),
+            "por_dominio": dict(por_dominio),
+        }
+
+
+# === CARREGAMENTO DE ARQUIVOS ===
+
+
+def _artigos_estruturados(dados: Any, dominio: str, origem: str) -> List[Artigo]:
+    if isinstance(dados, dict):
+        dominio = dados.get("dominio", dominio)
+        dados = dados.get("artigos", [])
+    if not isinstance(dados, list):
+        raise ValueError(f"{origem}: esperado uma lista de artigos")
+    artigos = []
+    for item in dados:
+        if "id" not in item or "texto" not in item:
+            raise ValueError(f"{origem}: artigo sem 'id' ou 'texto': {item!r}")
+        artigos.append(
+            Artigo(
+                id=str(item["id"]),
+                dominio=item.get("dominio", dominio),
+                texto=str(item["texto"]).strip(),
+                palavras_chave=[str(p) for p in item.get("palavras_chave", [])],
+                prioridade=int(item.get("prioridade", 0)),
+                origem=origem,
+            )
+        )
+    return artigos
+
+
+def _artigos_markdown(conteudo: str, dominio: str, origem: str) -> List[Artigo]:
+    secoes = _SECAO_MARKDOWN.split(conteudo)
+    artigos = []
+    # split com grupo: [preâmbulo, id1, corpo1, id2, corpo2, ...]
+    for id_artigo, corpo in zip(secoes[1::2], secoes[2::2]):
+        palavras: List[str] = []
+        prioridade = 0
+        linhas = []
+        for linha in corpo.strip().splitlines():
+            casamento = _LINHA_PALAVRAS.match(linha.strip())
+            if casamento:
+                palavras.extend(p.strip() for p in casamento.group(1).split(","))
+                continue
+            casamento = _LINHA_PRIORIDADE.match(linha.strip())
+            if casamento:
+                prioridade = int(casamento.group(1))
+                continue
+            linhas.append(linha)
+        artigos.append(
+            Artigo(
+                id=id_artigo,
+                dominio=dominio,
+                texto="\n".join(linhas).strip(),
+                palavras_chave=[p for p in palavras if p],
+                prioridade=prioridade,
+                origem=origem,
+            )
+        )
+    return artigos
+
+
+def carregar_arquivo(caminho: str) -> List[Artigo]:
+    """Lê os artigos de um arquivo .json, .yaml/.yml ou .md"""
+    dominio, extensao = os.path.splitext(os.path.basename(caminho))
+    extensao = extensao.lower()
+    with open(caminho, encoding="utf-8") as arquivo:
+        conteudo = arquivo.read()
+    if extensao == ".json":
+        return _artigos_estruturados(json.loads(conteudo), dominio, caminho)
+    if extensao in (".yaml", ".yml"):
+        if yaml is None:
+            raise ImportError(f"PyYAML não instalado; não é possível ler {caminho}")
+        return _artigos_estruturados(yaml.safe_load(conteudo), dominio, caminho)
+    if extensao == ".md":
+        return _artigos_markdown(conteudo, dominio, caminho)
+    raise ValueError(f"Formato de base de conhecimento não suportado: {caminho}")
+
+
+def carregar_diretorio(diretorio: str = DIRETORIO_PADRAO) -> BaseConhecimento:
+    """Carrega e compila todos os arquivos da pasta (inclui subpastas)"""
+    base = BaseConhecimento()
+    if not os.path.isdir(diretorio):
+        logger.warning("Base de conhecimento não encontrada em %s", diretorio)
+        return base.compilar()
+    for raiz, _, arquivos in sorted(os.walk(diretorio)):
+        for nome in sorted(arquivos):
+            if not nome.lower().endswith(EXTENSOES):
+                continue
+            caminho = os.path.join(raiz, nome)
+            try:
+                for artigo in carregar_arquivo(caminho):
+                    base.adicionar(artigo)
+            except (ImportError, ValueError, OSError) as e:
+                logger.warning("Ignorando %s: %s", caminho, e)
+    return base.compilar()
+
+
+# Base global, compilada na primeira consulta
+_base: Optional[BaseConhecimento] = None
+_lock_base = threading.Lock()
+
+
+def obter_base_conhecimento() -> BaseConhecimento:
+    """Retorna a base global, carregando os arquivos na primeira chamada"""
+    global _base
+    if _base is None:
+        with _lock_base:
+            if _base is None:
+                _base = carregar_diretorio()
+    return _base
+
+
+def recarregar_base_conhecimento(
+    diretorio: str = DIRETORIO_PADRAO,
+) -> BaseConhecimento:
+    """Recompila a base a partir dos arquivos e substitui a global"""
+    global _base
+    nova = carregar_diretorio(diretorio)
+    with _lock_base:
+        _base = nova
+    return nova
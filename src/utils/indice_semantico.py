@@ -0,0 +1,314 @@
+"""
+Índice Semântico da Base de Conhecimento
+Matriz NumPy com os embeddings dos artigos de um domínio e busca top-k
+por similaridade de cosseno, com limiar de score
+
+Os embeddings são calculados uma vez e gravados em disco (.npy, aberto
+com mmap) junto com um hash dos artigos e do modelo; workers novos só
+mapeiam o arquivo. O embedder é plugável: o padrão usa
+sentence-transformers (opcional) e, sem ele, o índice fica desativado e
+as ferramentas usam só a busca por palavras-chave.
+
+Uso (a partir da pasta src):
+    python -m utils.indice_semantico construir [--dominio tecnico]
+    python -m utils.indice_semantico buscar "não entra na conta"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.base_conhecimento import Artigo, obter_base_conhecimento
+
+# === CONFIGURAÇÃO ===
+
+# Modelo multilíngue pequeno (384 dimensões), bom para paráfrases em português
+MODELO_EMBEDDINGS = os.getenv(
+    "INDICE_SEMANTICO_MODELO", "paraphrase-multilingual-MiniLM-L12-v2"
+)
+LIMIAR_SCORE = float(os.getenv("INDICE_SEMANTICO_LIMIAR", 0.45))
+TOP_K = int(os.getenv("INDICE_SEMANTICO_TOP_K", 3))
+PASTA_INDICES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents", "modelos"
+)
+
+# Recebe textos e devolve a matriz (n, d) de embeddings
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+
+class EmbedderSentenceTransformers:
+    """Embedder local com sentence-transformers (modelo carregado sob demanda)"""
+
+    def __init__(self, modelo: str = MODELO_EMBEDDINGS, tamanho_lote: int = 64):
+        self.nome = f"sentence-transformers/{modelo}"
+        self.modelo = modelo
+        self.tamanho_lote = tamanho_lote
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        if self._modelo is None:
+            with self._lock:
+                if self._modelo is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._modelo = SentenceTransformer(self.modelo)
+        return self._modelo
+
+    def __call__(self, textos: Sequence[str]) -> np.ndarray:
+        return self._carregar().encode(
+            list(textos),
+            batch_size=self.tamanho_lote,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+
+
+def embedder_padrao() -> Optional[Embedder]:
+    """sentence-transformers se estiver instalado, senão None"""
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        return None
+    return EmbedderSentenceTransformers()
+
+
+def _normalizar_linhas(matriz: np.ndarray) -> np.ndarray:
+    matriz = np.asarray(matriz, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.where(normas > 0, normas, 1.0)
+
+
+def texto_indexado(artigo: Artigo) -> str:
+    """Texto embutido de cada artigo: id, palavras-chave e conteúdo"""
+    palavras = ", ".join([artigo.id.replace("_", " "), *artigo.palavras_chave])
+    return f"{palavras}\n{artigo.texto}"
+
+
+# === ÍNDICE ===
+
+
+class IndiceSemantico:
+    """
+    Embeddings dos artigos em uma matriz (n, d) normalizada em L2.
+
+    A similaridade de cosseno de um lote de consultas contra todos os
+    artigos é um único produto de matrizes; o top-k sai de argpartition.
+    """
+
+    def __init__(
+        self,
+        artigos: List[Artigo],
+        vetores: np.ndarray,
+        embedder: Embedder,
+        limiar: float = LIMIAR_SCORE,
+    ):
+        if len(artigos) != len(vetores):
+            raise ValueError("Um vetor por artigo")
+        self.artigos = artigos
+        self.vetores = vetores
+        self.embedder = embedder
+        self.limiar = limiar
+
+    def __len__(self) -> int:
+        return len(self.artigos)
+
+    @classmethod
+    def construir(
+        cls, artigos: List[Artigo], embedder: Embedder, **kwargs
+    ) -> "IndiceSemantico":
+        textos = [texto_indexado(artigo) for artigo in artigos]
+        vetores = _normalizar_linhas(embedder(textos)) if textos else np.zeros((0, 0))
+        return cls(artigos, vetores, embedder, **kwargs)
+
+    def buscar_lote(
+        self, consultas: Sequence[str], k: int = TOP_K, limiar: Optional[float] = None
+    ) -> List[List[Tuple[Artigo, float]]]:
+        """Top-k (artigo, score) de cada consulta, só acima do limiar"""
+        if not consultas or not self.artigos:
+            return [[] for _ in consultas]
+        limiar = self.limiar if limiar is None else limiar
+        k = min(k, len(self.artigos))
+        scores = _normalizar_linhas(self.embedder(list(consultas))) @ self.vetores.T
+
+        resultados = []
+        for linha in scores:
+            melhores = np.argpartition(-linha, k - 1)[:k]
+            melhores = melhores[np.argsort(-linha[melhores])]
+            resultados.append(
+                [
+                    (self.artigos[i], float(linha[i]))
+                    for i in melhores
+                    if linha[i] >= limiar
+                ]
+            )
+        return resultados
+
+    def buscar(
+        self, consulta: str, k: int = TOP_K, limiar: Optional[float] = None
+    ) -> List[Tuple[Artigo, float]]:
+        return self.buscar_lote([consulta], k, limiar)[0]
+
+
+# === PERSISTÊNCIA ===
+
+
+def assinatura(artigos: List[Artigo], nome_embedder: str) -> str:
+    """Hash dos textos indexados e do modelo (muda se algum deles mudar)"""
+    h = hashlib.sha256(nome_embedder.encode("utf-8"))
+    for artigo in artigos:
+        h.update(b"\0" + artigo.id.encode("utf-8"))
+        h.update(b"\0" + texto_indexado(artigo).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _gravar_atomico(
+    caminho: str,
+    escrever: Callable[[object], None],
+    modo: str = "wb",
+    encoding: Optional[str] = None,
+):
+    """
+    Grava em um temporário exclusivo deste processo e troca com os.replace:
+    workers que constroem o índice ao mesmo tempo não disputam o mesmo
+    arquivo, e quem está lendo nunca vê um arquivo pela metade.
+    """
+    descritor, temporario = tempfile.mkstemp(
+        dir=os.path.dirname(caminho), prefix=os.path.basename(caminho) + "."
+    )
+    try:
+        with os.fdopen(descritor, modo, encoding=encoding) as arquivo:
+            escrever(arquivo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def carregar_ou_construir(
+    artigos: List[Artigo],
+    embedder: Embedder,
+    pasta: str,
+    limiar: float = LIMIAR_SCORE,
+) -> IndiceSemantico:
+    """
+    Abre o índice gravado em `pasta` (vetores.npy via mmap) se o hash dos
+    artigos e do modelo conferir; senão calcula os embeddings e grava.
+    """
+    if not artigos:
+        return IndiceSemantico.construir(artigos, embedder, limiar=limiar)
+    nome = getattr(embedder, "nome", type(embedder).__name__)
+    esperado = assinatura(artigos, nome)
+    caminho_vetores = os.path.join(pasta, "vetores.npy")
+    caminho_meta = os.path.join(pasta, "metadados.json")
+
+    if os.path.exists(caminho_meta) and os.path.exists(caminho_vetores):
+        with open(caminho_meta, encoding="utf-8") as arquivo:
+            meta = json.load(arquivo)
+        if meta.get("hash") == esperado:
+            vetores = np.load(caminho_vetores, mmap_mode="r")
+            return IndiceSemantico(artigos, vetores, embedder, limiar)
+
+    indice = IndiceSemantico.construir(artigos, embedder, limiar=limiar)
+    os.makedirs(pasta, exist_ok=True)
+    _gravar_atomico(caminho_vetores, lambda arquivo: np.save(arquivo, indice.vetores))
+    meta = {
+        "hash": esperado,
+        "embedder": nome,
+        "artigos": [artigo.id for artigo in artigos],
+        "dimensao": int(indice.vetores.shape[1]),
+    }
+    _gravar_atomico(
+        caminho_meta,
+        lambda arquivo: json.dump(meta, arquivo, ensure_ascii=False, indent=2),
+        "w",
+        encoding="utf-8",
+    )
+    return indice
+
+
+# Índices globais por domínio (None = desativado: sem embedder disponível)
+_indices: Dict[str, Optional[IndiceSemantico]] = {}
+_lock_indices = threading.Lock()
+_embedder: Optional[Embedder] = None
+_embedder_definido = False
+_pasta_indices = PASTA_INDICES
+
+
+def definir_embedder(embedder: Optional[Embedder], pasta: Optional[str] = None):
+    """
+    Troca o embedder usado pelos índices globais (descarta os já abertos).
+
+    Args:
+        embedder: Novo embedder; None desativa o índice semântico.
+        pasta: Onde gravar os índices (ex.: pasta temporária de um benchmark,
+            para não sobrescrever os de agents/modelos).
+    """
+    global _embedder, _embedder_definido, _pasta_indices
+    with _lock_indices:
+        _embedder, _embedder_definido = embedder, True
+        _pasta_indices = pasta or PASTA_INDICES
+        _indices.clear()
+
+
+def restaurar_embedder():
+    """Volta ao embedder padrão (sentence-transformers) e a PASTA_INDICES"""
+    global _embedder, _embedder_definido, _pasta_indices
+    with _lock_indices:
+        _embedder, _embedder_definido = None, False
+        _pasta_indices = PASTA_INDICES
+        _indices.clear()
+
+
+def obter_indice_semantico(dominio: str) -> Optional[IndiceSemantico]:
+    """Índice do domínio, aberto (ou construído) na primeira chamada"""
+    global _embedder, _embedder_definido
+    if dominio in _indices:
+        return _indices[dominio]
+    with _lock_indices:
+        if dominio not in _indices:
+            if not _embedder_definido:
+                _embedder, _embedder_definido = embedder_padrao(), True
+            if _embedder is None:
+                _indices[dominio] = None
+            else:
+                artigos = obter_base_conhecimento().artigos(dominio)
+                pasta = os.path.join(_pasta_indices, f"indice_{dominio}")
+                _indices[dominio] = carregar_ou_construir(artigos, _embedder, pasta)
+    return _indices[dominio]
+
+
+# === CLI ===
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice semântico da base")
+    parser.add_argument("--dominio", default="tecnico")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("construir", help="Calcula e grava os embeddings do domínio")
+    buscar = sub.add_parser("buscar", help="Top-k artigos para uma consulta")
+    buscar.add_argument("consulta")
+    buscar.add_argument("--k", type=int, default=TOP_K)
+    buscar.add_argument("--limiar", type=float, default=0.0)
+    args = parser.parse_args()
+
+    indice = obter_indice_semantico(args.dominio)
+    if indice is None:
+        print("⚠️ sentence-transformers não instalado; índice semântico desativado")
+        return
+    if args.comando == "construir":
+        print(f"✅ Índice '{args.dominio}': {len(indice)} artigos em {PASTA_INDICES}")
+        return
+    for artigo, score in indice.buscar(args.consulta, args.k, args.limiar):
+        print(f"   {score:.3f}  {artigo.id:<24} {artigo.texto[:60]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+"""
+Limitador Adaptativo de Chamadas ao LLM
+Transporte httpx que fica entre os ChatOpenAI do llm_pool e a API: baldes
+de tokens por modelo (requisições e tokens por minuto), concorrência
+ajustada por AIMD e novas tentativas com backoff exponencial com jitter
+
+Antes de cada chamada, os tokens são estimados pelo tamanho do corpo mais a
+resposta esperada, e os dois baldes do modelo são debitados. Se faltar
+saldo, a chamada espera o reabastecimento em vez de ir e voltar com 429. Os
+limites reais vêm dos cabeçalhos x-ratelimit-* de cada resposta, que também
+trazem o consumo dos outros processos que dividem a mesma cota. A
+concorrência dobra a cada janela de respostas até o primeiro sinal de
+sobrecarga e depois cresce +1 por janela, cai pela metade com 429 e recua
+10% quando a latência dispara.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from utils.observabilidade import metricas
+
+# === CONFIGURAÇÃO ===
+
+LIMITADOR_ATIVO = os.getenv("LIMITADOR_LLM", "1") == "1"
+# Limites iniciais por modelo (substituídos pelos cabeçalhos da API)
+RPM_PADRAO = int(os.getenv("LIMITADOR_RPM", 500))
+TPM_PADRAO = int(os.getenv("LIMITADOR_TPM", 200_000))
+# Os baldes acumulam no máximo este tanto de segundos de cota (rajada)
+RAJADA_SEGUNDOS = float(os.getenv("LIMITADOR_RAJADA_SEGUNDOS", 10))
+CONCORRENCIA_INICIAL = int(os.getenv("LIMITADOR_CONCORRENCIA_INICIAL", 16))
+CONCORRENCIA_MINIMA = 1
+CONCORRENCIA_MAXIMA = int(os.getenv("LIMITADOR_CONCORRENCIA_MAXIMA", 64))
+# Latência média acima deste múltiplo da base reduz a concorrência
+FATOR_LATENCIA = float(os.getenv("LIMITADOR_FATOR_LATENCIA", 3.0))
+INTERVALO_REDUCAO = 1.0  # segundos entre reduções (uma rajada de 429 conta uma vez)
+TENTATIVAS = int(os.getenv("LIMITADOR_TENTATIVAS", 5))
+BACKOFF_BASE = float(os.getenv("LIMITADOR_BACKOFF_BASE", 0.5))
+BACKOFF_MAXIMO = float(os.getenv("LIMITADOR_BACKOFF_MAXIMO", 30.0))
+# Espera máxima por cota/vaga; acima disso a chamada falha com 429 local
+ESPERA_MAXIMA = float(os.getenv("LIMITADOR_ESPERA_MAXIMA", 60.0))
+# Tokens de resposta estimados quando a requisição não define max_tokens
+TOKENS_RESPOSTA = 256
+INTERVALO_VAGA = 0.01  # segundos entre verificações de vaga livre
+
+STATUS_SERVIDOR = {500, 502, 503, 504}
+_DURACAO = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_SEGUNDOS_UNIDADE = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+metricas.declarar(
+    "suporte_limitador_concorrencia", "gauge", "Limite de concorrência (AIMD)"
+)
+metricas.declarar("suporte_limitador_em_voo", "gauge", "Chamadas em andamento")
+metricas.declarar(
+    "suporte_limitador_saldo", "gauge", "Saldo dos baldes (requisicoes/tokens)"
+)
+metricas.declarar(
+    "suporte_limitador_limite_minuto", "gauge", "Cota por minuto (requisicoes/tokens)"
+)
+metricas.declarar(
+    "suporte_limitador_espera_segundos",
+    "histogram",
+    "Espera por cota e vaga antes de cada tentativa",
+)
+metricas.declarar(
+    "suporte_limitador_retentativas_total",
+    "counter",
+    "Novas tentativas por motivo (limite, servidor, conexao)",
+)
+metricas.declarar(
+    "suporte_limitador_rejeicoes_total",
+    "counter",
+    "Chamadas recusadas localmente (espera acima de LIMITADOR_ESPERA_MAXIMA)",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def segundos_duracao(texto: Optional[str]) -> Optional[float]:
+    """Converte '1s', '6m0s', '20ms' ou '2.5' em segundos (None se inválido)"""
+    if not texto:
+        return None
+    try:
+        return float(texto)
+    except ValueError:
+        pass
+    partes = _DURACAO.findall(texto)
+    if not partes:
+        return None
+    return sum(float(valor) * _SEGUNDOS_UNIDADE[unidade] for valor, unidade in partes)
+
+
+def espera_sugerida(headers: httpx.Headers) -> Optional[float]:
+    """Espera pedida pela API (retry-after-ms ou retry-after), em segundos"""
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return segundos_duracao(headers.get("retry-after"))
+
+
+# === BALDE DE TOKENS ===
+
+
+class BaldeTokens:
+    """
+    Balde que reabastece `por_minuto` unidades por minuto, até
+    RAJADA_SEGUNDOS de cota. reservar() debita na hora (o saldo pode ficar
+    negativo) e devolve quanto esperar: quem chega depois entra atrás.
+    Não é thread-safe sozinho (o LimitadorModelo segura o lock).
+    """
+
+    def __init__(self, por_minuto: float, rajada: float = RAJADA_SEGUNDOS):
+        self.rajada = rajada
+        self.definir_limite(por_minuto)
+        self.saldo = self.capacidade
+        self._atualizado = time.monotonic()
+
+    def definir_limite(self, por_minuto: float):
+        self.por_minuto = max(por_minuto, 1.0)
+        self.taxa = self.por_minuto / 60.0
+        self.capacidade = max(self.taxa * self.rajada, 1.0)
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self.saldo = min(
+            self.capacidade, self.saldo + (agora - self._atualizado) * self.taxa
+        )
+        self._atualizado = agora
+
+    def reservar(self, quantidade: float) -> float:
+        """Debita `quantidade` e devolve os segundos até o saldo cobrir o débito"""
+        self._reabastecer()
+        self.saldo -= quantidade
+        return max(0.0, -self.saldo / self.taxa)
+
+    def sincronizar(self, restante: float):
+        """Saldo informado pela API (inclui o consumo de outros processos)"""
+        self._reabastecer()
+        self.saldo = min(self.saldo, restante)
+
+
+# === LIMITADOR POR MODELO ===
+
+
+class LimitadorModelo:
+    """
+    Baldes de requisições e de tokens por minuto e o limite de concorrência
+    (AIMD) de um modelo, compartilhados entre threads e loops asyncio.
+    """
+
+    def __init__(
+        self,
+        modelo: str,
+        rpm: float = RPM_PADRAO,
+        tpm: float = TPM_PADRAO,
+        concorrencia: float = CONCORRENCIA_INICIAL,
+        concorrencia_maxima: float = CONCORRENCIA_MAXIMA,
+    ):
+        self.modelo = modelo
+        self.requisicoes = BaldeTokens(rpm)
+        self.tokens = BaldeTokens(tpm)
+        self.concorrencia = float(concorrencia)
+        self.concorrencia_maxima = float(concorrencia_maxima)
+        self.em_voo = 0
+        # Partida lenta (como no TCP): +1 por resposta até a primeira redução
+        self.partida_lenta = True
+        self.latencia_media: Optional[float] = None
+        self.latencia_base: Optional[float] = None
+        self._ultima_reducao = 0.0
+        self._lock = threading.Lock()
+
+    def reservar(self, tokens: int) -> float:
+        """Debita uma requisição e `tokens` e devolve a espera necessária"""
+        with self._lock:
+            espera = max(self.requisicoes.reservar(1), self.tokens.reservar(tokens))
+        self._publicar()
+        return espera
+
+    def devolver(self, tokens: int):
+        """Estorna uma reserva que não virou chamada"""
+        with self._lock:
+            self.requisicoes.saldo += 1
+            self.tokens.saldo += tokens
+
+    def tentar_ocupar(self) -> bool:
+        """Ocupa uma vaga de concorrência, se houver"""
+        with self._lock:
+            if self.em_voo >= int(self.concorrencia):
+                return False
+            self.em_voo += 1
+        self._publicar()
+        return True
+
+    def liberar(
+        self, latencia: Optional[float], status: Optional[int], ajustar: bool = True
+    ):
+        """
+        Libera a vaga e ajusta a concorrência: 429 divide por 2, erro de
+        servidor/conexão ou latência alta recua 10%, sucesso soma 1/limite
+        (cerca de +1 a cada `limite` respostas; +1 por resposta na partida
+        lenta). Com ajustar=False (ex.:
+        chamada cancelada pelo cliente), só libera a vaga.
+        """
+        with self._lock:
+            self.em_voo -= 1
+            if ajustar:
+                self._ajustar(latencia, status)
+        self._publicar()
+
+    def _ajustar(self, latencia: Optional[float], status: Optional[int]):
+        if status == 429:
+            self._reduzir(0.5)
+        elif status is None or status in STATUS_SERVIDOR:
+            self._reduzir(0.9)
+        elif latencia is not None:
+            self._observar_latencia(latencia)
+            if self.latencia_media > FATOR_LATENCIA * self.latencia_base:
+                self._reduzir(0.9)
+            else:
+                passo = 1.0 if self.partida_lenta else 1.0 / self.concorrencia
+                self.concorrencia = min(
+                    self.concorrencia_maxima, self.concorrencia + passo
+                )
+
+    def _observar_latencia(self, latencia: float):
+        if self.latencia_media is None:
+            self.latencia_media = self.latencia_base = latencia
+            return
+        self.latencia_media = 0.8 * self.latencia_media + 0.2 * latencia
+        # A base acompanha a menor média, subindo devagar se a API ficar lenta
+        self.latencia_base = min(self.latencia_base * 1.001, self.latencia_media)
+
+    def _reduzir(self, fator: float):
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < INTERVALO_REDUCAO:
+            return
+        self._ultima_reducao = agora
+        self.partida_lenta = False
+        self.concorrencia = max(CONCORRENCIA_MINIMA, self.concorrencia * fator)
+        logger.debug(
+            "Limitador %s: concorrência reduzida para %.1f",
+            self.modelo,
+            self.concorrencia,
+        )
+
+    def calibrar(self, headers: httpx.Headers):
+        """Ajusta cotas e saldos pelos cabeçalhos x-ratelimit-* da resposta"""
+        with self._lock:
+            for balde, tipo in (
+                (self.requisicoes, "requests"),
+                (self.tokens, "tokens"),
+            ):
+                limite = headers.get(f"x-ratelimit-limit-{tipo}")
+                restante = headers.get(f"x-ratelimit-remaining-{tipo}")
+                try:
+                    if limite is not None and float(limite) != balde.por_minuto:
+                        balde.definir_limite(float(limite))
+                    if restante is not None:
+                        balde.sincronizar(float(restante))
+                except ValueError:
+                    continue
+
+    def _publicar(self):
+        modelo = self.modelo
+        metricas.definir(
+            "suporte_limitador_concorrencia", self.concorrencia, modelo=modelo
+        )
+        metricas.definir("suporte_limitador_em_voo", self.em_voo, modelo=modelo)
+        for tipo, balde in (("requisicoes", self.requisicoes), ("tokens", self.tokens)):
+            metricas.definir(
+                "suporte_limitador_saldo",
+                round(balde.saldo, 1),
+                modelo=modelo,
+                tipo=tipo,
+            )
+            metricas.definir(
+                "suporte_limitador_limite_minuto",
+                balde.por_minuto,
+                modelo=modelo,
+                tipo=tipo,
+            )
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concorrencia": round(self.concorrencia, 2),
+                "em_voo": self.em_voo,
+                "rpm": self.requisicoes.por_minuto,
+                "tpm": self.tokens.por_minuto,
+                "saldo_requisicoes": round(self.requisicoes.saldo, 1),
+                "saldo_tokens": round(self.tokens.saldo, 1),
+                "latencia_media_s": self.latencia_media,
+            }
+
+
+class Limitadores:
+    """Um LimitadorModelo por modelo, criado no primeiro uso"""
+
+    def __init__(self, rpm: float = RPM_PADRAO, tpm: float = TPM_PADRAO, **kwargs):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.kwargs = kwargs
+        self._por_modelo: Dict[str, LimitadorModelo] = {}
+        self._lock = threading.Lock()
+
+    def obter(self, modelo: str) -> LimitadorModelo:
+        limitador = self._por_modelo.get(modelo)
+        if limitador is None:
+            with self._lock:
+                limitador = self._por_modelo.get(modelo)
+                if limitador is None:
+                    limitador = LimitadorModelo(
+                        modelo, self.rpm, self.tpm, **self.kwargs
+                    )
+                    self._por_modelo[modelo] = limitador
+        return limitador
+
+    def estatisticas(self) -> Dict[str, Dict[str, Any]]:
+        return {modelo: l.estatisticas() for modelo, l in self._por_modelo.items()}
+
+
+# Limitadores do processo (todos os ChatOpenAI do llm_pool passam por eles)
+limitadores = Limitadores()
+
+
+# === TRANSPORTE HTTP ===
+
+
+def estimar_tokens(corpo_bytes: bytes, corpo: Dict[str, Any]) -> int:
+    """Tokens de entrada (aprox. 4 bytes por token) + resposta esperada"""
+    resposta = (
+        corpo.get("max_completion_tokens") or corpo.get("max_tokens") or TOKENS_RESPOSTA
+    )
+    return len(corpo_bytes) // 4 + int(resposta)
+
+
+class _PoliticaLimitador:
+    """Partes comuns dos transportes síncrono e assíncrono"""
+
+    def __init__(self, limitadores: Limitadores, tentativas: int, espera_maxima: float):
+        self.limitadores = limitadores
+        self.tentativas = tentativas
+        self.espera_maxima = espera_maxima
+
+    def _alvo(self, request: httpx.Request) -> Optional[Tuple[LimitadorModelo, int]]:
+        """Limitador e tokens estimados, ou None se a requisição não é de modelo"""
+        if request.method != "POST":
+            return None
+        try:
+            corpo = json.loads(request.content)
+        except (httpx.RequestNotRead, ValueError):
+            return None
+        if not isinstance(corpo, dict) or not corpo.get("model"):
+            return None
+        modelo = str(corpo["model"])
+        return self.limitadores.obter(modelo), estimar_tokens(request.content, corpo)
+
+    @staticmethod
+    def _motivo(response: httpx.Response) -> Optional[str]:
+        """Motivo para tentar de novo, ou None se a resposta é definitiva"""
+        if response.status_code == 429:
+            # Cota esgotada (billing) não volta com nova tentativa
+            if b"insufficient_quota" in response.content:
+                return None
+            return "limite"
+        if response.status_code in STATUS_SERVIDOR:
+            return "servidor"
+        return None
+
+    def _backoff(self, tentativa: int, sugerida: Optional[float]) -> float:
+        """Backoff exponencial com jitter completo (ou a espera pedida pela API)"""
+        teto = min(BACKOFF_MAXIMO, BACKOFF_BASE * 2**tentativa)
+        espera = random.uniform(0, teto)
+        if sugerida is not None:
+            espera = min(BACKOFF_MAXIMO, sugerida) + random.uniform(0, BACKOFF_BASE)
+        return espera
+
+    def _registrar_retentativa(self, limitador: LimitadorModelo, motivo: str):
+        metricas.incrementar(
+            "suporte_limitador_retentativas_total",
+            modelo=limitador.modelo,
+            motivo=motivo,
+        )
+
+    def _rejeitar(
+        self, request: httpx.Request, limitador: LimitadorModelo
+    ) -> httpx.Response:
+        """429 local: a espera por cota ou vaga passaria de espera_maxima"""
+        metricas.incrementar(
+            "suporte_limitador_rejeicoes_total", modelo=limitador.modelo
+        )
+        logger.warning(
+            "Limitador %s: espera acima de %gs, chamada recusada",
+            limitador.modelo,
+            self.espera_maxima,
+        )
+        return httpx.Response(
+            429,
+            headers={"retry-after": "1", "x-limitador-local": "1"},
+            json={
+                "error": {
+                    "message": "Limite local de chamadas ao modelo atingido",
+                    "type": "rate_limit_exceeded",
+                    "code": "limitador_local",
+                }
+            },
+            request=request,
+        )
+
+
+class TransporteLimitado(_PoliticaLimitador, httpx.BaseTransport):
+    """Transporte síncrono com limitador (envolve outro transporte httpx)"""
+
+    def __init__(
+        self,
+        transporte: httpx.BaseTransport,
+        limitadores: Limitadores = limitadores,
+        tentativas: int = TENTATIVAS,
+        espera_maxima: float = ESPERA_MAXIMA,
+    ):
+        super().__init__(limitadores, tentativas, espera_maxima)
+        self.transporte = transporte
+
+    def _aguardar_vez(self, limitador: LimitadorModelo, tokens: int) -> bool:
+        inicio = time.monotonic()
+        espera = limitador.reservar(tokens)
+        if espera > self.espera_maxima:
+            limitador.devolver(tokens)
+            return False
+        time.sleep(espera)
+        while not limitador.tentar_ocupar():
+            if time.monotonic() - inicio > self.espera_maxima:
+                limitador.devolver(tokens)
+                return False
+            time.sleep(INTERVALO_VAGA)
+        metricas.observar(
+            "suporte_limitador_espera_segundos",
+            time.monotonic() - inicio,
+            modelo=limitador.modelo,
+        )
+        return True
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        alvo = self._alvo(request)
+        if alvo is None:
+            return self.transporte.handle_request(request)
+        limitador, tokens = alvo
+        tentativa = 0
+        while True:
+            if not self._aguardar_vez(limitador, tokens):
+                return self._rejeitar(request, limitador)
+            inicio = time.monotonic()
+            try:
+                response = self.transporte.handle_request(request)
+            except httpx.TransportError:
+                limitador.liberar(None, None)
+                if tentativa == self.tentativas:
+                    raise
+                motivo, sugerida = "conexao", None
+            except BaseException:
+                limitador.liberar(None, None, ajustar=False)
+                raise
+            else:
+                limitador.liberar(time.monotonic() - inicio, response.status_code)
+                limitador.calibrar(response.headers)
+                if response.status_code == 429:
+                    response.read()
+                motivo = self._motivo(response)
+                if motivo is None or tentativa == self.tentativas:
+                    return response
+                sugerida = espera_sugerida(response.headers)
+                response.close()
+            self._registrar_retentativa(limitador, motivo)
+            time.sleep(self._backoff(tentativa, sugerida))
+            tentativa += 1
+
+    def close(self):
+        self.transporte.close()
+
+
+class TransporteLimitadoAsync(_PoliticaLimitador, httpx.AsyncBaseTransport):
+    """Versão assíncrona de TransporteLimitado"""
+
+    def __init__(
+        self,
+        transporte: httpx.AsyncBaseTransport,
+        limitadores: Limitadores = limitadores,
+        tentativas: int = TENTATIVAS,
+        espera_maxima: float = ESPERA_MAXIMA,
+    ):
+        super().__init__(limitadores, tentativas, espera_maxima)
+        self.transporte = transporte
+
+    async def _aguardar_vez(self, limitador: LimitadorModelo, tokens: int) -> bool:
+        inicio = time.monotonic()
+        espera = limitador.reservar(tokens)
+        if espera > self.espera_maxima:
+            limitador.devolver(tokens)
+            return False
+        try:
+            await asyncio.sleep(espera)
+        except asyncio.CancelledError:
+            limitador.devolver(tokens)
+            raise
+        while not limitador.tentar_ocupar():
+            if time.monotonic() - inicio > self.espera_maxima:
+                limitador.devolver(tokens)
+                return False
+            await asyncio.sleep(INTERVALO_VAGA)
+        metricas.observar(
+            "suporte_limitador_espera_segundos",
+            time.monotonic() - inicio,
+            modelo=limitador.modelo,
+        )
+        return True
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        alvo = self._alvo(request)
+        if alvo is None:
+            return await self.transporte.handle_async_request(request)
+        limitador, tokens = alvo
+        tentativa = 0
+        while True:
+            if not await self._aguardar_vez(limitador, tokens):
+                return self._rejeitar(request, limitador)
+            inicio = time.monotonic()
+            try:
+                response = await self.transporte.handle_async_request(request)
+            except httpx.TransportError:
+                limitador.liberar(None, None)
+                if tentativa == self.tentativas:
+                    raise
+                motivo, sugerida = "conexao", None
+            except BaseException:
+                # Cancelamento (ex.: timeout do chamador) não é sinal da API
+                limitador.liberar(None, None, ajustar=False)
+                raise
+            else:
+                limitador.liberar(time.monotonic() - inicio, response.status_code)
+                limitador.calibrar(response.headers)
+                if response.status_code == 429:
+                    await response.aread()
+                motivo = self._motivo(response)
+                if motivo is None or tentativa == self.tentativas:
+                    return response
+                sugerida = espera_sugerida(response.headers)
+                await response.aclose()
+            self._registrar_retentativa(limitador, motivo)
+            await asyncio.sleep(self._backoff(tentativa, sugerida))
+            tentativa += 1
+
+    async def aclose(self):
+        await self.transporte.aclose()
@@ -0,0 +1,323 @@
+"""
+Registro Compartilhado de Clientes LLM
+Um ChatOpenAI por (modelo, temperatura), chains prompt|llm pré-compiladas e
+clientes HTTP com keep-alive compartilhados por todos os agentes (o
+assíncrono tem um pool por event loop)
+
+O transporte dos clientes HTTP passa pelo limitador (utils.limitador_llm):
+cota por modelo, concorrência adaptativa e novas tentativas ficam em um só
+lugar, e o SDK da OpenAI não tenta de novo por conta própria.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+import httpx
+from pydantic import BaseModel
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+from utils.limitador_llm import (
+    LIMITADOR_ATIVO,
+    TransporteLimitado,
+    TransporteLimitadoAsync,
+)
+from utils.observabilidade import rastreador_llm
+
+# === CONFIGURAÇÃO DO POOL HTTP ===
+
+MODELO_PADRAO = "gpt-4o-mini"
+
+LIMITES_POOL = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60.0,
+)
+TIMEOUT_HTTP = httpx.Timeout(60.0, connect=5.0)
+
+# === ESTADO GLOBAL DO REGISTRO ===
+
+_lock = threading.RLock()
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional["ClienteAsyncPorLoop"] = None
+_llms: Dict[Tuple[str, Optional[float]], BaseChatModel] = {}
+# (nome, modelo, temperatura, template, saida_estruturada) -> chain
+_chains: Dict[Tuple[Any, ...], Runnable] = {}
+
+# Fábrica alternativa de modelos (ex.: modelo falso em benchmarks offline)
+FabricaLLM = Callable[[str, Optional[float]], BaseChatModel]
+_fabrica_llm: Optional[FabricaLLM] = None
+
+_estatisticas = {
+    "llms_criados": 0,
+    "llms_reutilizados": 0,
+    "chains_criadas": 0,
+    "chains_reutilizadas": 0,
+    "requisicoes_http": 0,
+}
+
+
+def _contar_requisicao(request: httpx.Request) -> None:
+    with _lock:
+        _estatisticas["requisicoes_http"] += 1
+
+
+async def _acontar_requisicao(request: httpx.Request) -> None:
+    with _lock:
+        _estatisticas["requisicoes_http"] += 1
+
+
+# === CLIENTES HTTP ===
+
+
+def obter_http_client() -> httpx.Client:
+    """Retorna o cliente HTTP síncrono compartilhado (keep-alive)"""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                transporte = httpx.HTTPTransport(limits=LIMITES_POOL)
+                if LIMITADOR_ATIVO:
+                    transporte = TransporteLimitado(transporte)
+                _http_client = httpx.Client(
+                    transport=transporte,
+                    timeout=TIMEOUT_HTTP,
+                    event_hooks={"request": [_contar_requisicao]},
+                )
+    return _http_client
+
+
+def _criar_http_async_client() -> httpx.AsyncClient:
+    transporte = httpx.AsyncHTTPTransport(limits=LIMITES_POOL)
+    if LIMITADOR_ATIVO:
+        transporte = TransporteLimitadoAsync(transporte)
+    return httpx.AsyncClient(
+        transport=transporte,
+        timeout=TIMEOUT_HTTP,
+        event_hooks={"request": [_acontar_requisicao]},
+    )
+
+
+class ClienteAsyncPorLoop(httpx.AsyncClient):
+    """
+    Cliente assíncrono que envia cada requisição pelo pool do event loop
+    em execução.
+
+    As conexões de um httpx.AsyncClient ficam presas ao loop que as abriu;
+    como o ChatOpenAI guarda o cliente recebido na criação, este objeto
+    único escolhe o pool real a cada send(). Loops fechados (ex.: após um
+    asyncio.run) saem do registro na próxima requisição.
+    """
+
+    def __init__(self):
+        super().__init__(timeout=TIMEOUT_HTTP)
+        # event loop -> cliente com o pool de conexões daquele loop
+        self._por_loop: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def cliente_do_loop(self) -> httpx.AsyncClient:
+        """Cliente (com pool próprio) do event loop em execução"""
+        loop = asyncio.get_running_loop()
+        with _lock:
+            cliente = self._por_loop.get(loop)
+            if cliente is None:
+                for fechado in [lp for lp in self._por_loop if lp.is_closed()]:
+                    del self._por_loop[fechado]
+                cliente = self._por_loop[loop] = _criar_http_async_client()
+            return cliente
+
+    def clientes(self) -> List[httpx.AsyncClient]:
+        with _lock:
+            return list(self._por_loop.values())
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self.cliente_do_loop().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        """Fecha o pool do loop atual; os de loops encerrados são descartados"""
+        loop = asyncio.get_running_loop()
+        with _lock:
+            cliente = self._por_loop.pop(loop, None)
+            self._por_loop.clear()
+        if cliente is not None:
+            await cliente.aclose()
+        await super().aclose()
+
+
+def obter_http_async_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP assíncrono compartilhado (keep-alive).
+
+    Pode ser usado de vários event loops (ex.: um asyncio.run por lote):
+    cada loop tem o seu pool de conexões, ver ClienteAsyncPorLoop.
+    """
+    global _http_async_client
+    if _http_async_client is None:
+        with _lock:
+            if _http_async_client is None:
+                _http_async_client = ClienteAsyncPorLoop()
+    return _http_async_client
+
+
+# === LLMs E CHAINS ===
+
+
+def definir_fabrica_llm(fabrica: Optional[FabricaLLM]) -> None:
+    """
+    Substitui a criação de ChatOpenAI por outra fábrica (None restaura).
+
+    Limpa os LLMs e chains já registrados, então deve ser chamada antes
+    de criar o workflow e os agentes.
+
+    Args:
+        fabrica: Função (modelo, temperatura) -> chat model.
+    """
+    global _fabrica_llm
+    with _lock:
+        _fabrica_llm = fabrica
+        _llms.clear()
+        _chains.clear()
+
+
+def obter_llm(
+    modelo: str = MODELO_PADRAO, temperatura: Optional[float] = None
+) -> BaseChatModel:
+    """
+    Retorna o ChatOpenAI compartilhado para (modelo, temperatura).
+
+    Args:
+        modelo: Nome do modelo OpenAI.
+        temperatura: Temperatura do modelo (None usa o padrão do provedor).
+    """
+    chave = (modelo, temperatura)
+    llm = _llms.get(chave)
+    if llm is not None:
+        _estatisticas["llms_reutilizados"] += 1
+        return llm
+
+    with _lock:
+        llm = _llms.get(chave)
+        if llm is None and _fabrica_llm is not None:
+            llm = _fabrica_llm(modelo, temperatura)
+            if llm.callbacks is None:
+                llm.callbacks = [rastreador_llm]
+            _llms[chave] = llm
+            _estatisticas["llms_criados"] += 1
+        elif llm is None:
+            parametros: Dict[str, Any] = {"model": modelo}
+            if temperatura is not None:
+                parametros["temperature"] = temperatura
+            if LIMITADOR_ATIVO:
+                # As novas tentativas (com backoff e cota) ficam no limitador
+                parametros["max_retries"] = 0
+            llm = ChatOpenAI(
+                **parametros,
+                http_client=obter_http_client(),
+                http_async_client=obter_http_async_client(),
+                # Métricas locais de duração, tokens e erros (utils.observabilidade)
+                callbacks=[rastreador_llm],
+            )
+            _llms[chave] = llm
+            _estatisticas["llms_criados"] += 1
+        else:
+            _estatisticas["llms_reutilizados"] += 1
+    return llm
+
+
+def obter_chain(
+    nome: str,
+    template: str,
+    modelo: str = MODELO_PADRAO,
+    temperatura: Optional[float] = 0,
+    saida_estruturada: Optional[Type[BaseModel]] = None,
+) -> Runnable:
+    """
+    Retorna a chain prompt|llm pré-compilada registrada com esse nome.
+
+    O template e o esquema de saída fazem parte da chave, então registrar o
+    mesmo nome com outra definição cria uma chain nova em vez de devolver a
+    antiga.
+
+    Args:
+        nome: Identificador da chain (ex.: 'categorizar').
+        template: Template do prompt (formato ChatPromptTemplate.from_template).
+        modelo: Nome do modelo OpenAI.
+        temperatura: Temperatura do modelo.
+        saida_estruturada: Modelo Pydantic para saída estruturada (opcional).
+    """
+    chave = (nome, modelo, temperatura, template, saida_estruturada)
+    chain = _chains.get(chave)
+    if chain is not None:
+        _estatisticas["chains_reutilizadas"] += 1
+        return chain
+
+    llm = obter_llm(modelo, temperatura)
+    with _lock:
+        chain = _chains.get(chave)
+        if chain is None:
+            prompt = ChatPromptTemplate.from_template(template)
+            if saida_estruturada is not None:
+                chain = prompt | llm.with_structured_output(saida_estruturada)
+            else:
+                chain = prompt | llm
+            _chains[chave] = chain
+            _estatisticas["chains_criadas"] += 1
+        else:
+            _estatisticas["chains_reutilizadas"] += 1
+    return chain
+
+
+# === ESTATÍSTICAS ===
+
+
+def _conexoes_do_pool(client: Union[httpx.Client, httpx.AsyncClient, None]) -> list:
+    """Lista as conexões abertas no pool do cliente (vazia se indisponível)"""
+    if client is None:
+        return []
+    transporte = getattr(client, "_transport", None)
+    # O limitador envolve o transporte que tem o pool de conexões
+    transporte = getattr(transporte, "transporte", transporte)
+    pool = getattr(transporte, "_pool", None)
+    return list(getattr(pool, "connections", []) or [])
+
+
+def estatisticas_pool() -> Dict[str, Any]:
+    """Retorna estatísticas de uso do registro e do pool HTTP"""
+    conexoes_sync = _conexoes_do_pool(_http_client)
+    conexoes_async = []
+    if _http_async_client is not None:
+        for cliente in _http_async_client.clientes():
+            conexoes_async += _conexoes_do_pool(cliente)
+    return {
+        **_estatisticas,
+        "llms_registrados": len(_llms),
+        "chains_registradas": len(_chains),
+        "conexoes_abertas": len(conexoes_sync) + len(conexoes_async),
+        "conexoes_ociosas": sum(
+            1 for conexao in conexoes_sync + conexoes_async if conexao.is_idle()
+        ),
+        "limite_conexoes": LIMITES_POOL.max_connections,
+        "limite_keepalive": LIMITES_POOL.max_keepalive_connections,
+    }
+
+
+def fechar_pool() -> None:
+    """Fecha o cliente HTTP síncrono e limpa o registro (uso em shutdown)"""
+    global _http_client, _http_async_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _http_async_client = None
+        _llms.clear()
+        _chains.clear()
+
+
+async def afechar_pool() -> None:
+    """Fecha os clientes HTTP síncrono e assíncrono e limpa o registro"""
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+    fechar_pool()
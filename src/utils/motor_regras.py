@@ -0,0 +1,441 @@
+"""
+Motor de Regras de Roteamento e Escalação
+Compila um arquivo declarativo de regras (JSON ou YAML) em uma tabela de
+decisão indexada por (categoria, sentimento) e em um autômato com as
+expressões de todos os grupos de padrões
+
+Cada ticket é avaliado em uma única passada: a consulta é lida uma vez
+pelo autômato, e as regras candidatas da tabela são percorridas em ordem.
+Para cada campo da decisão vale a primeira regra que o define. O arquivo
+é recarregado automaticamente quando muda no disco.
+
+Uso (a partir da pasta src):
+    python -m utils.motor_regras validar [--regras arquivo.json]
+    python -m utils.motor_regras replay [--db conversas.db] [--limite 1000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from utils.base_conhecimento import AutomatoPalavras, normalizar_palavra_chave
+from utils.state import CategoryType, SentimentType
+from utils.texto import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+try:
+    import yaml
+except ImportError:  # PyYAML é opcional: só regras em .yaml/.yml dependem dele
+    yaml = None
+
+# Arquivo de regras (padrão: src/agents/regras_roteamento.json)
+REGRAS_PATH = os.getenv(
+    "REGRAS_ROTEAMENTO_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "agents", "regras_roteamento.json"
+    ),
+)
+# Intervalo mínimo entre verificações do mtime do arquivo (segundos)
+INTERVALO_RECARGA = float(os.getenv("REGRAS_INTERVALO_RECARGA", 2))
+# Decisões recentes em cache: roteamento e especialistas reaproveitam a da triagem
+MAX_DECISOES_CACHE = 1024
+
+# Campos que as regras podem definir
+CAMPOS_DECISAO = ("prioridade", "agente", "rota", "escalar", "consulta_financeira")
+CONDICOES = ("categoria", "sentimento", "padrao")
+
+
+@dataclass(frozen=True)
+class Decisao:
+    """
+    Resultado da avaliação das regras para um ticket.
+
+    `rota` é a rota do coordenador ReAct (determinar_rota): quando nenhuma
+    regra a define, é igual a `agente`.
+    """
+
+    prioridade: str
+    agente: str
+    rota: str
+    escalar: bool
+    consulta_financeira: Optional[str]
+    regras: Tuple[str, ...] = field(default_factory=tuple)
+
+
+@dataclass(frozen=True)
+class _Regra:
+    nome: str
+    categorias: Optional[FrozenSet[str]]
+    sentimentos: Optional[FrozenSet[str]]
+    padroes: Optional[FrozenSet[str]]
+    define: Tuple[Tuple[str, Any], ...]
+
+
+def _valor(item: Any) -> str:
+    return getattr(item, "value", item) or ""
+
+
+def _conjunto(valor: Any) -> Optional[FrozenSet[str]]:
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        return frozenset([valor])
+    return frozenset(str(v) for v in valor)
+
+
+# === COMPILAÇÃO ===
+
+
+class RegrasCompiladas:
+    """Tabela de decisão e autômato de padrões de uma versão do arquivo"""
+
+    def __init__(self, definicao: Dict[str, Any], origem: str = ""):
+        self.origem = origem
+        self.padrao: Dict[str, Any] = {
+            "prioridade": "Low",
+            "agente": "agent_geral",
+            "escalar": False,
+            "consulta_financeira": None,
+            **definicao.get("padrao", {}),
+        }
+
+        grupos = definicao.get("padroes", {})
+        self._automato = AutomatoPalavras()
+        self._grupos_por_expressao: Dict[str, set] = {}
+        for grupo, expressoes in grupos.items():
+            for expressao in expressoes:
+                normalizada = normalizar_palavra_chave(expressao)
+                if normalizada:
+                    self._automato.adicionar(normalizada)
+                    self._grupos_por_expressao.setdefault(normalizada, set()).add(grupo)
+        self._automato.compilar()
+
+        self.regras: List[_Regra] = []
+        for posicao, item in enumerate(definicao.get("regras", [])):
+            nome = item.get("nome", f"regra_{posicao}")
+            quando = item.get("quando", {})
+            desconhecidas = set(quando) - set(CONDICOES)
+            if desconhecidas:
+                raise ValueError(
+                    f"Regra {nome!r}: condições desconhecidas {desconhecidas}"
+                )
+            define = item.get("define", {})
+            invalidos = set(define) - set(CAMPOS_DECISAO)
+            if not define or invalidos:
+                raise ValueError(
+                    f"Regra {nome!r}: 'define' inválido {invalidos or '{}'}"
+                )
+            padroes = _conjunto(quando.get("padrao"))
+            inexistentes = (padroes or frozenset()) - set(grupos)
+            if inexistentes:
+                raise ValueError(f"Regra {nome!r}: grupos inexistentes {inexistentes}")
+            self.regras.append(
+                _Regra(
+                    nome=nome,
+                    categorias=_conjunto(quando.get("categoria")),
+                    sentimentos=_conjunto(quando.get("sentimento")),
+                    padroes=padroes,
+                    define=tuple(define.items()),
+                )
+            )
+
+        # Tabela de decisão: regras candidatas por (categoria, sentimento)
+        self._tabela: Dict[Tuple[str, str], Tuple[_Regra, ...]] = {}
+        for categoria in CategoryType:
+            for sentimento in SentimentType:
+                self._candidatas(categoria.value, sentimento.value)
+
+    def _candidatas(self, categoria: str, sentimento: str) -> Tuple[_Regra, ...]:
+        chave = (categoria, sentimento)
+        candidatas = self._tabela.get(chave)
+        if candidatas is None:
+            candidatas = tuple(
+                regra
+                for regra in self.regras
+                if (regra.categorias is None or categoria in regra.categorias)
+                and (regra.sentimentos is None or sentimento in regra.sentimentos)
+            )
+            self._tabela[chave] = candidatas
+        return candidatas
+
+    def grupos(self, query: str) -> FrozenSet[str]:
+        """Grupos de padrões encontrados na consulta"""
+        texto = normalizar_texto(query)
+        return frozenset(
+            grupo
+            for _, expressao in self._automato.encontrar(texto)
+            for grupo in self._grupos_por_expressao[expressao]
+        )
+
+    def avaliar(self, categoria: str, sentimento: str, query: str = "") -> Decisao:
+        grupos = self.grupos(query) if query else frozenset()
+        valores: Dict[str, Any] = {}
+        disparadas = []
+        for regra in self._candidatas(categoria, sentimento):
+            if regra.padroes is not None and not (regra.padroes & grupos):
+                continue
+            disparou = False
+            for campo, valor in regra.define:
+                if campo not in valores:
+                    valores[campo] = valor
+                    disparou = True
+            if disparou:
+                disparadas.append(regra.nome)
+            if len(valores) == len(CAMPOS_DECISAO):
+                break
+
+        decisao = {**self.padrao, **valores}
+        return Decisao(
+            prioridade=decisao["prioridade"],
+            agente=decisao["agente"],
+            rota=decisao.get("rota") or decisao["agente"],
+            escalar=bool(decisao["escalar"]),
+            consulta_financeira=decisao["consulta_financeira"],
+            regras=tuple(disparadas),
+        )
+
+
+def ler_definicao(caminho: str) -> Dict[str, Any]:
+    """Lê o arquivo de regras (.json, ou .yaml/.yml com PyYAML)"""
+    with open(caminho, encoding="utf-8") as arquivo:
+        conteudo = arquivo.read()
+    if caminho.lower().endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise ImportError(f"PyYAML não instalado; não é possível ler {caminho}")
+        return yaml.safe_load(conteudo) or {}
+    return json.loads(conteudo)
+
+
+# === MOTOR COM RECARGA ===
+
+
+class MotorRegras:
+    """
+    Avalia as regras compiladas e recarrega o arquivo quando ele muda.
+
+    A verificação do mtime acontece no máximo a cada `intervalo_recarga`
+    segundos. Se a nova versão tiver erro, a anterior continua valendo.
+    """
+
+    def __init__(
+        self, caminho: str = REGRAS_PATH, intervalo_recarga: float = INTERVALO_RECARGA
+    ):
+        self.caminho = caminho
+        self.intervalo_recarga = intervalo_recarga
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str, str], Decisao]" = OrderedDict()
+        self._mtime = os.path.getmtime(caminho)
+        self._verificado_em = time.monotonic()
+        self.regras = RegrasCompiladas(ler_definicao(caminho), caminho)
+        self.recargas = 0
+        self.avaliacoes = 0
+        self.acertos_cache = 0
+
+    def _verificar_recarga(self):
+        agora = time.monotonic()
+        if agora - self._verificado_em < self.intervalo_recarga:
+            return
+        with self._lock:
+            self._verificado_em = agora
+            try:
+                mtime = os.path.getmtime(self.caminho)
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                novas = RegrasCompiladas(ler_definicao(self.caminho), self.caminho)
+            except (ImportError, ValueError, OSError) as e:
+                logger.warning("Regras inválidas, mantendo as anteriores: %s", e)
+                return
+            self.regras = novas
+            self._cache.clear()
+            self.recargas += 1
+            logger.info("Regras de roteamento recarregadas (%d)", len(novas.regras))
+
+    def avaliar(self, categoria: Any, sentimento: Any, query: str = "") -> Decisao:
+        """Decisão para o ticket (reaproveitada se ele já foi avaliado)"""
+        self._verificar_recarga()
+        chave = (_valor(categoria), _valor(sentimento), query)
+        with self._lock:
+            decisao = self._cache.get(chave)
+            if decisao is not None:
+                self._cache.move_to_end(chave)
+                self.acertos_cache += 1
+                return decisao
+        decisao = self.regras.avaliar(*chave)
+        with self._lock:
+            self.avaliacoes += 1
+            self._cache[chave] = decisao
+            if len(self._cache) > MAX_DECISOES_CACHE:
+                self._cache.popitem(last=False)
+        return decisao
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "regras": len(self.regras.regras),
+            "recargas": self.recargas,
+            "avaliacoes": self.avaliacoes,
+            "acertos_cache": self.acertos_cache,
+        }
+
+
+# Motor global, compilado na primeira avaliação
+_motor: Optional[MotorRegras] = None
+_lock_motor = threading.Lock()
+
+
+def obter_motor_regras() -> MotorRegras:
+    """Retorna o motor global, compilando o arquivo de regras na primeira chamada"""
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = MotorRegras()
+    return _motor
+
+
+# === DRY-RUN (REPLAY DE TICKETS HISTÓRICOS) ===
+
+
+def carregar_tickets_checkpoints(
+    db_path: str, limite: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Último estado de cada thread com ticket resolvido no banco de
+    checkpoints: consulta, triagem e o que o workflow decidiu na época.
+    """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from memory.serializador import SerializadorCompacto
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        vistos = set()
+        tickets = []
+        for checkpoint in SqliteSaver(conn, serde=SerializadorCompacto()).list(None):
+            thread_id = checkpoint.config["configurable"]["thread_id"]
+            valores = checkpoint.checkpoint.get("channel_values", {})
+            if thread_id in vistos or not valores.get("response"):
+                continue
+            vistos.add(thread_id)
+            tickets.append(
+                {
+                    "thread_id": thread_id,
+                    "query": valores.get("query", ""),
+                    "categoria": _valor(valores.get("category")),
+                    "sentimento": _valor(valores.get("sentiment")),
+                    "prioridade": _valor(valores.get("priority")),
+                    "escalado": bool(valores.get("escalated")),
+                }
+            )
+            if limite and len(tickets) >= limite:
+                break
+        return tickets
+    finally:
+        conn.close()
+
+
+def replay(regras: RegrasCompiladas, tickets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Avalia as regras sobre tickets históricos sem executar o workflow.
+
+    Returns:
+        dict: Quantas vezes cada regra disparou, decisões por campo e os
+            tickets cuja prioridade ou escalação mudaria.
+    """
+    disparos: Counter = Counter()
+    prioridades: Counter = Counter()
+    agentes: Counter = Counter()
+    mudancas = []
+    inicio = time.perf_counter()
+    for ticket in tickets:
+        decisao = regras.avaliar(
+            ticket["categoria"], ticket["sentimento"], ticket["query"]
+        )
+        disparos.update(decisao.regras)
+        prioridades[decisao.prioridade] += 1
+        agentes[decisao.agente] += 1
+        mudou_prioridade = ticket["prioridade"] not in ("", decisao.prioridade)
+        if mudou_prioridade or (
+            ticket["categoria"] == "Technical" and decisao.escalar != ticket["escalado"]
+        ):
+            mudancas.append(
+                {
+                    "thread_id": ticket["thread_id"],
+                    "query": ticket["query"][:60],
+                    "prioridade": (ticket["prioridade"], decisao.prioridade),
+                    "escalado": (ticket["escalado"], decisao.escalar),
+                    "regras": list(decisao.regras),
+                }
+            )
+    segundos = time.perf_counter() - inicio
+    return {
+        "tickets": len(tickets),
+        "disparos": {r.nome: disparos.get(r.nome, 0) for r in regras.regras},
+        "prioridades": dict(prioridades),
+        "agentes": dict(agentes),
+        "mudancas": mudancas,
+        "us_por_ticket": round(segundos * 1e6 / max(len(tickets), 1), 2),
+    }
+
+
+# === CLI ===
+
+
+def main():
+    from memory.workflow_memory import db_path
+
+    parser = argparse.ArgumentParser(description="Regras de roteamento e escalação")
+    parser.add_argument("--regras", default=REGRAS_PATH, help="Arquivo de regras")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("validar", help="Compila o arquivo e mostra a tabela de decisão")
+    rep = sub.add_parser("replay", help="Dry-run sobre os tickets do banco")
+    rep.add_argument("--db", default=db_path, help="Banco de checkpoints")
+    rep.add_argument("--limite", type=int, default=None)
+    rep.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    regras = RegrasCompiladas(ler_definicao(args.regras), args.regras)
+    if args.comando == "validar":
+        print(f"✅ {len(regras.regras)} regras válidas em {args.regras}")
+        for categoria in CategoryType:
+            for sentimento in SentimentType:
+                decisao = regras.avaliar(categoria.value, sentimento.value)
+                print(
+                    f"   {categoria.value:<10} {sentimento.value:<9} -> "
+                    f"{decisao.prioridade:<7} {decisao.agente:<17} {decisao.rota}"
+                )
+        return
+
+    relatorio = replay(regras, carregar_tickets_checkpoints(args.db, args.limite))
+    if args.json:
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        return
+    print(
+        f"🔁 REPLAY DE {relatorio['tickets']} TICKETS ({relatorio['us_por_ticket']} µs/ticket)"
+    )
+    print("📏 Regras disparadas:")
+    for nome, total in relatorio["disparos"].items():
+        print(f"   {nome:<32} {total:>6}")
+    print(f"🚦 Prioridades: {relatorio['prioridades']}")
+    print(f"🎯 Agentes: {relatorio['agentes']}")
+    print(f"✏️ Decisões que mudariam: {len(relatorio['mudancas'])}")
+    for mudanca in relatorio["mudancas"][:20]:
+        print(
+            f"   {mudanca['thread_id'][:24]:<24} prioridade {mudanca['prioridade'][0]}"
+            f" -> {mudanca['prioridade'][1]}, escalado {mudanca['escalado'][0]}"
+            f" -> {mudanca['escalado'][1]} | {mudanca['query']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
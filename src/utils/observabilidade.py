@@ -0,0 +1,559 @@
+"""
+Observabilidade Local
+Logging com níveis, métricas em memória (contadores e histogramas com
+rótulos) e spans por nó do grafo e por chamada ao LLM, sem enviar nada
+para fora da máquina
+
+As métricas são exportadas em texto do Prometheus (GET /metrics) ou em
+JSON lines (uma série por linha). Com TRACING_JSONL definido, cada nó e
+cada chamada ao LLM também grava um span (JSON) nesse arquivo.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langgraph.errors import GraphBubbleUp
+
+# === CONFIGURAÇÃO ===
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto")  # texto | json
+TRACING_JSONL = os.getenv("TRACING_JSONL")  # arquivo de spans (opcional)
+
+# Limites (segundos) dos buckets dos histogramas de duração
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Loggers de bibliotecas que registram cada requisição em INFO
+LOGGERS_RUIDOSOS = ("httpx", "httpcore", "openai", "apscheduler")
+
+logger = logging.getLogger(__name__)
+
+
+# === LOGGING ===
+
+
+class FormatadorJson(logging.Formatter):
+    """Um objeto JSON por linha de log"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+        }
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False)
+
+
+def configurar_logging(
+    nivel: Optional[str] = None, formato: Optional[str] = None
+) -> None:
+    """
+    Instala um handler no logger raiz (chamadas repetidas só o substituem).
+
+    Args:
+        nivel: DEBUG, INFO, WARNING... (padrão: variável LOG_LEVEL).
+        formato: "texto" ou "json" (padrão: variável LOG_FORMATO).
+    """
+    nivel = (nivel or LOG_LEVEL).upper()
+    formato = formato or LOG_FORMATO
+    handler = logging.StreamHandler()
+    if formato == "json":
+        handler.setFormatter(FormatadorJson())
+    else:
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+        )
+    handler._observabilidade = True
+
+    raiz = logging.getLogger()
+    for anterior in list(raiz.handlers):
+        if getattr(anterior, "_observabilidade", False):
+            raiz.removeHandler(anterior)
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+    for nome in LOGGERS_RUIDOSOS:
+        logging.getLogger(nome).setLevel(max(logging.WARNING, raiz.level))
+
+
+# === MÉTRICAS ===
+
+
+class Histograma:
+    """Contagens por bucket (não cumulativas), soma e total de observações"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_PADRAO):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def cumulativos(self) -> List[Tuple[str, int]]:
+        """Pares (le, contagem acumulada), terminando em +Inf"""
+        acumulado, pares = 0, []
+        for limite, contagem in zip((*self.buckets, None), self.contagens):
+            acumulado += contagem
+            pares.append(("+Inf" if limite is None else repr(limite), acumulado))
+        return pares
+
+
+def percentis(amostras: List[float]) -> Dict[str, float]:
+    """p50, p95, p99 e máximo em milissegundos (amostras em segundos)"""
+    if not amostras:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordenadas = sorted(amostras)
+
+    def p(fracao: float) -> float:
+        indice = min(len(ordenadas) - 1, int(fracao * len(ordenadas)))
+        return round(ordenadas[indice] * 1000, 3)
+
+    return {"p50": p(0.50), "p95": p(0.95), "p99": p(0.99), "max": p(1.0)}
+
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def _rotulos(rotulos: Dict[str, Any]) -> Rotulos:
+    return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+def _formatar_rotulos(rotulos: Rotulos, extra: str = "") -> str:
+    pares = [
+        '{}="{}"'.format(
+            chave,
+            valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for chave, valor in rotulos
+    ]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatar_valor(valor: Any) -> str:
+    if isinstance(valor, int):
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class RegistroMetricas:
+    """
+    Contadores, gauges e histogramas com rótulos, seguros entre threads.
+
+    Coletores são funções que devolvem um dict de estatísticas (pool HTTP,
+    caches, checkpointer...); cada valor numérico vira um gauge
+    `<prefixo>_<chave>` no momento da exportação.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definicoes: Dict[str, Tuple[str, str]] = {}  # nome -> (tipo, ajuda)
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._series: Dict[str, Dict[Rotulos, Any]] = {}
+        self._coletores: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def declarar(
+        self,
+        nome: str,
+        tipo: str,
+        ajuda: str = "",
+        buckets: Tuple[float, ...] = BUCKETS_PADRAO,
+    ):
+        """Registra tipo ("counter", "gauge" ou "histogram") e descrição"""
+        with self._lock:
+            self._definicoes[nome] = (tipo, ajuda)
+            self._series.setdefault(nome, {})
+            if tipo == "histogram":
+                self._buckets[nome] = tuple(buckets)
+
+    def _serie(self, nome: str, tipo: str, rotulos: Rotulos, inicial: Callable):
+        if nome not in self._definicoes:
+            self._definicoes[nome] = (tipo, "")
+            self._series[nome] = {}
+        series = self._series[nome]
+        if rotulos not in series:
+            series[rotulos] = inicial()
+        return series
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        chave = _rotulos(rotulos)
+        with self._lock:
+            series = self._serie(nome, "counter", chave, int)
+            series[chave] += valor
+
+    def definir(self, nome: str, valor: float, **rotulos):
+        chave = _rotulos(rotulos)
+        with self._lock:
+            series = self._serie(nome, "gauge", chave, int)
+            series[chave] = valor
+
+    def observar(self, nome: str, valor: float, **rotulos):
+        chave = _rotulos(rotulos)
+        with self._lock:
+            buckets = self._buckets.get(nome, BUCKETS_PADRAO)
+            series = self._serie(nome, "histogram", chave, lambda: Histograma(buckets))
+            series[chave].observar(valor)
+
+    def valor(self, nome: str, **rotulos) -> Any:
+        """Valor atual da série (Histograma para histogramas; None se não existe)"""
+        with self._lock:
+            return self._series.get(nome, {}).get(_rotulos(rotulos))
+
+    def series(self, nome: str) -> List[Tuple[Dict[str, str], Any]]:
+        """Pares (rótulos, valor) de todas as séries da métrica"""
+        with self._lock:
+            return [
+                (dict(rotulos), valor)
+                for rotulos, valor in self._series.get(nome, {}).items()
+            ]
+
+    def registrar_coletor(self, prefixo: str, coletor: Callable[[], Dict[str, Any]]):
+        """Exporta as estatísticas numéricas de `coletor()` como gauges"""
+        with self._lock:
+            self._coletores[prefixo] = coletor
+
+    def limpar(self):
+        """Zera todas as séries (mantém declarações e coletores)"""
+        with self._lock:
+            for series in self._series.values():
+                series.clear()
+
+    def _coletar(self) -> List[Tuple[str, Any]]:
+        with self._lock:
+            coletores = list(self._coletores.items())
+        valores = []
+        for prefixo, coletor in coletores:
+            try:
+                estatisticas = coletor()
+            except Exception as e:
+                logger.debug("Coletor %s falhou: %s", prefixo, e)
+                continue
+            for chave, valor in estatisticas.items():
+                if isinstance(valor, (int, float)):
+                    valores.append((f"{prefixo}_{chave}", valor))
+        return valores
+
+    def _copia(self) -> List[Tuple[str, str, str, Dict[Rotulos, Any]]]:
+        with self._lock:
+            return [
+                (nome, *self._definicoes[nome], dict(series))
+                for nome, series in self._series.items()
+                if series
+            ]
+
+    # === EXPORTAÇÃO ===
+
+    def prometheus(self) -> str:
+        """Todas as séries no formato de texto do Prometheus"""
+        linhas = []
+        for nome, tipo, ajuda, series in self._copia():
+            if ajuda:
+                linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for rotulos, valor in series.items():
+                if tipo != "histogram":
+                    linhas.append(
+                        f"{nome}{_formatar_rotulos(rotulos)} {_formatar_valor(valor)}"
+                    )
+                    continue
+                for limite, acumulado in valor.cumulativos():
+                    extra = f'le="{limite}"'
+                    linhas.append(
+                        f"{nome}_bucket{_formatar_rotulos(rotulos, extra)} {acumulado}"
+                    )
+                linhas.append(
+                    f"{nome}_sum{_formatar_rotulos(rotulos)} {valor.soma:.6f}"
+                )
+                linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {valor.total}")
+        for nome, valor in self._coletar():
+            linhas.append(f"# TYPE {nome} gauge")
+            linhas.append(f"{nome} {_formatar_valor(valor)}")
+        return "\n".join(linhas) + "\n"
+
+    def json_linhas(self) -> str:
+        """Uma série por linha (JSON), com o instante da exportação"""
+        ts = datetime.now(timezone.utc).isoformat()
+        linhas = []
+        for nome, tipo, _, series in self._copia():
+            for rotulos, valor in series.items():
+                registro = {"ts": ts, "metrica": nome, "tipo": tipo}
+                registro["rotulos"] = dict(rotulos)
+                if tipo == "histogram":
+                    registro["contagem"] = valor.total
+                    registro["soma"] = round(valor.soma, 6)
+                    registro["buckets"] = dict(valor.cumulativos())
+                else:
+                    registro["valor"] = valor
+                linhas.append(json.dumps(registro, ensure_ascii=False))
+        for nome, valor in self._coletar():
+            registro = {"ts": ts, "metrica": nome, "tipo": "gauge", "valor": valor}
+            linhas.append(json.dumps(registro, ensure_ascii=False))
+        return "\n".join(linhas) + "\n"
+
+
+# Registro global do processo (um por worker)
+metricas = RegistroMetricas()
+metricas.declarar("suporte_no_segundos", "histogram", "Duração de cada nó do grafo")
+metricas.declarar("suporte_no_erros_total", "counter", "Nós que terminaram com erro")
+metricas.declarar("suporte_llm_segundos", "histogram", "Duração das chamadas ao LLM")
+metricas.declarar("suporte_llm_chamadas_total", "counter", "Chamadas ao LLM")
+metricas.declarar("suporte_llm_erros_total", "counter", "Chamadas ao LLM com erro")
+metricas.declarar(
+    "suporte_llm_tokens_total", "counter", "Tokens consumidos (tipo=entrada|saida)"
+)
+metricas.declarar(
+    "suporte_classificador_local_total",
+    "counter",
+    "Etapas de triagem resolvidas pelo classificador local, sem LLM",
+)
+
+
+# === SPANS ===
+
+
+class EscritorSpans:
+    """Anexa spans (um JSON por linha) a um arquivo, com lock entre threads"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._arquivo = None
+
+    def gravar(self, span: Dict[str, Any]):
+        linha = json.dumps(span, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._arquivo is None:
+                pasta = os.path.dirname(os.path.abspath(self.caminho))
+                os.makedirs(pasta, exist_ok=True)
+                self._arquivo = open(self.caminho, "a", encoding="utf-8")
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+_escritor: Optional[EscritorSpans] = (
+    EscritorSpans(TRACING_JSONL) if TRACING_JSONL else None
+)
+
+
+def definir_arquivo_spans(caminho: Optional[str]):
+    """Passa a gravar spans em `caminho` (None desliga)"""
+    global _escritor
+    if _escritor is not None:
+        _escritor.fechar()
+    _escritor = EscritorSpans(caminho) if caminho else None
+
+
+def gravar_span(tipo: str, nome: str, inicio: float, duracao: float, **campos):
+    """Grava um span se TRACING_JSONL (ou definir_arquivo_spans) estiver ativo"""
+    if _escritor is None:
+        return
+    _escritor.gravar(
+        {
+            "ts": datetime.fromtimestamp(inicio, timezone.utc).isoformat(),
+            "tipo": tipo,
+            "nome": nome,
+            "duracao_ms": round(duracao * 1000, 3),
+            **campos,
+        }
+    )
+
+
+def _thread_id_atual() -> Optional[str]:
+    """thread_id da execução do grafo em andamento (None fora do grafo)"""
+    try:
+        from langgraph.config import get_config
+
+        return get_config().get("configurable", {}).get("thread_id")
+    except Exception:
+        return None
+
+
+# === NÓS DO GRAFO ===
+
+
+def _registrar_no(
+    nome: str, inicio: float, duracao: float, erro: Optional[BaseException]
+):
+    metricas.observar("suporte_no_segundos", duracao, no=nome)
+    if erro is not None:
+        metricas.incrementar("suporte_no_erros_total", no=nome)
+        logger.warning("Nó %s falhou após %.1f ms: %s", nome, duracao * 1000, erro)
+    else:
+        logger.debug("Nó %s concluído em %.1f ms", nome, duracao * 1000)
+    if _escritor is not None:
+        gravar_span(
+            "no",
+            nome,
+            inicio,
+            duracao,
+            thread_id=_thread_id_atual(),
+            erro=None if erro is None else repr(erro),
+        )
+
+
+def instrumentar_no(nome: str, funcao: Callable) -> Callable:
+    """
+    Envolve a função de um nó (síncrona ou assíncrona) medindo duração e erros.
+
+    A assinatura original é preservada (functools.wraps), então o LangGraph
+    continua inferindo o schema e os parâmetros injetados do nó.
+    """
+    if inspect.iscoroutinefunction(funcao):
+
+        @functools.wraps(funcao)
+        async def no_assincrono(*args, **kwargs):
+            inicio, relogio = time.time(), time.perf_counter()
+            erro = None
+            try:
+                return await funcao(*args, **kwargs)
+            except GraphBubbleUp:
+                raise  # interrupções do grafo não são erros
+            except Exception as e:
+                erro = e
+                raise
+            finally:
+                _registrar_no(nome, inicio, time.perf_counter() - relogio, erro)
+
+        return no_assincrono
+
+    @functools.wraps(funcao)
+    def no_sincrono(*args, **kwargs):
+        inicio, relogio = time.time(), time.perf_counter()
+        erro = None
+        try:
+            return funcao(*args, **kwargs)
+        except GraphBubbleUp:
+            raise
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            _registrar_no(nome, inicio, time.perf_counter() - relogio, erro)
+
+    return no_sincrono
+
+
+# === CHAMADAS AO LLM ===
+
+
+def tokens_usados(resposta: LLMResult) -> Tuple[int, int]:
+    """(tokens de entrada, tokens de saída) informados pelo provedor"""
+    uso = (resposta.llm_output or {}).get("token_usage") or {}
+    entrada = uso.get("prompt_tokens") or 0
+    saida = uso.get("completion_tokens") or 0
+    if entrada or saida:
+        return entrada, saida
+    for geracoes in resposta.generations:
+        for geracao in geracoes:
+            mensagem = getattr(geracao, "message", None)
+            metadados = getattr(mensagem, "usage_metadata", None) or {}
+            entrada += metadados.get("input_tokens") or 0
+            saida += metadados.get("output_tokens") or 0
+    return entrada, saida
+
+
+class RastreadorLLM(BaseCallbackHandler):
+    """
+    Callback ligado a cada chat model do llm_pool: duração, tokens e erros
+    de todas as chamadas ao LLM, dentro ou fora do grafo (ex.: chain.batch).
+    """
+
+    run_inline = True  # roda na própria thread/loop, sem executor
+
+    def __init__(self, registro: RegistroMetricas = metricas):
+        self.registro = registro
+        self._em_andamento: Dict[UUID, Tuple[float, float, str, Optional[str]]] = {}
+
+    def _iniciar(self, run_id: UUID, metadata: Optional[dict], kwargs: dict):
+        parametros = kwargs.get("invocation_params") or {}
+        metadata = metadata or {}
+        modelo = (
+            metadata.get("ls_model_name")
+            or parametros.get("model")
+            or parametros.get("model_name")
+            or parametros.get("_type")
+            or "desconhecido"
+        )
+        self._em_andamento[run_id] = (
+            time.time(),
+            time.perf_counter(),
+            str(modelo),
+            metadata.get("thread_id"),
+        )
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        self._iniciar(run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._iniciar(run_id, metadata, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        registro = self._em_andamento.pop(run_id, None)
+        if registro is None:
+            return
+        inicio, relogio, modelo, thread_id = registro
+        duracao = time.perf_counter() - relogio
+        entrada, saida = tokens_usados(response)
+        self.registro.observar("suporte_llm_segundos", duracao, modelo=modelo)
+        self.registro.incrementar("suporte_llm_chamadas_total", modelo=modelo)
+        if entrada:
+            self.registro.incrementar(
+                "suporte_llm_tokens_total", entrada, modelo=modelo, tipo="entrada"
+            )
+        if saida:
+            self.registro.incrementar(
+                "suporte_llm_tokens_total", saida, modelo=modelo, tipo="saida"
+            )
+        gravar_span(
+            "llm",
+            modelo,
+            inicio,
+            duracao,
+            thread_id=thread_id,
+            tokens_entrada=entrada,
+            tokens_saida=saida,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        registro = self._em_andamento.pop(run_id, None)
+        if registro is None:
+            return
+        inicio, relogio, modelo, thread_id = registro
+        duracao = time.perf_counter() - relogio
+        self.registro.observar("suporte_llm_segundos", duracao, modelo=modelo)
+        self.registro.incrementar("suporte_llm_chamadas_total", modelo=modelo)
+        self.registro.incrementar("suporte_llm_erros_total", modelo=modelo)
+        logger.warning("Chamada ao LLM (%s) falhou: %s", modelo, error)
+        gravar_span(
+            "llm", modelo, inicio, duracao, thread_id=thread_id, erro=repr(error)
+        )
+
+
+# Instância compartilhada (o estado por chamada fica indexado pelo run_id)
+rastreador_llm = RastreadorLLM()
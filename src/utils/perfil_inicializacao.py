@@ -0,0 +1,114 @@
+"""
+Relatório de Tempo de Inicialização
+Mede quanto cada import e cada etapa de criação do workflow custam no
+cold start de um worker
+
+Uso (a partir da pasta src):
+    python -m utils.perfil_inicializacao [--diagrama] [--json]
+"""
+
+import argparse
+import importlib
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# Ordem de import de um worker; cada tempo é incremental (dependências
+# já carregadas por um módulo anterior não são contadas de novo)
+MODULOS = [
+    "langchain_core.runnables",
+    "langgraph.graph",
+    "langgraph.checkpoint.sqlite",
+    "langchain_openai",
+    "numpy",
+    "utils.state",
+    "utils.llm_pool",
+    "memory.cache_classificacao",
+    "memory.workflow_memory",
+    "agents.agente_coordenador",
+    "agents.agente_tecnico",
+    "agents.agente_financeiro",
+    "agents.agente_geral",
+    "agents.classificador_local",
+    "graph.workflow_suporte",
+]
+
+
+def _medir(funcao: Callable[[], Any]) -> Tuple[float, Any]:
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def medir_imports(modulos: List[str] = MODULOS) -> Dict[str, float]:
+    """Importa os módulos em ordem e retorna o tempo de cada um (segundos)"""
+    tempos = {}
+    for modulo in modulos:
+        if modulo in sys.modules:
+            tempos[modulo] = 0.0
+            continue
+        tempos[modulo], _ = _medir(lambda: importlib.import_module(modulo))
+    return tempos
+
+
+def medir_inicializacao(gerar_diagrama: bool = False) -> Dict[str, float]:
+    """Mede as etapas de criação do workflow (segundos)"""
+    from memory.workflow_memory import obter_checkpointer
+    from graph.workflow_suporte import WorkflowSuporteMultiAgente, salvar_diagrama
+
+    tempos = {}
+    tempos["checkpointer"], _ = _medir(obter_checkpointer)
+    tempos["workflow"], workflow = _medir(WorkflowSuporteMultiAgente)
+    for etapa, segundos in workflow.tempos_inicializacao.items():
+        tempos[f"workflow.{etapa}"] = segundos
+    if gerar_diagrama:
+        tempos["diagrama"], _ = _medir(lambda: salvar_diagrama(workflow))
+    return tempos
+
+
+def gerar_relatorio(gerar_diagrama: bool = False) -> Dict[str, Any]:
+    """Executa as medições e retorna o relatório completo"""
+    inicio = time.perf_counter()
+    imports = medir_imports()
+    inicializacao = medir_inicializacao(gerar_diagrama)
+    return {
+        "imports": imports,
+        "inicializacao": inicializacao,
+        "total_imports": sum(imports.values()),
+        "total": time.perf_counter() - inicio,
+    }
+
+
+def imprimir_relatorio(relatorio: Dict[str, Any]):
+    """Mostra o relatório em formato de tabela"""
+    print("⏱️ TEMPO DE INICIALIZAÇÃO")
+    print("=" * 50)
+    print("📦 Imports:")
+    for modulo, segundos in relatorio["imports"].items():
+        print(f"   {modulo:<32} {segundos * 1000:8.1f} ms")
+    print(f"   {'total':<32} {relatorio['total_imports'] * 1000:8.1f} ms")
+    print("🔧 Inicialização:")
+    for etapa, segundos in relatorio["inicializacao"].items():
+        print(f"   {etapa:<32} {segundos * 1000:8.1f} ms")
+    print("=" * 50)
+    print(f"   {'total':<32} {relatorio['total'] * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de cold start do workflow")
+    parser.add_argument(
+        "--diagrama", action="store_true", help="Inclui a geração do diagrama"
+    )
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    relatorio = gerar_relatorio(args.diagrama)
+    if args.json:
+        print(json.dumps(relatorio, indent=2))
+    else:
+        imprimir_relatorio(relatorio)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ Estado Corrigido para o Sistema de Suporte Multi-Agente
 Compatível com create_react_agent
 """
 
-from typing import Dict, Any, TypedDict, List
+from typing import Dict, Any, TypedDict, List, Annotated
 from datetime import datetime
 from enum import Enum
 from langchain_core.messages import BaseMessage
@@ -39,6 +39,36 @@ class AgentType(str, Enum):
     ESCALACAO = "Escalação"
 
 
+class PriorityType(str, Enum):
+    """Tipos de prioridade"""
+
+    HIGH = "High"
+    MEDIUM = "Medium"
+    LOW = "Low"
+
+
+class OrigemRotulo(str, Enum):
+    """Quem definiu um rótulo de triagem (categoria ou sentimento)"""
+
+    PENDENTE = "pendente"
+    LLM = "llm"
+    LOCAL = "local"  # classificador local (fast-path)
+    COALESCIDA = "coalescida"  # copiado de uma execução idêntica
+
+
+# === REDUCERS ===
+
+
+def manter_ultimo(atual: Any, novo: Any) -> Any:
+    """
+    Reducer que mantém o valor mais recente.
+
+    Com um reducer, o LangGraph aceita que nós executados em paralelo
+    (no mesmo super-step) escrevam no estado sem conflito de atualização.
+    """
+    return novo
+
+
 # === ESTADO PRINCIPAL COMPATÍVEL COM create_react_agent ===
 
 
@@ -46,14 +76,23 @@ class StateSuporteSimples(TypedDict):
     """Estado compatível com create_react_agent e MessagesState"""
 
     # Campos obrigatórios para create_react_agent
-    messages: List[BaseMessage]
+    # add_messages: cada turno da thread acrescenta mensagens (e RemoveMessage
+    # tira as que saem da janela de histórico, ver memory.historico)
+    messages: Annotated[List[BaseMessage], add_messages]
     remaining_steps: int
+    # Resumo dos turnos que saíram da janela (gravado no checkpoint)
+    resumo_historico: str
 
     # Campos customizados para nosso sistema
     query: str
     timestamp: str
-    category: CategoryType
-    sentiment: SentimentType
+    # Campos de triagem usam reducer: podem ser escritos por ramos paralelos
+    category: Annotated[CategoryType, manter_ultimo]
+    sentiment: Annotated[SentimentType, manter_ultimo]
+    priority: Annotated[PriorityType, manter_ultimo]
+    # Origem dos rótulos: só os do LLM servem de treino ao classificador local
+    origem_categoria: Annotated[OrigemRotulo, manter_ultimo]
+    origem_sentimento: Annotated[OrigemRotulo, manter_ultimo]
     response: str
     agent_used: AgentType
     escalated: bool
@@ -70,11 +109,15 @@ def criar_estado_inicial(query: str) -> StateSuporteSimples:
         # Campos obrigatórios para create_react_agent
         messages=[HumanMessage(content=query)],
         remaining_steps=10,  # Número máximo de iterações ReAct
+        # resumo_historico fica de fora: o da thread (checkpoint) é mantido
         # Campos customizados
         query=query,
         timestamp=datetime.now().isoformat(),
         category=CategoryType.GENERAL,
         sentiment=SentimentType.NEUTRAL,
+        priority=PriorityType.LOW,
+        origem_categoria=OrigemRotulo.PENDENTE,
+        origem_sentimento=OrigemRotulo.PENDENTE,
         response="",
         agent_used=AgentType.COORDENADOR,
         escalated=False,
@@ -89,6 +132,7 @@ def get_resumo_estado(state: StateSuporteSimples) -> Dict[str, Any]:
         else state["query"],
         "category": state["category"],
         "sentiment": state["sentiment"],
+        "priority": state["priority"],
         "agent_used": state["agent_used"],
         "escalated": state["escalated"],
     }
@@ -0,0 +1,28 @@
+"""
+Utilitários de Texto
+Normalização de consultas usada como chave de cache e para comparação
+"""
+
+import re
+import unicodedata
+
+_ESPACOS = re.compile(r"\s+")
+_PONTUACAO_BORDAS = " \t\n.,;:!?¡¿\"'()[]{}…"
+
+
+def remover_acentos(texto: str) -> str:
+    """Remove acentos mantendo as letras base ('não' -> 'nao')"""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza uma consulta para comparação: sem acentos, minúsculas,
+    espaços colapsados e sem pontuação nas bordas.
+
+    Ex.: '  Não consigo fazer LOGIN!! ' -> 'nao consigo fazer login'
+    """
+    texto = remover_acentos(texto).casefold()
+    texto = _ESPACOS.sub(" ", texto)
+    return texto.strip(_PONTUACAO_BORDAS)